@@ -0,0 +1,397 @@
+# pylint: disable=C0413
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from datetime import date, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# The benchmark owns the SQLite test database and needs streaming and internal endpoints enabled
+os.environ['TEST'] = 'True'
+os.environ['STREAM_TOKEN'] = os.environ.get('STREAM_TOKEN') or 'benchmark'
+os.environ['INTERNAL_TOKEN'] = os.environ['STREAM_TOKEN']
+
+import numpy as np  # noqa: E402
+from fakeredis import FakeAsyncRedis  # noqa: E402
+from fastapi.routing import APIRoute  # noqa: E402
+from httpx import AsyncClient, ASGITransport  # noqa: E402
+from redis.asyncio import Redis  # noqa: E402
+
+from backend.currency_api.config import STREAM_TOKEN  # noqa: E402
+from backend.currency_api.main import app  # noqa: E402
+from backend.currency_api.model import Base  # noqa: E402
+from backend.currency_api.service.db_service import AsyncSessionFactory, async_engine  # noqa: E402
+from backend.currency_api.service.cache_service import local_cache  # noqa: E402
+from backend.currency_api.service.ingest_service import RateRecord, upsert_rates  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'api_baseline.json')
+GROUP_NAME = 'Benchmark Currency Market'
+# Last quotation date of the seeded history, fixed so every run sees the same data
+LAST_DATE = date(2024, 12, 31)
+# Latency differences below that (ms) are noise, whatever the tolerance
+MIN_REGRESSION_MS = 0.5
+
+
+class Scenario(NamedTuple):
+    '''
+    Request pattern of a GET route
+
+    Attributes
+    ----------
+    name: str
+        scenario name in the report and the baseline
+    route: str
+        route template the scenario covers
+    url: str
+        url template filled with sampled `currency_group_id`, `currency_id`,
+        `currency_rate_id`, `char_code`, `char_code2`, `start` and `end`
+    '''
+    name: str
+    route: str
+    url: str
+
+
+SCENARIOS = (
+    Scenario('currency_group_list', '/api/v1/currency_group/', '/api/v1/currency_group/'),
+    Scenario(
+        'currency_group', '/api/v1/currency_group/{currency_group_id}',
+        '/api/v1/currency_group/{currency_group_id}'
+    ),
+    Scenario('currency_list', '/api/v1/currency/', '/api/v1/currency/?limit=100'),
+    Scenario(
+        'currency_list_latest', '/api/v1/currency/',
+        '/api/v1/currency/?limit=100&include_currency_rates=latest'
+    ),
+    Scenario(
+        'currency_list_rates_limit', '/api/v1/currency/',
+        '/api/v1/currency/?limit=50&rates_limit=10'
+    ),
+    Scenario('currency', '/api/v1/currency/{currency_id}', '/api/v1/currency/{currency_id}'),
+    Scenario('currency_rate_list', '/api/v1/currency_rate/', '/api/v1/currency_rate/?limit=500'),
+    Scenario(
+        'currency_rate_list_offset', '/api/v1/currency_rate/',
+        '/api/v1/currency_rate/?limit=100&offset=50000'
+    ),
+    Scenario(
+        'currency_rate_filter', '/api/v1/currency_rate/',
+        '/api/v1/currency_rate/?currency_id={currency_id}&_modified_at=&limit=30'
+    ),
+    Scenario(
+        'currency_rate_latest', '/api/v1/currency_rate/latest', '/api/v1/currency_rate/latest'
+    ),
+    Scenario(
+        'currency_rate_ohlc_month', '/api/v1/currency_rate/ohlc',
+        '/api/v1/currency_rate/ohlc?period=month&char_code={char_code}'
+    ),
+    Scenario(
+        'currency_rate_ohlc_day', '/api/v1/currency_rate/ohlc',
+        '/api/v1/currency_rate/ohlc?period=day&char_code={char_code},{char_code2}'
+        '&start={start}&end={end}'
+    ),
+    Scenario(
+        'currency_rate_matrix', '/api/v1/currency_rate/matrix',
+        '/api/v1/currency_rate/matrix?pairs={char_code}/{char_code2},{char_code2}/RUB'
+    ),
+    Scenario(
+        'currency_rate_stream', '/api/v1/currency_rate/stream',
+        '/api/v1/currency_rate/stream?currency_id={currency_id}'
+    ),
+    Scenario(
+        'currency_rate', '/api/v1/currency_rate/{currency_rate_id}',
+        '/api/v1/currency_rate/{currency_rate_id}'
+    ),
+    Scenario(
+        'convert', '/api/v1/convert/',
+        '/api/v1/convert/?from={char_code}&to={char_code2}&amount=100'
+    ),
+    Scenario('internal_cache', '/api/internal/cache', '/api/internal/cache'),
+    Scenario('internal_pool', '/api/internal/pool', '/api/internal/pool'),
+    Scenario('internal_slow_queries', '/api/internal/slow_queries', '/api/internal/slow_queries'),
+)
+
+
+def get_routes() -> List[str]:
+    '''
+    Function returns templates of every GET route declared in `router/`
+    '''
+    return sorted({
+        route.path for route in app.routes
+        if isinstance(route, APIRoute) and 'GET' in route.methods
+        and route.endpoint.__module__.startswith('backend.currency_api.router')
+    })
+
+
+def char_codes(amount: int) -> List[str]:
+    '''
+    Distinct three letter codes (AAA, AAB, ...) except the base currency
+    '''
+    codes = (
+        ''.join(letters) for letters in itertools.product('ABCDEFGHIJKLMNOPQRSTUVWXYZ', repeat=3)
+    )
+    return list(itertools.islice((code for code in codes if code != 'RUB'), amount))
+
+
+async def seed(currencies: int, days: int, seed_value: int) -> None:
+    '''
+    Function recreates the test database with `days` of daily rates of `currencies` currencies
+
+    Rates follow a seeded random walk and go through the ingestion upsert, one quotation
+    day per transaction, so rollups are stored the same way the CBR feed stores them.
+    '''
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    rng = random.Random(seed_value)
+    codes = char_codes(currencies)
+    nominals = [rng.choice((1, 10, 100)) for _ in codes]
+    rates = [rng.uniform(0.01, 150.0) for _ in codes]
+    for day in range(days):
+        rate_date = LAST_DATE - timedelta(days=days - day - 1)
+        rates = [max(rate * rng.gauss(1.0, 0.005), 0.0001) for rate in rates]
+        async with AsyncSessionFactory() as session:
+            await upsert_rates(session, GROUP_NAME, [
+                RateRecord(
+                    num_code=index + 1, char_code=code, name=f'Currency {code}',
+                    nominal=nominal, value=round(rate * nominal, 4),
+                    vunit_rate=rate, rate_date=rate_date
+                )
+                for index, (code, nominal, rate) in enumerate(zip(codes, nominals, rates))
+            ])
+
+
+def sample_urls(
+    scenario: Scenario, currencies: int, days: int, distinct: int, rng: random.Random
+) -> List[str]:
+    '''
+    Function fills the url template of the scenario with `distinct` sets of sampled values
+    '''
+    codes = char_codes(currencies)
+    urls = []
+    for _ in range(distinct):
+        first, second = rng.sample(codes, 2)
+        start = LAST_DATE - timedelta(days=rng.randrange(min(days, 365)) + 30)
+        urls.append(scenario.url.format(
+            currency_group_id=1,
+            currency_id=rng.randint(1, currencies),
+            currency_rate_id=rng.randint(1, currencies * days),
+            char_code=first, char_code2=second,
+            start=start.isoformat(), end=(start + timedelta(days=30)).isoformat()
+        ))
+    return list(dict.fromkeys(urls))
+
+
+async def reset_cache(redis: Redis) -> None:
+    await redis.flushdb()
+    local_cache.clear()
+
+
+def summarize(latencies: List[float], throughput: Optional[float]) -> Dict[str, Any]:
+    '''
+    Function returns throughput (requests per second) and latency percentiles (ms)
+    '''
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, (50, 95, 99))
+    return {
+        'requests': len(latencies),
+        'throughput': throughput,
+        'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+    }
+
+
+async def run_concurrent(
+    client: AsyncClient, urls: List[str], requests: int, concurrency: int
+) -> float:
+    '''
+    Function returns throughput (requests per second) of `requests` requests cycling over
+    the urls with `concurrency` of them in flight
+    '''
+    pending = itertools.islice(itertools.cycle(urls), requests)
+
+    async def worker() -> None:
+        # Workers share the iterator, every url is taken by a single one
+        for url in pending:
+            (await client.get(url)).raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start)
+
+
+async def run_scenario(
+    client: AsyncClient, redis: Redis, urls: List[str], requests: int, cold: bool,
+    concurrency: int
+) -> Dict[str, Any]:
+    '''
+    Function sends `requests` sequential requests cycling over the urls
+
+    Cold runs drop both the redis and the in-process cache before every request (not timed),
+    warm runs request every url once before measuring. Latencies come from the sequential
+    requests, throughput of warm runs from another `requests` requests sent `concurrency`
+    at a time (cold runs have none, the caches can't be dropped under concurrent requests).
+    '''
+    if not cold:
+        for url in urls:
+            (await client.get(url)).raise_for_status()
+
+    latencies = []
+    for url in itertools.islice(itertools.cycle(urls), requests):
+        if cold:
+            await reset_cache(redis)
+        start = time.perf_counter()
+        response = await client.get(url)
+        latency = time.perf_counter() - start
+        response.raise_for_status()
+        latencies.append(latency)
+    throughput = None if cold else await run_concurrent(client, urls, requests, concurrency)
+    return summarize(latencies, throughput)
+
+
+def compare(
+    results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float, metric: str = 'p50'
+) -> List[str]:
+    '''
+    Function returns names of the results with the latency percentile worse than the baseline
+    by more than `tolerance` (0.25 is 25%)
+    '''
+    return [
+        name for name, result in results.items()
+        if name in baseline
+        and result[metric] > baseline[name][metric] * (1 + tolerance)
+        and result[metric] - baseline[name][metric] > MIN_REGRESSION_MS
+    ]
+
+
+def redis_stand_in(redis_url: Optional[str]) -> Redis:
+    '''
+    Redis of the provided url or in-process fake redis if not provided
+    '''
+    return Redis.from_url(redis_url) if redis_url else FakeAsyncRedis()
+
+
+async def run(args: argparse.Namespace) -> int:
+    routes = get_routes()
+    uncovered = set(routes) - {scenario.route for scenario in SCENARIOS}
+    if uncovered:
+        sys.exit(f"GET routes without a scenario: {', '.join(sorted(uncovered))}")
+
+    if not args.skip_seed:
+        started = time.perf_counter()
+        await seed(args.currencies, args.days, args.seed)
+        print(
+            f'Seeded {args.currencies} currencies x {args.days} days '
+            f'in {time.perf_counter() - started:.1f} s'
+        )
+
+    redis = app.state.redis = redis_stand_in(args.redis_url)
+    rng = random.Random(args.seed)
+    results: Dict[str, Dict] = {}
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url='http://127.0.0.1:8000',
+            headers={'Authorization': f'Bearer {STREAM_TOKEN}'}
+        ) as client:
+            for scenario in SCENARIOS:
+                if args.only and scenario.name not in args.only:
+                    continue
+                urls = sample_urls(scenario, args.currencies, args.days, args.distinct, rng)
+                for mode in ('cold', 'warm'):
+                    await reset_cache(redis)
+                    results[f'{scenario.name}:{mode}'] = await run_scenario(
+                        client, redis, urls,
+                        args.cold_requests if mode == 'cold' else args.requests,
+                        cold=mode == 'cold', concurrency=args.concurrency
+                    )
+    finally:
+        await redis.aclose()
+        await async_engine.dispose()
+
+    config = {
+        key: getattr(args, key)
+        for key in (
+            'currencies', 'days', 'requests', 'cold_requests', 'distinct', 'seed', 'concurrency'
+        )
+    }
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump({'config': config, 'results': results}, baseline_file, indent=4)
+            baseline_file.write('\n')
+        print(f'Baseline stored into {args.baseline}')
+
+    baseline: Dict[str, Dict] = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as baseline_file:
+            stored = json.load(baseline_file)
+        if stored['config'] != config:
+            print(f"Baseline was recorded with {stored['config']}, comparison is approximate")
+        baseline = stored['results']
+
+    print(
+        f"{'scenario':<34}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        f"{'base ' + args.metric:>10}{'change':>9}"
+    )
+    regressions = compare(results, baseline, args.tolerance, args.metric)
+    for name, result in results.items():
+        throughput = result['throughput']
+        line = (
+            f"{name:<34}{'-' if throughput is None else f'{throughput:.0f}':>9}"
+            f"{result['p50']:9.2f}{result['p95']:9.2f}{result['p99']:9.2f}"
+        )
+        if name in baseline:
+            base = baseline[name][args.metric]
+            line += f"{base:10.2f}{(result[args.metric] / base - 1) * 100:+8.0f}%"
+        print(line + ('  REGRESSION' if name in regressions else ''))
+
+    if regressions:
+        print(f'{len(regressions)} scenario(s) slower than the baseline by {args.tolerance:.0%}')
+        return 1
+    return 0
+
+
+def main() -> None:
+    '''
+    Benchmark every GET route on a seeded SQLite test database with cold and warm cache
+
+    Requests go through the whole application (middlewares, routers, `cache`, `CRUDMixin`)
+    over `httpx.ASGITransport`, so numbers are free of network noise. Redis is an in-process
+    fake unless `--redis-url` is provided. The run fails (exit code 1) if the `--metric` latency
+    of any scenario is worse than the stored baseline by more than `--tolerance`.
+
+    Example:
+
+    ```
+        python -m backend.currency_api.benchmark.api_benchmark --requests 200
+        # After an intended change of the performance
+        python -m backend.currency_api.benchmark.api_benchmark --save-baseline
+    ```
+    '''
+    parser = argparse.ArgumentParser(prog='api_benchmark')
+    parser.add_argument('--currencies', type=int, default=200)
+    parser.add_argument('--days', type=int, default=2 * 365)
+    parser.add_argument('--requests', type=int, default=100, help='warm requests per scenario')
+    parser.add_argument('--cold-requests', type=int, default=20, help='cold requests per scenario')
+    parser.add_argument('--distinct', type=int, default=20, help='distinct urls per scenario')
+    parser.add_argument(
+        '--concurrency', type=int, default=8, help='requests in flight of the throughput run'
+    )
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-seed', action='store_true', help='reuse the seeded database')
+    parser.add_argument('--redis-url', help='real redis instead of the in-process fake')
+    parser.add_argument('--only', nargs='+', help='scenario names to run')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument(
+        '--metric', choices=('p50', 'p95', 'p99'), default='p50',
+        help='latency percentile compared with the baseline (tails are noisy on few requests)'
+    )
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == '__main__':
+    main()
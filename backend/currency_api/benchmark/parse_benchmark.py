@@ -0,0 +1,71 @@
+import json
+import timeit
+import argparse
+
+import xmltodict
+
+from backend.currency_api.service.ingest_service import records_from_val_curs, parse_val_curs
+
+
+def val_curs_document(valutes: int) -> bytes:
+    '''
+    Synthetic XML_daily.asp document (windows-1251) with the provided amount of currencies
+    '''
+    rows = ''.join(
+        f'<Valute ID="R{index:05d}"><NumCode>{index % 1000:03d}</NumCode>'
+        f'<CharCode>X{index:05d}</CharCode><Nominal>{10 ** (index % 3)}</Nominal>'
+        f'<Name>Валюта {index}</Name><Value>{index % 100},{index % 10000:04d}</Value>'
+        f'<VunitRate>{index % 100},{index % 10000:04d}</VunitRate></Valute>'
+        for index in range(valutes)
+    )
+    return (
+        '<?xml version="1.0" encoding="windows-1251"?>'
+        f'<ValCurs Date="01.03.2024" name="Foreign Currency Market">{rows}</ValCurs>'
+    ).encode('cp1251')
+
+
+def xmltodict_path(document: bytes) -> list:
+    '''
+    Previous path: xmltodict document, json round-trip, per row conversion
+    '''
+    return records_from_val_curs(
+        json.loads(json.dumps(xmltodict.parse(document.decode('cp1251'))))
+    )[1]
+
+
+def streaming_path(document: bytes, chunk_size: int = 64 * 1024) -> list:
+    '''
+    Incremental parser fed with response sized chunks
+    '''
+    return parse_val_curs(
+        document[offset:offset + chunk_size] for offset in range(0, len(document), chunk_size)
+    )[1]
+
+
+def main() -> None:
+    '''
+    Compare both parsing paths on a daily sized (43 currencies) and a multi-megabyte document
+
+    Example:
+
+    ```
+        python -m backend.currency_api.benchmark.parse_benchmark --repeat 20
+    ```
+    '''
+    parser = argparse.ArgumentParser(prog='parse_benchmark')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    for valutes in (43, 20000):
+        document = val_curs_document(valutes)
+        assert xmltodict_path(document) == streaming_path(document)
+        print(f'{valutes} currencies, {len(document) / 1024:.0f} KiB:')
+        for name, path in (('xmltodict', xmltodict_path), ('streaming', streaming_path)):
+            best = min(timeit.repeat(
+                lambda: path(document), number=1, repeat=args.repeat  # pylint: disable=W0640
+            ))
+            print(f'    {name:<10} {best * 1000:9.2f} ms  {valutes / best:12.0f} records/s')
+
+
+if __name__ == '__main__':
+    main()
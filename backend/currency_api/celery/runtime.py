@@ -0,0 +1,79 @@
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from asgiref.sync import async_to_sync
+from celery.signals import worker_process_init, worker_process_shutdown, task_prerun, \
+    task_postrun
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from backend.currency_api.service.db_service import use_pooled_task_engine
+from backend.currency_api.service.http_service import fetcher, with_fetcher
+from backend.currency_api.service.metrics_service import observe_task
+# Records slow statements of the worker if enabled (logged, the log is per process)
+from backend.currency_api.service import slow_query_service  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+# Event loop and pooled engine of the current worker process
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_engine: Optional[AsyncEngine] = None
+# Start times of the running tasks by task id
+_task_starts: Dict[str, float] = {}
+
+
+@worker_process_init.connect
+def init_worker_process(**_) -> None:
+    '''
+    Create the event loop and the pooled engine of the forked worker process
+    '''
+    global _loop, _engine  # pylint: disable=global-statement
+    _loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_loop)
+    _engine = use_pooled_task_engine()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**_) -> None:
+    '''
+    Close pooled db and http connections and the event loop of the worker process
+    '''
+    global _loop, _engine  # pylint: disable=global-statement
+    if _loop is None:
+        return
+    try:
+        _loop.run_until_complete(fetcher.close())
+        _loop.run_until_complete(_engine.dispose())
+    except Exception:  # pylint: disable=broad-except
+        logger.exception('Failed to close worker process connections')
+    finally:
+        _loop.close()
+        _loop = _engine = None
+
+
+@task_prerun.connect
+def start_task_timer(task_id: str, **_) -> None:
+    _task_starts[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def observe_task_duration(task_id: str, task, state: Optional[str] = None, **_) -> None:
+    '''
+    Record the duration of the finished task by its final state
+    '''
+    start = _task_starts.pop(task_id, None)
+    if start is not None:
+        observe_task(task.name.rsplit('.', 1)[-1], state or 'UNKNOWN', time.perf_counter() - start)
+
+
+def run_async(func: Callable[..., Awaitable], *args, **kwargs) -> Any:
+    '''
+    Run the coroutine function on the event loop of the worker process
+
+    Pooled db and http connections stay open between tasks. Outside of prefork worker
+    processes (solo/threads pools, eager calls) it falls back to a loop per call.
+    '''
+    if _loop is None:
+        return async_to_sync(with_fetcher(func))(*args, **kwargs)
+    return _loop.run_until_complete(func(*args, **kwargs))
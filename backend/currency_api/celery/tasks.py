@@ -1,21 +1,39 @@
-from asgiref.sync import async_to_sync
+from datetime import date, datetime
 
 from celery import shared_task
 
-from backend.currency_api.service.parse_service import populate_db_from_cbr, get_data_from_cbr
+from backend.currency_api.config import MOSCOW_TZ
+from backend.currency_api.service.parse_service import ingest_from_cbr
+from backend.currency_api.service.backfill_service import backfill_from_cbr
+from backend.currency_api.service.partition_service import maintain_partitions
+from backend.currency_api.service.metrics_service import RATES_UPSERTED
+from backend.currency_api.celery.runtime import run_async
 
 
 @shared_task
 def populate_db():
     '''
-    Populate DB from CBR
+    Populate DB from CBR (fetch, parse, upsert and cache refresh in a single run)
     '''
-    async_to_sync(populate_db_from_cbr)()
+    RATES_UPSERTED.labels('populate_db').inc(run_async(ingest_from_cbr))
 
 
 @shared_task
-def parse_cbr():
+def backfill_cbr(start: str, end: str = None):
     '''
-    Parse CBR
+    Backfill CBR rates for the date range (ISO dates, `end` defaults to today)
     '''
-    async_to_sync(get_data_from_cbr)()
+    rows = run_async(
+        backfill_from_cbr,
+        date.fromisoformat(start),
+        date.fromisoformat(end) if end else datetime.now(MOSCOW_TZ).date()
+    )
+    RATES_UPSERTED.labels('backfill_cbr').inc(rows)
+
+
+@shared_task
+def maintain_currency_rate_partitions():
+    '''
+    Create upcoming currency_rate partitions (Postgres only)
+    '''
+    run_async(maintain_partitions)
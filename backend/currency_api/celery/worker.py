@@ -3,6 +3,8 @@ import os
 from celery import Celery
 from celery.schedules import crontab
 
+from backend.currency_api.config import CBR_POLL_INTERVAL
+
 celery = Celery(
     __name__,
     broker=os.environ['CELERY_BROKER_URL'],
@@ -10,14 +12,16 @@ celery = Celery(
 )
 
 celery.conf.beat_schedule = {
-    'parse_cbr-every-24': {
-        'task': 'backend.currency_api.celery.tasks.parse_cbr',
-        'schedule': crontab(hour='*/24'),
-        'args': ()
-    },
-    'populate_db-every-12': {
+    'populate_db-poll': {
         'task': 'backend.currency_api.celery.tasks.populate_db',
-        'schedule': crontab(hour='*/12'),
+        'schedule': CBR_POLL_INTERVAL,
+        'args': (),
+        # Polls queued behind a busy worker are dropped instead of piling up
+        'options': {'expires': CBR_POLL_INTERVAL}
+    },
+    'maintain_currency_rate_partitions-daily': {
+        'task': 'backend.currency_api.celery.tasks.maintain_currency_rate_partitions',
+        'schedule': crontab(hour=3, minute=0),
         'args': ()
     },
 }
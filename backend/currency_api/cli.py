@@ -0,0 +1,88 @@
+import asyncio
+import argparse
+from datetime import date, datetime
+
+from backend.currency_api.config import MOSCOW_TZ, BACKFILL_CONCURRENCY, BACKFILL_CHECKPOINT_PATH, \
+    CBR_URL
+from backend.currency_api.service.backfill_service import backfill_from_cbr
+from backend.currency_api.service.rollup_service import rebuild_rollups
+from backend.currency_api.service.http_service import with_fetcher
+from backend.currency_api.service.metrics_service import clear_multiproc_dir
+
+
+def backfill(args: argparse.Namespace) -> None:
+    '''
+    Backfill CBR rates for the provided date range
+    '''
+    rows = asyncio.run(
+        with_fetcher(backfill_from_cbr)(
+            args.start, args.end or datetime.now(MOSCOW_TZ).date(),
+            concurrency=args.concurrency,
+            checkpoint_path=args.checkpoint,
+            link=args.link,
+            resume=args.resume
+        )
+    )
+    print(f'Backfill finished, {rows} rates stored')
+
+
+def rollup(args: argparse.Namespace) -> None:
+    '''
+    Rebuild day/week/month rate rollups for the provided date range
+    '''
+    rows = asyncio.run(rebuild_rollups(args.start, args.end or datetime.now(MOSCOW_TZ).date()))
+    print(f'Rollup finished, {rows} aggregates stored')
+
+
+def clear_metrics(_args: argparse.Namespace) -> None:
+    '''
+    Remove Prometheus multiprocess files of the previous run
+    '''
+    print(f'Metrics cleared, {clear_multiproc_dir()} files removed')
+
+
+def get_parser() -> argparse.ArgumentParser:
+    '''
+    CLI arguments parser
+
+    Example:
+
+    ```
+        python -m backend.currency_api.cli backfill --start 2014-01-01 --concurrency 16
+        python -m backend.currency_api.cli rollup --start 2014-01-01
+        python -m backend.currency_api.cli clear-metrics
+    ```
+    '''
+    parser = argparse.ArgumentParser(prog='currency_api')
+    subparsers = parser.add_subparsers(required=True)
+
+    backfill_parser = subparsers.add_parser('backfill', help='load historical CBR rates')
+    backfill_parser.add_argument('--start', type=date.fromisoformat, required=True)
+    backfill_parser.add_argument(
+        '--end', type=date.fromisoformat, default=None, help='inclusive, defaults to today'
+    )
+    backfill_parser.add_argument('--concurrency', type=int, default=BACKFILL_CONCURRENCY)
+    backfill_parser.add_argument('--checkpoint', default=BACKFILL_CHECKPOINT_PATH)
+    backfill_parser.add_argument('--link', default=CBR_URL)
+    backfill_parser.add_argument(
+        '--no-resume', dest='resume', action='store_false', help='ignore the stored checkpoint'
+    )
+    backfill_parser.set_defaults(handler=backfill)
+
+    rollup_parser = subparsers.add_parser('rollup', help='rebuild OHLC rate rollups')
+    rollup_parser.add_argument('--start', type=date.fromisoformat, required=True)
+    rollup_parser.add_argument(
+        '--end', type=date.fromisoformat, default=None, help='inclusive, defaults to today'
+    )
+    rollup_parser.set_defaults(handler=rollup)
+
+    metrics_parser = subparsers.add_parser(
+        'clear-metrics', help='remove Prometheus multiprocess files of the previous run'
+    )
+    metrics_parser.set_defaults(handler=clear_metrics)
+    return parser
+
+
+if __name__ == '__main__':
+    arguments = get_parser().parse_args()
+    arguments.handler(arguments)
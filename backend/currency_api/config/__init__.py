@@ -1 +1,4 @@
-from .config import LOG_FILE_PATH, ALLOWED_ORIGINS, PROXY, HEADERS, MOSCOW_TZ
+from .config import LOG_FILE_PATH, ALLOWED_ORIGINS, PROXY, HEADERS, MOSCOW_TZ, CBR_URL, \
+    CBR_POLL_INTERVAL, CBR_SNAPSHOT_PATH, BACKFILL_CONCURRENCY, BACKFILL_CHECKPOINT_PATH, \
+    STREAM_TOKEN, HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_RETRIES, HTTP_RETRY_BACKOFF, \
+    HTTP_POOL_SIZE, REQUEST_TIMEOUT, INTERNAL_TOKEN
@@ -22,3 +22,28 @@ HEADERS = {
 }
 
 MOSCOW_TZ = pytz.timezone('Europe/Moscow')
+
+CBR_URL = env('CBR_URL', 'https://cbr.ru/scripts/XML_daily.asp')
+# Polling is cheap (conditional requests, unchanged feeds skip the database)
+CBR_POLL_INTERVAL = float(env('CBR_POLL_INTERVAL', 60))
+# Optional json snapshot of the last ingested feed, disabled if empty
+CBR_SNAPSHOT_PATH = env('CBR_SNAPSHOT_PATH') or None
+BACKFILL_CONCURRENCY = int(env('BACKFILL_CONCURRENCY', 8))
+BACKFILL_CHECKPOINT_PATH = env(
+    'BACKFILL_CHECKPOINT_PATH', 'backend/currency_api/config/backfill_checkpoint.json'
+)
+
+# Default processing time budget of a request in seconds (504 once exceeded)
+REQUEST_TIMEOUT = float(env('REQUEST_TIMEOUT', 5))
+
+# Shared HTTP client (CBR requests) settings, timeouts and backoff in seconds
+HTTP_TIMEOUT = float(env('HTTP_TIMEOUT', 30))
+HTTP_CONNECT_TIMEOUT = float(env('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_RETRIES = int(env('HTTP_RETRIES', 3))
+HTTP_RETRY_BACKOFF = float(env('HTTP_RETRY_BACKOFF', 0.5))
+HTTP_POOL_SIZE = int(env('HTTP_POOL_SIZE', 16))
+
+# Bearer token of the streaming list endpoints, streaming is disabled if not set
+STREAM_TOKEN = env('STREAM_TOKEN')
+# Bearer token of the internal endpoints exposing statement parameters, disabled if not set
+INTERNAL_TOKEN = env('INTERNAL_TOKEN')
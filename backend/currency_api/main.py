@@ -1,15 +1,18 @@
-import time
 import asyncio
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
 
-from backend.currency_api.config import ALLOWED_ORIGINS
-from backend.currency_api.router import currency_router, currency_rate_router, currency_group_router
+from backend.currency_api.config import ALLOWED_ORIGINS, REQUEST_TIMEOUT
+from backend.currency_api.router import currency_router, currency_rate_router, \
+    currency_group_router, convert_router, internal_router
 from backend.currency_api.service.redis_service import get_redis
+from backend.currency_api.service.cache_service import listen_invalidations
+from backend.currency_api.service.db_service import replicas
+from backend.currency_api.service.metrics_service import latest_metrics
+from backend.currency_api.util import MetricsMiddleware, DeadlineMiddleware
 
 tags_metadata = [
     {
@@ -33,9 +36,18 @@ async def lifespan(app_instance: FastAPI):
     Asynchronous context manager to manage the lifespan of a FastAPI application's Redis connection.
     '''
     app_instance.state.redis = await get_redis()
+    # Writes of other processes keep reads on the primary until replicas catch up
+    cache_listener = asyncio.create_task(
+        listen_invalidations(app_instance.state.redis, on_invalidate=replicas.hold_primary)
+    )
+    replica_monitor = asyncio.create_task(replicas.monitor()) if replicas.engines else None
     try:
         yield
     finally:
+        cache_listener.cancel()
+        if replica_monitor is not None:
+            replica_monitor.cancel()
+        await replicas.dispose()
         await app_instance.state.redis.close()
 
 
@@ -64,26 +76,26 @@ app.add_middleware(
 app.include_router(currency_router, prefix="/api")
 app.include_router(currency_rate_router, prefix="/api")
 app.include_router(currency_group_router, prefix="/api")
+app.include_router(convert_router, prefix="/api")
+app.include_router(internal_router, prefix="/api")
 
+app.add_middleware(
+    DeadlineMiddleware,
+    timeout=REQUEST_TIMEOUT,
+    # Budgets in seconds by path prefix, None disables the deadline (streamed responses)
+    budgets={
+        '/api/v1/currency_rate/stream': None,
+        '/api/v1/currency_rate/ohlc': 2 * REQUEST_TIMEOUT,
+    }
+)
+# Outermost, so 504s of the timeout middleware are recorded too
+app.add_middleware(MetricsMiddleware)
 
-@app.middleware("http")
-async def timeout_middleware(request: Request, call_next):
-    """
-    TIMEOUT Middleware, throws an error if request exceeds 5s
-    """
-    start_time = time.time()
-    try:
-        return await asyncio.wait_for(call_next(request), timeout=5)
-
-    except asyncio.TimeoutError:
-        process_time = time.time() - start_time
-        return JSONResponse(
-            {
-                'detail': 'Request processing time excedeed limit',
-                'processing_time': process_time
-            },
-            status_code=status.HTTP_504_GATEWAY_TIMEOUT
-        )
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    payload, content_type = latest_metrics()
+    return Response(content=payload, media_type=content_type)
 
 
 @app.get("/api/swagger", include_in_schema=False)
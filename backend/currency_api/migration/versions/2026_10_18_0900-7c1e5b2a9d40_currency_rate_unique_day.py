@@ -0,0 +1,30 @@
+"""currency_rate unique (currency_id, modified_at DESC) index
+
+Revision ID: 7c1e5b2a9d40
+Revises: 2458e63452cb
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e5b2a9d40'
+down_revision: Union[str, None] = '2458e63452cb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ON CONFLICT target of the ingestion, descending for the latest rate lookups
+    op.create_index(
+        'ix_currency_rate_currency_id_modified_at', 'currency_rate',
+        ['currency_id', sa.text('modified_at DESC')], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_currency_rate_currency_id_modified_at', table_name='currency_rate')
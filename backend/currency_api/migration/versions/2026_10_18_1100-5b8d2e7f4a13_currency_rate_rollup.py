@@ -0,0 +1,52 @@
+"""currency_rate_rollup (day/week/month OHLC)
+
+Revision ID: 5b8d2e7f4a13
+Revises: 7c1e5b2a9d40
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8d2e7f4a13'
+down_revision: Union[str, None] = '7c1e5b2a9d40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('currency_rate_rollup',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('currency_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=5), nullable=False),
+    sa.Column('bucket', sa.Date(), nullable=False),
+    sa.Column('open_value', sa.Float(), nullable=False),
+    sa.Column('high_value', sa.Float(), nullable=False),
+    sa.Column('low_value', sa.Float(), nullable=False),
+    sa.Column('close_value', sa.Float(), nullable=False),
+    sa.Column('mean_value', sa.Float(), nullable=False),
+    sa.Column('open_vunit_rate', sa.Float(), nullable=False),
+    sa.Column('high_vunit_rate', sa.Float(), nullable=False),
+    sa.Column('low_vunit_rate', sa.Float(), nullable=False),
+    sa.Column('close_vunit_rate', sa.Float(), nullable=False),
+    sa.Column('mean_vunit_rate', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['currency_id'], ['currency.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id')
+    )
+    op.create_index(
+        'ix_currency_rate_rollup_currency_id_period_bucket', 'currency_rate_rollup',
+        ['currency_id', 'period', 'bucket'], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        'ix_currency_rate_rollup_currency_id_period_bucket', table_name='currency_rate_rollup'
+    )
+    op.drop_table('currency_rate_rollup')
@@ -0,0 +1,110 @@
+"""currency_rate monthly range partitioning by modified_at (Postgres only)
+
+Revision ID: 9d4f1a6c3e58
+Revises: 5b8d2e7f4a13
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4f1a6c3e58'
+down_revision: Union[str, None] = '5b8d2e7f4a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions are created this far ahead, later ones by the maintenance task
+MONTHS_AHEAD = 3
+
+
+def add_months(month: date, months: int) -> date:
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def create_partition(month: date) -> None:
+    op.execute(
+        f"CREATE TABLE currency_rate_y{month:%Y}m{month:%m} "
+        f"PARTITION OF currency_rate FOR VALUES "
+        f"FROM ('{month:%Y-%m-%d} 00:00:00 Europe/Moscow') "
+        f"TO ('{add_months(month, 1):%Y-%m-%d} 00:00:00 Europe/Moscow')"
+    )
+
+
+def upgrade() -> None:
+    # SQLite dev/test databases keep the plain table
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE currency_rate RENAME TO currency_rate_legacy')
+    op.execute(
+        'ALTER TABLE currency_rate_legacy RENAME CONSTRAINT currency_rate_pkey '
+        'TO currency_rate_legacy_pkey'
+    )
+    # Redundant UNIQUE (id) of the initial schema, SQLAlchemy doesn't emit it next to the primary key
+    op.execute('ALTER TABLE currency_rate_legacy DROP CONSTRAINT IF EXISTS currency_rate_id_key')
+    op.execute(
+        'ALTER INDEX ix_currency_rate_currency_id_modified_at '
+        'RENAME TO ix_currency_rate_legacy_currency_id_modified_at'
+    )
+
+    # Unique constraints of a partitioned table must include the partition key,
+    # so the primary key becomes (id, modified_at) and UNIQUE (id) is dropped
+    op.execute(
+        'CREATE TABLE currency_rate (LIKE currency_rate_legacy INCLUDING DEFAULTS) '
+        'PARTITION BY RANGE (modified_at)'
+    )
+    op.execute('ALTER SEQUENCE currency_rate_id_seq OWNED BY currency_rate.id')
+    op.create_primary_key('currency_rate_pkey', 'currency_rate', ['id', 'modified_at'])
+    op.create_foreign_key(
+        'currency_rate_currency_id_fkey', 'currency_rate', 'currency', ['currency_id'], ['id']
+    )
+    op.create_index(
+        'ix_currency_rate_currency_id_modified_at', 'currency_rate',
+        ['currency_id', sa.text('modified_at DESC')], unique=True
+    )
+
+    first_month = op.get_bind().execute(
+        sa.text(
+            "SELECT date_trunc('month', min(modified_at) AT TIME ZONE 'Europe/Moscow') "
+            "FROM currency_rate_legacy"
+        )
+    ).scalar()
+    current_month = op.get_bind().execute(
+        sa.text("SELECT date_trunc('month', now() AT TIME ZONE 'Europe/Moscow')")
+    ).scalar().date()
+    month = min(first_month.date(), current_month) if first_month else current_month
+    while month <= add_months(current_month, MONTHS_AHEAD):
+        create_partition(month)
+        month = add_months(month, 1)
+    # Rows beyond the created partitions, moved out by the maintenance task
+    op.execute('CREATE TABLE currency_rate_default PARTITION OF currency_rate DEFAULT')
+
+    op.execute('INSERT INTO currency_rate SELECT * FROM currency_rate_legacy')
+    op.execute('DROP TABLE currency_rate_legacy')
+    op.execute('ANALYZE currency_rate')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE TABLE currency_rate_plain (LIKE currency_rate INCLUDING DEFAULTS)')
+    op.execute('INSERT INTO currency_rate_plain SELECT * FROM currency_rate')
+    op.execute('ALTER SEQUENCE currency_rate_id_seq OWNED BY currency_rate_plain.id')
+    op.execute('DROP TABLE currency_rate')
+    op.execute('ALTER TABLE currency_rate_plain RENAME TO currency_rate')
+
+    op.create_primary_key('currency_rate_pkey', 'currency_rate', ['id'])
+    op.create_foreign_key(
+        'currency_rate_currency_id_fkey', 'currency_rate', 'currency', ['currency_id'], ['id']
+    )
+    op.create_index(
+        'ix_currency_rate_currency_id_modified_at', 'currency_rate',
+        ['currency_id', sa.text('modified_at DESC')], unique=True
+    )
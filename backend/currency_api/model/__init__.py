@@ -2,3 +2,4 @@ from .base import Base
 from .currency_group import CurrencyGroup
 from .currency import Currency
 from .currency_rate import CurrencyRate
+from .currency_rate_rollup import CurrencyRateRollup
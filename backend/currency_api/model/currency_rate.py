@@ -1,7 +1,9 @@
-from datetime import datetime
+from datetime import date, datetime
+from typing import AsyncIterator, List, Optional, Set
 
-from sqlalchemy import Integer, Float, DateTime, ForeignKey
-from sqlalchemy.orm import Mapped, relationship, mapped_column
+from sqlalchemy import Integer, Float, DateTime, ForeignKey, Index, select, func, true, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, relationship, mapped_column, aliased
 
 from backend.currency_api.config import MOSCOW_TZ
 from backend.currency_api.model.base import Base
@@ -9,6 +11,15 @@ from backend.currency_api.model.mixin import CRUDMixin
 from backend.currency_api.model.currency import Currency
 
 
+def rate_day(modified_at: datetime) -> date:
+    '''
+    Quotation day (Moscow) of the rate, SQLite returns naive Moscow timestamps
+    '''
+    if modified_at.tzinfo is None:
+        return modified_at.date()
+    return modified_at.astimezone(MOSCOW_TZ).date()
+
+
 class CurrencyRate(Base, CRUDMixin):
     '''
     Currency instance
@@ -24,7 +35,8 @@ class CurrencyRate(Base, CRUDMixin):
     vunit_rate: float
         currency vunit rate
     modified_at: datetime
-        date the currency_rate was modified
+        date the currency_rate was modified (quotation date for the rates ingested from CBR),
+        unique per currency and kept on updates
     '''
     __tablename__ = "currency_rate"
 
@@ -45,8 +57,104 @@ class CurrencyRate(Base, CRUDMixin):
     )
     modified_at: Mapped[DateTime] = mapped_column(
         "modified_at", DateTime(timezone=True), nullable=False,
-        default=lambda: datetime.now(MOSCOW_TZ),
-        onupdate=lambda: datetime.now(MOSCOW_TZ)
+        default=lambda: datetime.now(MOSCOW_TZ)
     )
 
     currency: Mapped[Currency] = relationship('Currency', back_populates='currency_rates')
+
+    @classmethod
+    async def before_commit(cls, session: AsyncSession, *items) -> None:
+        '''
+        Recompute the rollups of the changed rates within the transaction of the change.
+
+        Both the previous and the new currency / quotation day of an updated rate are
+        refreshed, so a rate moved to another currency leaves no stale aggregates behind.
+        '''
+        # Rollups are built from the rates, imported here to avoid the circular import
+        from backend.currency_api.model.currency_rate_rollup import CurrencyRateRollup
+
+        days: Set[date] = set()
+        currency_ids: Set[int] = set()
+        for item in items:
+            attrs = inspect(item).attrs
+            currency_ids.update([item.currency_id, *attrs.currency_id.history.deleted])
+            days.update(
+                rate_day(modified_at)
+                for modified_at in [item.modified_at, *attrs.modified_at.history.deleted]
+            )
+        # Sessions don't autoflush, the aggregates must see the change
+        await session.flush()
+        await CurrencyRateRollup.refresh(session, days, sorted(currency_ids))
+
+    @classmethod
+    async def read_latest(
+        cls, session: AsyncSession, limit: int = 1, char_codes: Optional[List[str]] = None,
+        currency_ids: Optional[List[int]] = None
+    ) -> AsyncIterator:
+        '''
+        Read the newest rates of every currency within a single query.
+
+        Postgres walks `ix_currency_rate_currency_id_modified_at` once per currency
+        (LATERAL join), other dialects rank the rates with a window function.
+
+        Parameters
+        ----------
+        session: AsyncSession
+            database session.
+        limit: int
+            amount of the newest rates per currency.
+        char_codes: List[str]
+            currency character codes to filter by (all currencies if not provided).
+        currency_ids: List[int]
+            currency ids to filter by (all currencies if not provided).
+
+        Returns
+        -------
+        AsyncIterator
+            iterator of the rates ordered by currency and newest first.
+        '''
+        if session.get_bind().dialect.name == 'postgresql':
+            latest = (
+                select(cls)
+                .where(cls.currency_id == Currency.id)
+                .order_by(cls.modified_at.desc())
+                .limit(limit)
+                .lateral()
+            )
+            latest_rate = aliased(cls, latest)
+            stmt = select(latest_rate).select_from(Currency).join(latest_rate, true())
+            if char_codes:
+                stmt = stmt.where(Currency.char_code.in_(char_codes))
+            if currency_ids is not None:
+                stmt = stmt.where(Currency.id.in_(currency_ids))
+        else:
+            ranked = select(
+                cls,
+                func.row_number().over(
+                    partition_by=cls.currency_id, order_by=cls.modified_at.desc()
+                ).label('row_number')
+            )
+            if char_codes:
+                ranked = ranked.where(
+                    cls.currency_id.in_(
+                        select(Currency.id).where(Currency.char_code.in_(char_codes))
+                    )
+                )
+            if currency_ids is not None:
+                ranked = ranked.where(cls.currency_id.in_(currency_ids))
+            latest = ranked.subquery()
+            latest_rate = aliased(cls, latest)
+            stmt = select(latest_rate).where(latest.c.row_number <= limit)
+
+        stream = await session.stream_scalars(
+            stmt.order_by(latest_rate.currency_id, latest_rate.modified_at.desc())
+        )
+        async for row in stream:
+            yield row
+
+
+Index(
+    'ix_currency_rate_currency_id_modified_at',
+    CurrencyRate.currency_id, CurrencyRate.modified_at.desc(),
+    unique=True
+)
@@ -0,0 +1,256 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Integer, Float, String, Date, ForeignKey, Index, select, delete, func, \
+    and_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column, aliased
+
+from backend.currency_api.config import MOSCOW_TZ
+from backend.currency_api.model.base import Base
+from backend.currency_api.model.mixin import CRUDMixin
+from backend.currency_api.model.currency import Currency
+from backend.currency_api.model.currency_rate import CurrencyRate
+
+ROLLUP_PERIODS = ('day', 'week', 'month')
+
+
+def bucket_start(day: date, period: str) -> date:
+    '''
+    First date of the bucket (day, ISO week or month) the provided date belongs to
+    '''
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(bucket: date, period: str) -> date:
+    '''
+    First date of the bucket following the provided one
+    '''
+    if period == 'week':
+        return bucket + timedelta(days=7)
+    if period == 'month':
+        return (bucket.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return bucket + timedelta(days=1)
+
+
+class CurrencyRateRollup(Base, CRUDMixin):
+    '''
+    Currency rate aggregates (OHLC) of a day, week or month
+
+    Attributes
+    ----------
+    currency_id: int
+        id of the currency associated with the record
+    period: str
+        bucket length: day, week or month
+    bucket: date
+        first date of the bucket
+    open_value, high_value, low_value, close_value, mean_value: float
+        first, max, min, last and mean currency value within the bucket
+    open_vunit_rate, high_vunit_rate, low_vunit_rate, close_vunit_rate, mean_vunit_rate: float
+        first, max, min, last and mean currency vunit rate within the bucket
+    count: int
+        amount of rates within the bucket
+    '''
+    __tablename__ = "currency_rate_rollup"
+
+    id: Mapped[int] = mapped_column(
+        "id", autoincrement=True, nullable=False, unique=True, primary_key=True
+    )
+    currency_id: Mapped[int] = mapped_column(
+        "currency_id", ForeignKey('currency.id', ondelete='CASCADE'), nullable=False
+    )
+    period: Mapped[str] = mapped_column(
+        "period", String(length=5), nullable=False
+    )
+    bucket: Mapped[date] = mapped_column(
+        "bucket", Date, nullable=False
+    )
+    open_value: Mapped[float] = mapped_column("open_value", Float, nullable=False)
+    high_value: Mapped[float] = mapped_column("high_value", Float, nullable=False)
+    low_value: Mapped[float] = mapped_column("low_value", Float, nullable=False)
+    close_value: Mapped[float] = mapped_column("close_value", Float, nullable=False)
+    mean_value: Mapped[float] = mapped_column("mean_value", Float, nullable=False)
+    open_vunit_rate: Mapped[float] = mapped_column("open_vunit_rate", Float, nullable=False)
+    high_vunit_rate: Mapped[float] = mapped_column("high_vunit_rate", Float, nullable=False)
+    low_vunit_rate: Mapped[float] = mapped_column("low_vunit_rate", Float, nullable=False)
+    close_vunit_rate: Mapped[float] = mapped_column("close_vunit_rate", Float, nullable=False)
+    mean_vunit_rate: Mapped[float] = mapped_column("mean_vunit_rate", Float, nullable=False)
+    count: Mapped[int] = mapped_column("count", Integer, nullable=False)
+
+    @classmethod
+    def aggregate(cls, period: str, bucket: date, currency_ids=None):
+        '''
+        Build the statement aggregating raw rates of the bucket per currency.
+
+        Open and close are the rates of the first and last `modified_at` within the bucket,
+        which are unique per currency.
+
+        Parameters
+        ----------
+        period: str
+            bucket length: day, week or month.
+        bucket: date
+            first date of the bucket.
+        currency_ids: List[int] | Select
+            currencies to aggregate (all currencies if not provided).
+
+        Returns
+        -------
+        stmt
+            SQL statement.
+        '''
+        rate = CurrencyRate
+        stats = select(
+            rate.currency_id,
+            func.max(rate.value).label('high_value'),
+            func.min(rate.value).label('low_value'),
+            func.avg(rate.value).label('mean_value'),
+            func.max(rate.vunit_rate).label('high_vunit_rate'),
+            func.min(rate.vunit_rate).label('low_vunit_rate'),
+            func.avg(rate.vunit_rate).label('mean_vunit_rate'),
+            func.count(rate.id).label('count'),
+            func.min(rate.modified_at).label('first_at'),
+            func.max(rate.modified_at).label('last_at'),
+        ).where(
+            rate.modified_at >= MOSCOW_TZ.localize(datetime.combine(bucket, time.min)),
+            rate.modified_at < MOSCOW_TZ.localize(
+                datetime.combine(next_bucket(bucket, period), time.min)
+            )
+        )
+        if currency_ids is not None:
+            stats = stats.where(rate.currency_id.in_(currency_ids))
+        stats = stats.group_by(rate.currency_id).subquery()
+
+        first, last = aliased(rate), aliased(rate)
+        return select(
+            stats.c.currency_id,
+            first.value.label('open_value'),
+            stats.c.high_value,
+            stats.c.low_value,
+            last.value.label('close_value'),
+            stats.c.mean_value,
+            first.vunit_rate.label('open_vunit_rate'),
+            stats.c.high_vunit_rate,
+            stats.c.low_vunit_rate,
+            last.vunit_rate.label('close_vunit_rate'),
+            stats.c.mean_vunit_rate,
+            stats.c.count,
+        ).select_from(stats).join(
+            first,
+            and_(first.currency_id == stats.c.currency_id, first.modified_at == stats.c.first_at)
+        ).join(
+            last,
+            and_(last.currency_id == stats.c.currency_id, last.modified_at == stats.c.last_at)
+        )
+
+    @classmethod
+    async def refresh(
+        cls, session: AsyncSession, days: Iterable[date],
+        currency_ids: Optional[List[int]] = None
+    ) -> int:
+        '''
+        Recompute every bucket containing the provided dates (doesn't commit).
+
+        Parameters
+        ----------
+        session: AsyncSession
+            database session.
+        days: Iterable[date]
+            dates of the changed rates.
+        currency_ids: List[int]
+            currencies of the changed rates (all currencies if not provided).
+
+        Returns
+        -------
+        int
+            amount of stored aggregates.
+        '''
+        days = set(days)
+        buckets = {
+            (period, bucket_start(day, period)) for period in ROLLUP_PERIODS for day in days
+        }
+        if not buckets:
+            return 0
+
+        rows: List[Dict] = []
+        for period, bucket in sorted(buckets):
+            rows += [
+                {**row, 'period': period, 'bucket': bucket}
+                for row in (
+                    await session.execute(cls.aggregate(period, bucket, currency_ids))
+                ).mappings()
+            ]
+
+        stmt = delete(cls).where(tuple_(cls.period, cls.bucket).in_(sorted(buckets)))
+        if currency_ids is not None:
+            stmt = stmt.where(cls.currency_id.in_(currency_ids))
+        await session.execute(stmt)
+        if rows:
+            await session.execute(cls.__table__.insert(), rows)
+        return len(rows)
+
+    @classmethod
+    async def read_ohlc(
+        cls, session: AsyncSession, period: str = 'day',
+        char_codes: Optional[List[str]] = None,
+        start: Optional[date] = None, end: Optional[date] = None
+    ) -> List[Dict]:
+        '''
+        Read aggregates of every currency per bucket.
+
+        Every bucket but the current (partial) one is read from the rollups, including the
+        future ones (cbr publishes the next business day quotation in advance), the current
+        one is aggregated from the raw rates on the fly.
+
+        Parameters
+        ----------
+        session: AsyncSession
+            database session.
+        period: str
+            bucket length: day, week or month.
+        char_codes: List[str]
+            currency character codes to filter by (all currencies if not provided).
+        start: date
+            first date of the range (inclusive).
+        end: date
+            last date of the range (inclusive).
+
+        Returns
+        -------
+        List[Dict]
+            aggregates ordered by currency and bucket.
+        '''
+        current = bucket_start(datetime.now(MOSCOW_TZ).date(), period)
+        currency_ids = select(Currency.id).where(Currency.char_code.in_(char_codes)) \
+            if char_codes else None
+
+        stmt = select(cls.__table__).where(cls.period == period, cls.bucket != current)
+        if start is not None:
+            stmt = stmt.where(cls.bucket >= bucket_start(start, period))
+        if end is not None:
+            stmt = stmt.where(cls.bucket <= end)
+        if currency_ids is not None:
+            stmt = stmt.where(cls.currency_id.in_(currency_ids))
+        rows = [dict(row) for row in (await session.execute(stmt)).mappings()]
+
+        if (start is None or start < next_bucket(current, period)) and \
+                (end is None or end >= current):
+            rows += [
+                {**row, 'period': period, 'bucket': current}
+                for row in (
+                    await session.execute(cls.aggregate(period, current, currency_ids))
+                ).mappings()
+            ]
+        return sorted(rows, key=lambda row: (row['currency_id'], row['bucket']))
+
+
+Index(
+    'ix_currency_rate_rollup_currency_id_period_bucket',
+    CurrencyRateRollup.currency_id, CurrencyRateRollup.period, CurrencyRateRollup.bucket,
+    unique=True
+)
@@ -1,5 +1,10 @@
-from typing import AsyncIterator
+import json
+import base64
+from decimal import Decimal
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Tuple
 
+from sqlalchemy import and_, or_, inspect
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload, Load
@@ -15,12 +20,18 @@ class CRUDMixin:
         Creates and returns a new object in the table.
     read_all(session: AsyncSession, **kwargs):
         Returns all objects in the table.
+    stream_all(session: AsyncSession, batch_size: int, **kwargs):
+        Returns all objects in the table fetched in batches.
+    encode_cursor(item: T, *args, **kwargs):
+        Returns keyset cursor of the page following the object.
     read_by_id(session: AsyncSession, item_id: int, **kwargs):
         Returns an object by its ID.
     update(session: AsyncSession, item: T, **kwargs):
         Updates an object.
     delete(session: AsyncSession, item: T):
         Deletes an object.
+    before_commit(session: AsyncSession, *items: T):
+        Writes data derived from the changed objects within the same transaction.
     '''
 
     @classmethod
@@ -68,6 +79,104 @@ class CRUDMixin:
                         stmt = stmt.order_by(related_attr.desc() if desc else related_attr.asc())
         return stmt
 
+    @classmethod
+    def order_keys(cls, *args, **kwargs) -> List[Tuple[str, bool]]:
+        '''
+        Get every order column of the query, in the order `apply_includes` sorts by them.
+
+        Parameters
+        ----------
+        *args: tuple
+            positional arguments for includes and orders.
+        **kwargs: dict
+            keyword arguments for includes and filters.
+
+        Returns
+        -------
+        List[Tuple[str, bool]]
+            column names and whether they are sorted in descending order, ending with 'id'
+            (the tie-breaker of every query).
+
+        Raises
+        ------
+        ValueError
+            if the query is ordered by anything but a non-nullable column of the model (keyset
+            pagination compares the values stored in the cursor, a NULL one matches no row).
+        '''
+        columns = inspect(cls).columns
+        orders = [key for key, value in kwargs.items() if len(str(value)) == 0] + \
+            [arg for arg in args if isinstance(arg, str)]
+        keys: List[Tuple[str, bool]] = []
+        for order in orders:
+            desc = order[0] == '_'
+            name = order[1:] if desc else order
+            # Unknown attributes are ignored by `apply_includes` as well
+            if getattr(cls, name, None) is None:
+                continue
+            if name not in columns or columns[name].nullable:
+                raise ValueError(f"Cursor pagination can't order by {name}")
+            keys.append((name, desc))
+            # Ids are unique, further keys never apply
+            if name == 'id':
+                return keys
+        return keys + [('id', False)]
+
+    @classmethod
+    def encode_cursor(cls, item, *args, **kwargs) -> str:
+        '''
+        Encode keyset cursor of the page following the object.
+
+        Parameters
+        ----------
+        item: instance
+            last object of the page.
+        *args: tuple
+            positional arguments for includes and orders.
+        **kwargs: dict
+            keyword arguments for includes and filters.
+
+        Returns
+        -------
+        str
+            opaque url-safe cursor.
+        '''
+        return base64.urlsafe_b64encode(
+            json.dumps(
+                [getattr(item, name) for name, _ in cls.order_keys(*args, **kwargs)], default=str
+            ).encode()
+        ).decode()
+
+    @classmethod
+    def decode_cursor(cls, cursor: str, names: List[str]) -> List[Any]:
+        '''
+        Decode keyset cursor into the values of the order columns.
+
+        Raises
+        ------
+        ValueError
+            if the cursor is malformed.
+        '''
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(names):
+                raise ValueError(cursor)
+            decoded = []
+            for name, value in zip(names, values):
+                python_type = inspect(cls).columns[name].type.python_type
+                # Order columns are non-nullable, comparisons with NULL would skip every row
+                if value is None:
+                    raise ValueError(cursor)
+                if python_type is datetime:
+                    value = datetime.fromisoformat(value)
+                elif python_type is Decimal:
+                    value = Decimal(str(value))
+                else:
+                    value = python_type(value)
+                decoded.append(value)
+            return decoded
+        except (TypeError, ValueError, KeyError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
     @classmethod
     async def read_all(cls, session: AsyncSession, *args, **kwargs) -> AsyncIterator:
         '''
@@ -79,6 +188,43 @@ class CRUDMixin:
             database session.
         *args: tuple
             positional arguments for includes and orders.
+        **kwargs: dict
+            keyword arguments for includes, filters, limits, and offsets.
+            `cursor` switches to keyset pagination on (order columns, id): an empty cursor
+            reads the first page, `offset` is ignored.
+
+        Returns
+        -------
+        AsyncIterator
+            iterator of all objects.
+
+        Raises
+        ------
+        ValueError
+            if the cursor is malformed.
+        '''
+        stream = await session.stream_scalars(cls.select_all(*args, **kwargs))
+        async for row in stream.unique():
+            yield row
+
+    @classmethod
+    async def stream_all(
+        cls, session: AsyncSession, *args, batch_size: int = 1000, **kwargs
+    ) -> AsyncIterator:
+        '''
+        Read all objects from the table fetching them from the cursor in batches.
+
+        Unlike `read_all` rows are not deduplicated, so the memory use doesn't grow with the
+        result size (includes are loaded with `selectinload`, which doesn't repeat rows).
+
+        Parameters
+        ----------
+        session: AsyncSession
+            database session.
+        batch_size: int
+            amount of rows fetched from the cursor at once.
+        *args: tuple
+            positional arguments for includes and orders.
         **kwargs: dict
             keyword arguments for includes, filters, limits, and offsets.
 
@@ -87,15 +233,52 @@ class CRUDMixin:
         AsyncIterator
             iterator of all objects.
         '''
+        stream = await session.stream_scalars(
+            cls.select_all(*args, **kwargs).execution_options(yield_per=batch_size)
+        )
+        async for row in stream:
+            yield row
+
+    @classmethod
+    def select_all(cls, *args, **kwargs):
+        '''
+        Build the select statement of `read_all`.
+
+        Parameters
+        ----------
+        *args: tuple
+            positional arguments for includes and orders.
+        **kwargs: dict
+            keyword arguments for includes, filters, limits, offsets and cursor.
+
+        Returns
+        -------
+        stmt
+            SQL statement.
+
+        Raises
+        ------
+        ValueError
+            if the cursor is malformed or the query can't be paginated by cursor.
+        '''
+        keys = cls.order_keys(*args, **kwargs) if 'cursor' in kwargs else []
         stmt = select(cls)
         stmt = cls.apply_includes(stmt, *args, **kwargs)
         limit = int(kwargs.get('limit')) if str(kwargs.get('limit')).isdigit() else None
         offset = int(kwargs.get('offset')) if str(kwargs.get('offset')).isdigit() else 0
-        stream = await session.stream_scalars(
-            stmt.order_by(cls.id).limit(limit).offset(offset)
-        )
-        async for row in stream.unique():
-            yield row
+        if 'cursor' in kwargs:
+            offset = 0
+            if kwargs['cursor']:
+                values = cls.decode_cursor(kwargs['cursor'], [name for name, _ in keys])
+                # Rows after the cursor in the (key_1, ..., key_n, id) order: equal on the
+                # leading keys and past the cursor value on the next one
+                conditions, leading = [], []
+                for (name, desc), value in zip(keys, values):
+                    column = getattr(cls, name)
+                    conditions.append(and_(*leading, column < value if desc else column > value))
+                    leading.append(column == value)
+                stmt = stmt.where(or_(*conditions))
+        return stmt.order_by(cls.id).limit(limit).offset(offset)
 
     @classmethod
     async def read_by_id(cls, session: AsyncSession, item_id: int, *args, **kwargs):
@@ -144,6 +327,9 @@ class CRUDMixin:
         '''
         item = cls(**kwargs)
         session.add(item)
+        # Column defaults are known to the hook
+        await session.flush()
+        await cls.before_commit(session, item)
         await session.commit()
         new_item = await cls.read_by_id(session, item_id=item.id)
         if new_item:
@@ -173,6 +359,7 @@ class CRUDMixin:
             for key, value in kwargs.items():
                 if hasattr(item, key) and value is not None:
                     setattr(item, key, value)
+            await cls.before_commit(session, item)
             await session.commit()
         return item
 
@@ -189,4 +376,22 @@ class CRUDMixin:
             object to delete.
         '''
         await session.delete(item)
+        await cls.before_commit(session, item)
         await session.commit()
+
+    @classmethod
+    async def before_commit(cls, session: AsyncSession, *items) -> None:
+        '''
+        Hook called by `create`, `update` and `delete` right before the commit.
+
+        Models keeping derived data (aggregates) up to date override it, updated objects
+        still carry the attribute history of the change (not flushed yet). Does nothing
+        by default.
+
+        Parameters
+        ----------
+        session: AsyncSession
+            database session.
+        *items: instances
+            created, updated or deleted objects.
+        '''
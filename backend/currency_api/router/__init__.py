@@ -1,3 +1,5 @@
 from .currency_group_router import router as currency_group_router
 from .currency_router import router as currency_router
 from .currency_rate_router import router as currency_rate_router
+from .internal_router import router as internal_router
+from .convert_router import router as convert_router
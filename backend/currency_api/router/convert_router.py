@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException, Query, status, Request
+
+from backend.currency_api.service.convert_service import get_rate_vector
+from backend.currency_api.schema import ConvertResponse, ConvertBatchSchema, ConvertBatchResponse
+
+router = APIRouter(
+    prefix="/v1/convert",
+    tags=['Convert']
+)
+
+
+@router.get(
+    "/", status_code=status.HTTP_200_OK,
+    response_model=ConvertResponse
+)
+async def convert(
+    request: Request,
+    from_code: str = Query(..., alias='from', min_length=3, max_length=3),
+    to_code: str = Query(..., alias='to', min_length=3, max_length=3),
+    amount: float = Query(1.0)
+):
+    rate_vector = await get_rate_vector(request.app.state.redis)
+    try:
+        result = rate_vector.convert([from_code.upper()], [to_code.upper()], [amount])
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    return ConvertResponse(
+        from_code=from_code.upper(), to_code=to_code.upper(), amount=amount,
+        result=float(result[0])
+    )
+
+
+@router.post(
+    "/", status_code=status.HTTP_200_OK,
+    response_model=ConvertBatchResponse
+)
+async def convert_batch(
+    request: Request,
+    payload: ConvertBatchSchema
+):
+    rate_vector = await get_rate_vector(request.app.state.redis)
+    try:
+        results = rate_vector.convert(
+            [item.from_code.upper() for item in payload.items],
+            [item.to_code.upper() for item in payload.items],
+            [item.amount for item in payload.items]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    return ConvertBatchResponse(results=results.tolist())
@@ -1,14 +1,14 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 
 from fastapi import APIRouter, Depends, Path, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.currency_api.service.db_service import get_session
+from backend.currency_api.service.db_service import get_session, get_read_session
 from backend.currency_api.util import get_object_or_raise_404, create_object_or_raise_400, \
-    update_object_or_raise_400, process_query_params, cache
+    update_object_or_raise_400, read_all_or_raise_400, process_query_params, cache
 from backend.currency_api.model import CurrencyGroup
 from backend.currency_api.schema import CurrencyGroupSchema, PartialCurrencyGroupSchema, \
-    CurrencyGroupResponse
+    CurrencyGroupResponse, CursorPage
 
 router = APIRouter(
     prefix="/v1/currency_group",
@@ -18,39 +18,42 @@ router = APIRouter(
 
 @router.get(
     "/", status_code=status.HTTP_200_OK,
-    response_model=List[CurrencyGroupResponse], response_model_exclude_unset=True
+    response_model=Union[List[CurrencyGroupResponse], CursorPage[CurrencyGroupResponse]],
+    response_model_exclude_unset=True
+)
+@cache(
+    expire=21600, local_expire=300, stale=3600,
+    tags=('currency_group', 'currency')
 )
-@cache(expire=300)
 async def read_all_currency_groups(
     request: Request,
-    db_session: AsyncSession = Depends(get_session)
+    db_session: AsyncSession = Depends(get_read_session)
 ):
     query_params: dict = process_query_params(request)
-    return [
-        CurrencyGroupResponse(**currency_group.__dict__).model_dump(exclude_unset=True)
-        async for currency_group in CurrencyGroup.read_all(
-            db_session,
-            **query_params
-        )
-    ]
+    return await read_all_or_raise_400(
+        db_session, CurrencyGroup, CurrencyGroupResponse, **query_params
+    )
 
 
 @router.get(
     "/{currency_group_id}", status_code=status.HTTP_200_OK,
     response_model=CurrencyGroupResponse, response_model_exclude_unset=True
 )
-@cache(expire=60)
+@cache(
+    expire=21600, local_expire=300, stale=3600,
+    tags=('currency_group:{currency_group_id}', 'currency')
+)
 async def read_currency_group(
     request: Request,
     currency_group_id: int = Path(...),
     include_currencies: Optional[bool] = 0,
-    db_session: AsyncSession = Depends(get_session)
+    db_session: AsyncSession = Depends(get_read_session)
 ):
     currency_group = await get_object_or_raise_404(
         db_session, CurrencyGroup, currency_group_id,
         include_currencies=include_currencies
     )
-    return CurrencyGroupResponse(**currency_group.__dict__).model_dump(exclude_unset=True)
+    return CurrencyGroupResponse(**currency_group.__dict__)
 
 
 @router.post(
@@ -1,14 +1,19 @@
-from typing import List
+from datetime import date
+from typing import Dict, List, Literal, Optional, Union
 
-from fastapi import APIRouter, Depends, Path, status, Request
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.currency_api.service.db_service import get_session
+from backend.currency_api.service.db_service import get_session, get_read_session
+from backend.currency_api.service.convert_service import read_cross_rates, \
+    read_cross_rates_json
 from backend.currency_api.util import get_object_or_raise_404, create_object_or_raise_400, \
-    update_object_or_raise_400, process_query_params, cache
-from backend.currency_api.model import CurrencyRate
+    update_object_or_raise_400, read_all_or_raise_400, process_query_params, cache, \
+    verify_stream_token, stream_all
+from backend.currency_api.model import CurrencyRate, CurrencyRateRollup
 from backend.currency_api.schema import CurrencyRateSchema, PartialCurrencyRateSchema, \
-    CurrencyRateResponse
+    CurrencyRateResponse, CurrencyRateOHLCResponse, CursorPage
 
 router = APIRouter(
     prefix="/v1/currency_rate",
@@ -18,37 +23,113 @@ router = APIRouter(
 
 @router.get(
     "/", status_code=status.HTTP_200_OK,
-    response_model=List[CurrencyRateResponse], response_model_exclude_unset=True
+    response_model=Union[List[CurrencyRateResponse], CursorPage[CurrencyRateResponse]],
+    response_model_exclude_unset=True
 )
-@cache(expire=300)
+@cache(expire=21600, stale=3600, tags=('currency_rate',))
 async def read_all_currency_rates(
     request: Request,
-    db_session: AsyncSession = Depends(get_session)
+    db_session: AsyncSession = Depends(get_read_session)
 ):
     query_params: dict = process_query_params(request)
+    return await read_all_or_raise_400(
+        db_session, CurrencyRate, CurrencyRateResponse, **query_params
+    )
+
+
+@router.get(
+    "/latest", status_code=status.HTTP_200_OK,
+    response_model=List[CurrencyRateResponse], response_model_exclude_unset=True
+)
+@cache(expire=21600, stale=3600, tags=('currency_rate', 'currency'))
+async def read_latest_currency_rates(
+    request: Request,
+    char_code: Optional[str] = None,
+    db_session: AsyncSession = Depends(get_read_session)
+):
     return [
-        CurrencyRateResponse(**currency_rate.__dict__).model_dump(exclude_unset=True)
-        async for currency_rate in CurrencyRate.read_all(
+        CurrencyRateResponse(**currency_rate.__dict__)
+        async for currency_rate in CurrencyRate.read_latest(
             db_session,
-            **query_params
+            char_codes=char_code.upper().split(',') if char_code else None
+        )
+    ]
+
+
+@router.get(
+    "/ohlc", status_code=status.HTTP_200_OK,
+    response_model=List[CurrencyRateOHLCResponse]
+)
+@cache(expire=21600, stale=3600, tags=('currency_rate', 'currency'))
+async def read_currency_rates_ohlc(
+    request: Request,
+    period: Literal['day', 'week', 'month'] = 'day',
+    char_code: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db_session: AsyncSession = Depends(get_read_session)
+):
+    return [
+        CurrencyRateOHLCResponse(**row)
+        for row in await CurrencyRateRollup.read_ohlc(
+            db_session, period,
+            char_codes=char_code.upper().split(',') if char_code else None,
+            start=start, end=end
         )
     ]
 
 
+@router.get(
+    "/matrix", status_code=status.HTTP_200_OK,
+    response_model=Dict[str, float]
+)
+async def read_cross_rate_matrix(
+    request: Request,
+    pairs: Optional[str] = None
+):
+    redis = request.app.state.redis
+    if not pairs:
+        # Full matrix is rendered once by the publisher
+        return Response(await read_cross_rates_json(redis), media_type='application/json')
+    try:
+        return await read_cross_rates(
+            redis, [tuple(pair.upper().split('/')) for pair in pairs.split(',')]
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"[CurrencyRate] Invalid pairs: {e}"
+        ) from e
+
+
+@router.get(
+    "/stream", status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse, dependencies=[Depends(verify_stream_token)]
+)
+async def stream_currency_rates(
+    request: Request,
+    stream_format: Literal['ndjson', 'json'] = Query('ndjson', alias='format')
+):
+    query_params = dict(request.query_params)
+    query_params.pop('format', None)
+    query_params.pop('cursor', None)
+    return stream_all(CurrencyRate, CurrencyRateResponse, stream_format, **query_params)
+
+
 @router.get(
     "/{currency_rate_id}", status_code=status.HTTP_200_OK,
     response_model=CurrencyRateResponse, response_model_exclude_unset=True
 )
-@cache(expire=60)
+@cache(expire=21600, tags=('currency_rate:{currency_rate_id}',))
 async def read_currency_rate(
     request: Request,
     currency_rate_id: int = Path(...),
-    db_session: AsyncSession = Depends(get_session)
+    db_session: AsyncSession = Depends(get_read_session)
 ):
     currency_rate = await get_object_or_raise_404(
         db_session, CurrencyRate, currency_rate_id
     )
-    return CurrencyRateResponse(**currency_rate.__dict__).model_dump(exclude_unset=True)
+    return CurrencyRateResponse(**currency_rate.__dict__)
 
 
 @router.post(
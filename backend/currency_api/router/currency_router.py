@@ -1,13 +1,14 @@
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 
-from fastapi import APIRouter, Depends, Path, status, Request
+from fastapi import APIRouter, Depends, Path, Query, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.currency_api.service.db_service import get_session
+from backend.currency_api.service.db_service import get_session, get_read_session
 from backend.currency_api.util import get_object_or_raise_404, create_object_or_raise_400, \
-    update_object_or_raise_400, process_query_params, cache
-from backend.currency_api.model import Currency
-from backend.currency_api.schema import CurrencySchema, PartialCurrencySchema, CurrencyResponse
+    update_object_or_raise_400, read_all_or_raise_400, process_query_params, cache
+from backend.currency_api.model import Currency, CurrencyRate
+from backend.currency_api.schema import CurrencySchema, PartialCurrencySchema, CurrencyResponse, \
+    CursorPage, IndependentCurrencyRateSchema
 
 router = APIRouter(
     prefix="/v1/currency",
@@ -15,42 +16,81 @@ router = APIRouter(
 )
 
 
+async def include_latest_rates(
+    db_session: AsyncSession, currencies: List[CurrencyResponse], limit: int
+) -> None:
+    '''
+    Fill `currency_rates` of the currencies with their newest rates only (single query)
+
+    Used by `include_currency_rates=latest` / `rates_limit=N` instead of loading every rate.
+    '''
+    rates = {currency.id: [] for currency in currencies}
+    if not rates:
+        return
+    async for currency_rate in CurrencyRate.read_latest(
+        db_session, limit=limit, currency_ids=list(rates)
+    ):
+        rates[currency_rate.currency_id].append(
+            IndependentCurrencyRateSchema(**currency_rate.__dict__)
+        )
+    for currency in currencies:
+        currency.currency_rates = rates[currency.id]
+
+
 @router.get(
     "/", status_code=status.HTTP_200_OK,
-    response_model=List[CurrencyResponse], response_model_exclude_unset=True
+    response_model=Union[List[CurrencyResponse], CursorPage[CurrencyResponse]],
+    response_model_exclude_unset=True
+)
+@cache(
+    expire=21600, local_expire=300, stale=3600,
+    tags=('currency', 'currency_rate')
 )
-@cache(expire=300)
 async def read_all_currencies(
     request: Request,
-    include_currency_rates: Optional[bool] = 0,
-    db_session: AsyncSession = Depends(get_session)
+    include_currency_rates: Optional[Union[bool, Literal['latest']]] = None,
+    rates_limit: Optional[int] = Query(None, ge=1, le=100),
+    db_session: AsyncSession = Depends(get_read_session)
 ):
     query_params: dict = process_query_params(request)
-    return [
-        CurrencyResponse(**currency.__dict__).model_dump(exclude_unset=True)
-        async for currency in Currency.read_all(
-            db_session,
-            **query_params
+    latest = include_currency_rates == 'latest' or rates_limit is not None
+    if latest:
+        query_params.pop('include_currency_rates', None)
+    result = await read_all_or_raise_400(
+        db_session, Currency, CurrencyResponse, **query_params
+    )
+    if latest:
+        await include_latest_rates(
+            db_session, result.items if isinstance(result, CursorPage) else result,
+            rates_limit or 1
         )
-    ]
+    return result
 
 
 @router.get(
     "/{currency_id}", status_code=status.HTTP_200_OK,
     response_model=CurrencyResponse, response_model_exclude_unset=True
 )
-@cache(expire=60)
+@cache(
+    expire=21600, local_expire=300, stale=3600,
+    tags=('currency:{currency_id}', 'currency_rate')
+)
 async def read_currency(
     request: Request,
     currency_id: int = Path(...),
-    include_currency_rates: Optional[bool] = 0,
-    db_session: AsyncSession = Depends(get_session)
+    include_currency_rates: Optional[Union[bool, Literal['latest']]] = None,
+    rates_limit: Optional[int] = Query(None, ge=1, le=100),
+    db_session: AsyncSession = Depends(get_read_session)
 ):
+    latest = include_currency_rates == 'latest' or rates_limit is not None
     currency = await get_object_or_raise_404(
         db_session, Currency, currency_id,
-        include_currency_rates=include_currency_rates
+        include_currency_rates=int(not latest and bool(include_currency_rates))
     )
-    return CurrencyResponse(**currency.__dict__).model_dump(exclude_unset=True)
+    result = CurrencyResponse(**currency.__dict__)
+    if latest:
+        await include_latest_rates(db_session, [result], rates_limit or 1)
+    return result
 
 
 @router.post(
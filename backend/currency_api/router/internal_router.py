@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, status
+
+from backend.currency_api.service.cache_service import local_cache
+from backend.currency_api.service.pool_service import pool_stats
+from backend.currency_api.service.slow_query_service import slow_queries
+from backend.currency_api.util import verify_internal_token
+
+router = APIRouter(
+    prefix="/internal",
+    tags=['Internal'],
+    include_in_schema=False
+)
+
+
+@router.get("/cache", status_code=status.HTTP_200_OK)
+async def read_cache_stats():
+    '''
+    In-process cache stats of the worker serving the request
+    '''
+    return {
+        'local': local_cache.stats()
+    }
+
+
+@router.get("/pool", status_code=status.HTTP_200_OK)
+async def read_pool_stats():
+    '''
+    Db connection pools stats of the worker serving the request
+    '''
+    return pool_stats()
+
+
+@router.get(
+    "/slow_queries", status_code=status.HTTP_200_OK,
+    dependencies=[Depends(verify_internal_token)]
+)
+async def read_slow_queries():
+    '''
+    Last slow statements of the worker serving the request, newest first\n
+    Statements carry their bound parameters, so the `INTERNAL_TOKEN` bearer is required
+    '''
+    return slow_queries.stats()
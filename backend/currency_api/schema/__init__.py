@@ -4,3 +4,7 @@ from .currency_schema import CurrencySchema, PartialCurrencySchema, \
     IndependentCurrencySchema, CurrencyResponse
 from .currency_rate_schema import CurrencyRateSchema, PartialCurrencyRateSchema, \
     IndependentCurrencyRateSchema, CurrencyRateResponse
+from .page_schema import CursorPage
+from .convert_schema import ConvertSchema, ConvertResponse, ConvertBatchSchema, \
+    ConvertBatchResponse
+from .currency_rate_rollup_schema import CurrencyRateOHLCResponse
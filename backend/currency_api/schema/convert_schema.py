@@ -0,0 +1,56 @@
+from typing import List
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ConvertSchema(BaseModel):
+    """
+    Pydantic schema for a single conversion.
+
+    Attributes:
+    ----------
+    - from: character code of the source currency.
+    - to: character code of the target currency.
+    - amount: amount in the source currency.
+    """
+    from_code: str = Field(alias='from', min_length=3, max_length=3)
+    to_code: str = Field(alias='to', min_length=3, max_length=3)
+    amount: float
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class ConvertResponse(ConvertSchema):
+    """
+    Pydantic schema for a single conversion result.
+
+    Attributes:
+    ----------
+    - from: character code of the source currency.
+    - to: character code of the target currency.
+    - amount: amount in the source currency.
+    - result: amount in the target currency.
+    """
+    result: float
+
+
+class ConvertBatchSchema(BaseModel):
+    """
+    Pydantic schema for a batch of conversions.
+
+    Attributes:
+    ----------
+    - items: conversions to compute (up to 10000).
+    """
+    items: List[ConvertSchema] = Field(max_length=10000)
+
+
+class ConvertBatchResponse(BaseModel):
+    """
+    Pydantic schema for a batch of conversion results.
+
+    Attributes:
+    ----------
+    - results: converted amounts in the order of the requested items.
+    """
+    results: List[float]
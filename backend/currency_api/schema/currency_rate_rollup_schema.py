@@ -0,0 +1,35 @@
+from datetime import date
+
+from pydantic import BaseModel, ConfigDict
+
+
+class CurrencyRateOHLCResponse(BaseModel):
+    """
+    Pydantic schema for CurrencyRateRollup table data.
+
+    Attributes:
+    ----------
+    - currency_id: identifier of the currency associated with the entry.
+    - period: bucket length (day, week or month).
+    - bucket: first date of the bucket.
+    - open_value, high_value, low_value, close_value, mean_value: currency value aggregates.
+    - open_vunit_rate, high_vunit_rate, low_vunit_rate, close_vunit_rate, mean_vunit_rate:
+      currency vunit rate aggregates.
+    - count: amount of rates within the bucket.
+    """
+    currency_id: int
+    period: str
+    bucket: date
+    open_value: float
+    high_value: float
+    low_value: float
+    close_value: float
+    mean_value: float
+    open_vunit_rate: float
+    high_vunit_rate: float
+    low_vunit_rate: float
+    close_vunit_rate: float
+    mean_vunit_rate: float
+    count: int
+
+    model_config = ConfigDict(from_attributes=True)
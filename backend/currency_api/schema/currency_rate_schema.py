@@ -27,6 +27,8 @@ class CurrencyRateSchema(BaseModel):
 class PartialCurrencyRateSchema(CurrencyRateSchema, metaclass=_AllOptionalMeta):
     """
     Pydantic schema for CurrencyRate table data (PATCH).
+
+    `modified_at` (quotation date, part of the rate key) is kept by the updates.
     """
 
 
@@ -41,7 +43,7 @@ class IndependentCurrencyRateSchema(CurrencyRateSchema):
     - nominal: currency_rate nominal value.
     - value: currency_rate value with precision of 4.
     - vunit_rate: currency_rate vunit rate.
-    - modified_at: date the currency_rate was modified.
+    - modified_at: quotation date of the currency_rate (kept by the updates).
     """
     id: int
     modified_at: datetime
@@ -58,5 +60,5 @@ class CurrencyRateResponse(IndependentCurrencyRateSchema):
     - nominal: currency_rate nominal value.
     - value: currency_rate value with precision of 4.
     - vunit_rate: currency_rate vunit rate.
-    - modified_at: date the currency_rate was modified.
+    - modified_at: quotation date of the currency_rate (kept by the updates).
     """
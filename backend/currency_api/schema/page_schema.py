@@ -0,0 +1,18 @@
+from typing import Generic, List, Optional, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar('T')
+
+
+class CursorPage(BaseModel, Generic[T]):
+    """
+    Pydantic schema for keyset paginated list responses.
+
+    Attributes:
+    ----------
+    - items: objects of the page.
+    - next_cursor: opaque cursor of the following page (None for the last page).
+    """
+    items: List[T]
+    next_cursor: Optional[str] = None
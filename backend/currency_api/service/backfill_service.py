@@ -0,0 +1,139 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Dict, Iterator, Optional, Set
+from datetime import date, timedelta
+
+from backend.currency_api.config import CBR_URL, BACKFILL_CONCURRENCY, BACKFILL_CHECKPOINT_PATH
+from backend.currency_api.service.db_service import TaskAsyncSessionFactory
+from backend.currency_api.service.ingest_service import upsert_rates
+from backend.currency_api.service.parse_service import get_rate_records
+from backend.currency_api.service.partition_service import ensure_partitions
+from backend.currency_api.service.redis_service import get_redis
+from backend.currency_api.service.cache_service import invalidate, pop_cache_tags
+
+logger = logging.getLogger(__name__)
+
+
+def date_range(start: date, end: date) -> Iterator[date]:
+    '''
+    Function yields every date from `start` to `end` inclusive
+    '''
+    for offset in range((end - start).days + 1):
+        yield start + timedelta(days=offset)
+
+
+def read_checkpoint(path: str, start: date, end: date) -> Optional[date]:
+    '''
+    Function returns the last date of the range stored without gaps before it
+
+    :param path : checkpoint file path
+    :type path : str
+    :returns : checkpoint date or None if the range was never started
+    :rtype : date | None
+    '''
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as checkpoint_file:
+        checkpoints: Dict[str, str] = json.load(checkpoint_file)
+    checkpoint = checkpoints.get(f'{start.isoformat()}:{end.isoformat()}')
+    return date.fromisoformat(checkpoint) if checkpoint else None
+
+
+def write_checkpoint(path: str, start: date, end: date, checkpoint: date) -> None:
+    '''
+    Function stores the checkpoint of the provided range
+    '''
+    checkpoints: Dict[str, str] = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as checkpoint_file:
+            checkpoints = json.load(checkpoint_file)
+    checkpoints[f'{start.isoformat()}:{end.isoformat()}'] = checkpoint.isoformat()
+    with open(path, 'w', encoding='utf-8') as checkpoint_file:
+        json.dump(checkpoints, checkpoint_file, indent=4)
+
+
+async def backfill_from_cbr(
+    start: date, end: date,
+    concurrency: int = BACKFILL_CONCURRENCY,
+    checkpoint_path: str = BACKFILL_CHECKPOINT_PATH,
+    link: str = CBR_URL,
+    resume: bool = True
+) -> int:
+    '''
+    Function loads historical cbr rates for the provided date range
+
+    Days are fetched concurrently (at most `concurrency` requests at once) and handed over
+    to a single writer, which stores every day in its own transaction as soon as it arrives.
+    Monthly partitions of the range are created beforehand (Postgres).
+    The checkpoint follows the last day stored without gaps, so an interrupted backfill
+    resumes from it.
+
+    :param start : first date of the range
+    :type start : date
+    :param end : last date of the range (inclusive)
+    :type end : date
+    :param concurrency : max amount of simultaneous requests to cbr
+    :type concurrency : int
+    :param checkpoint_path : checkpoint file path
+    :type checkpoint_path : str
+    :param link : XML_daily.asp link
+    :type link : str
+    :param resume : continue from the stored checkpoint
+    :type resume : bool
+    :returns : amount of inserted or updated rates
+    :rtype : int
+    '''
+    checkpoint = read_checkpoint(checkpoint_path, start, end) if resume else None
+    first_day = checkpoint + timedelta(days=1) if checkpoint else start
+    days = date_range(first_day, end)
+    pending = list(date_range(first_day, end))
+    stored: Set[date] = set()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def fetch() -> None:
+        for day in days:
+            try:
+                rate_records = await get_rate_records(f'{link}?date_req={day:%d/%m/%Y}')
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Backfill: failed to fetch cbr data for %s', day)
+                rate_records = None
+            await queue.put((day, rate_records))
+
+    async def store() -> int:
+        rows, position = 0, 0
+        async with TaskAsyncSessionFactory() as session:
+            for _ in range(len(pending)):
+                day, rate_records = await queue.get()
+                if not rate_records:
+                    logger.warning('Backfill: no cbr data received for %s', day)
+                    continue
+                rows += await upsert_rates(session, *rate_records)
+                await invalidate(redis, pop_cache_tags(session))
+                stored.add(day)
+
+                # Advance the checkpoint over the days stored without gaps
+                advanced = position
+                while advanced < len(pending) and pending[advanced] in stored:
+                    advanced += 1
+                if advanced != position:
+                    position = advanced
+                    write_checkpoint(checkpoint_path, start, end, pending[position - 1])
+        return rows
+
+    if pending:
+        async with TaskAsyncSessionFactory() as session:
+            created = await ensure_partitions(session, first_day, end)
+        if created:
+            logger.info('Backfill: created currency_rate partitions %s', ', '.join(created))
+
+    redis = await get_redis()
+    fetchers = [asyncio.create_task(fetch()) for _ in range(max(concurrency, 1))]
+    try:
+        return await store()
+    finally:
+        for fetcher in fetchers:
+            fetcher.cancel()
+        await asyncio.gather(*fetchers, return_exceptions=True)
+        await redis.aclose()
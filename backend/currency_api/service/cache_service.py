@@ -0,0 +1,391 @@
+import os
+import time
+import json
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, \
+    Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Generation counters must outlive any cache entry, otherwise an expired counter
+# could make a stale entry look fresh again
+CACHE_TAG_TTL = int(os.environ.get('CACHE_TAG_TTL', 7 * 24 * 3600))
+CACHE_LOCAL_SIZE = int(os.environ.get('CACHE_LOCAL_SIZE', 1024))
+# Recompute lock lifetime and how long the others wait for the lock holder result
+CACHE_LOCK_TTL = float(os.environ.get('CACHE_LOCK_TTL', 10))
+CACHE_LOCK_WAIT = float(os.environ.get('CACHE_LOCK_WAIT', 3))
+CACHE_LOCK_POLL = 0.05
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCache:
+    '''
+    Size bounded in-process LRU cache with per entry expiration and tag invalidation
+
+    Attributes
+    ----------
+    max_size: int
+        max amount of stored entries, the least recently used one is evicted first
+    epoch: int
+        invalidation counter, taken before computing a result to be stored
+    hits: int
+        amount of lookups served from the cache
+    misses: int
+        amount of lookups missed (absent or expired entries)
+    evictions: int
+        amount of entries dropped due to the size limit
+
+    Methods
+    ----------
+    get(key: str):
+        Returns the stored result or None.
+    set(key: str, result: Any, tags: Iterable[str], expire: int, epoch: int):
+        Stores the result unless its tags were invalidated after the `epoch`.
+    invalidate(tags: Iterable[str]):
+        Drops entries depending on any of the tags.
+    stale(tags: Iterable[str], epoch: int):
+        Whether any of the tags was invalidated after the `epoch`.
+    clear():
+        Drops all entries.
+    '''
+
+    def __init__(self, max_size: int = CACHE_LOCAL_SIZE):
+        self.max_size = max_size
+        self.epoch = 0
+        self.hits = self.misses = self.evictions = 0
+        self._cleared_epoch = 0
+        self._entries: OrderedDict[str, Tuple[Any, Set[str], float]] = OrderedDict()
+        self._tag_keys: Dict[str, Set[str]] = {}
+        self._tag_epochs: Dict[str, int] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[2] < time.monotonic():
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, result: Any, tags: Iterable[str], expire: int, epoch: int) -> None:
+        tags = set(tags)
+        # Result was computed before an invalidation of its tags arrived
+        if self.stale(tags, epoch):
+            return
+        self._drop(key)
+        self._entries[key] = (result, tags, time.monotonic() + expire)
+        for tag in tags:
+            self._tag_keys.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        self.epoch += 1
+        # Keep the bookkeeping bounded, in-flight results are then treated as stale
+        if len(self._tag_epochs) > self.max_size * 10:
+            self._tag_epochs.clear()
+            self._cleared_epoch = self.epoch
+        for tag in tags:
+            self._tag_epochs[tag] = self.epoch
+            for key in self._tag_keys.pop(tag, set()):
+                self._drop(key)
+
+    def stale(self, tags: Iterable[str], epoch: int) -> bool:
+        return epoch < self._cleared_epoch or \
+            any(self._tag_epochs.get(tag, 0) > epoch for tag in tags)
+
+    def clear(self) -> None:
+        self.epoch += 1
+        self._cleared_epoch = self.epoch
+        self._entries.clear()
+        self._tag_keys.clear()
+        self._tag_epochs.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[1]:
+            keys = self._tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
+
+
+# Per worker process cache tier in front of redis
+local_cache = LocalCache()
+# Background refreshes of stale entries (strong references until done)
+_refreshes: Set[asyncio.Task] = set()
+
+
+def tag_key(tag: str) -> str:
+    '''
+    Redis key of the tag generation counter
+    '''
+    return f'cache:tag:{tag}'
+
+
+def instance_tags(instance) -> Set[str]:
+    '''
+    Function returns cache tags depending on the provided model instance
+
+    :returns : table tag and table:id tag
+    :rtype : Set[str]
+    '''
+    table = getattr(instance, '__tablename__', None)
+    if table is None:
+        return set()
+    return {table, f'{table}:{instance.id}'}
+
+
+def add_cache_tags(session: Session, *tags: str) -> None:
+    '''
+    Function marks tags as changed by the current transaction of the session
+
+    Used for Core statements, which bypass the ORM flush.
+    '''
+    session.info.setdefault('pending_cache_tags', set()).update(tags)
+
+
+def pop_cache_tags(session: Session) -> Set[str]:
+    '''
+    Function returns and forgets tags changed by the committed transactions of the session
+    '''
+    return session.info.pop('cache_tags', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tags(session: Session, _flush_context) -> None:
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        add_cache_tags(session, *instance_tags(instance))
+
+
+@event.listens_for(Session, 'after_commit')
+def _commit_tags(session: Session) -> None:
+    session.info.setdefault('cache_tags', set()).update(
+        session.info.pop('pending_cache_tags', set())
+    )
+
+
+@event.listens_for(Session, 'after_rollback')
+def _rollback_tags(session: Session) -> None:
+    session.info.pop('pending_cache_tags', None)
+
+
+async def invalidate(redis: Optional[Redis], tags: Iterable[str]) -> None:
+    '''
+    Function bumps generation counters of the provided tags
+
+    Every cache entry stored with an older generation of any of its tags becomes stale.
+    '''
+    tags = set(tags)
+    if not tags:
+        return
+    local_cache.invalidate(tags)
+    if redis is None:
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        for tag in tags:
+            pipe.incr(tag_key(tag))
+            pipe.expire(tag_key(tag), CACHE_TAG_TTL)
+        # Other worker processes drop their local entries
+        pipe.publish(INVALIDATION_CHANNEL, json.dumps(sorted(tags)))
+        await pipe.execute()
+
+
+async def listen_invalidations(
+    redis: Redis, on_invalidate: Optional[Callable[[List[str]], None]] = None
+) -> None:
+    '''
+    Function keeps the local cache of the worker in sync with invalidations of other processes
+
+    :param on_invalidate : optional callback receiving invalidated tags
+    :type on_invalidate : Callable[[List[str]], None] | None
+    '''
+    while True:
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Invalidations could have been missed while unsubscribed
+                local_cache.clear()
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        tags = json.loads(message['data'])
+                        local_cache.invalidate(tags)
+                        if on_invalidate is not None:
+                            on_invalidate(tags)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Cache invalidation listener failed, resubscribing')
+            local_cache.clear()
+            await asyncio.sleep(1)
+
+
+class CacheEntry(NamedTuple):
+    '''
+    Cached response body
+
+    Attributes
+    ----------
+    body: bytes
+        encoded response body
+    fresh: bool
+        whether the entry is within its expiration time (otherwise within the stale window)
+    '''
+    body: bytes
+    fresh: bool
+
+
+async def get_entry(redis: Redis, key: str, tags: List[str]) -> Tuple[Optional[CacheEntry], list]:
+    '''
+    Function reads the cache entry and current generations of its tags in a single round trip
+
+    :returns : cache entry (None if missing or invalidated) and current tag generations
+    :rtype : Tuple[CacheEntry | None, list]
+    '''
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.get(key)
+        if tags:
+            pipe.mget([tag_key(tag) for tag in tags])
+        cached, *generations = await pipe.execute()
+
+    generations = [int(generation or 0) for generation in generations[0]] if generations else []
+    if cached is None:
+        return None, generations
+    # Only the small header is decoded, the body is returned as stored
+    header, body = cached.split(b'\n', 1)
+    header = json.loads(header)
+    if header['generations'] != generations:
+        return None, generations
+    return CacheEntry(body, header['fresh_until'] > time.time()), generations
+
+
+async def set_entry(
+    redis: Redis, key: str, body: bytes, generations: list, expire: int, stale: int = 0
+) -> None:
+    '''
+    Function stores the encoded body along with the tag generations it was computed for
+
+    The entry is kept for `stale` seconds after its expiration to be served while refreshing.
+    '''
+    header = json.dumps({'generations': generations, 'fresh_until': time.time() + expire})
+    await redis.set(key, header.encode() + b'\n' + body, ex=expire + stale)
+
+
+async def acquire_lock(redis: Redis, key: str) -> Optional[str]:
+    '''
+    Function takes the short-lived recompute lock of the cache key
+
+    :returns : lock token or None if the lock is held by someone else
+    :rtype : str | None
+    '''
+    token = uuid.uuid4().hex
+    if await redis.set(f'{key}:lock', token, nx=True, px=int(CACHE_LOCK_TTL * 1000)):
+        return token
+    return None
+
+
+async def release_lock(redis: Redis, key: str, token: str) -> None:
+    '''
+    Function releases the recompute lock unless it already expired and was taken by another
+    '''
+    async with redis.pipeline() as pipe:
+        await pipe.watch(f'{key}:lock')
+        if await pipe.get(f'{key}:lock') in (token, token.encode()):
+            pipe.multi()
+            pipe.delete(f'{key}:lock')
+            try:
+                await pipe.execute()
+            except WatchError:
+                pass
+
+
+async def get_or_compute(
+    redis: Redis, key: str, tags: List[str],
+    compute: Callable[[], Awaitable[bytes]], refresh: Callable[[], Awaitable[bytes]],
+    expire: int, stale: int = 0
+) -> bytes:
+    '''
+    Function returns the cached body, computing it at most once across all workers
+
+    Expired entries are served within the `stale` window while a single background `refresh`
+    recomputes them. On a miss the lock holder runs `compute`, others wait for its result
+    (up to CACHE_LOCK_WAIT seconds) instead of running the same query.
+
+    :param compute : coroutine function computing the body within the request
+    :type compute : Callable[[], Awaitable[bytes]]
+    :param refresh : coroutine function computing the body after the request is served
+    :type refresh : Callable[[], Awaitable[bytes]]
+    :returns : cached or computed body
+    :rtype : bytes
+    '''
+    entry, generations = await get_entry(redis, key, tags)
+    if entry is not None:
+        if not entry.fresh:
+            token = await acquire_lock(redis, key)
+            if token is not None:
+                task = asyncio.create_task(
+                    _refresh(redis, key, token, refresh, generations, expire, stale)
+                )
+                _refreshes.add(task)
+                task.add_done_callback(_refreshes.discard)
+        return entry.body
+
+    token = await acquire_lock(redis, key)
+    deadline = time.monotonic() + CACHE_LOCK_WAIT
+    while token is None and time.monotonic() < deadline:
+        await asyncio.sleep(CACHE_LOCK_POLL)
+        entry, generations = await get_entry(redis, key, tags)
+        if entry is not None:
+            return entry.body
+        # The holder failed or released the lock without storing anything
+        token = await acquire_lock(redis, key)
+
+    if token is not None:
+        # Result could have been stored right before the lock was taken
+        entry, generations = await get_entry(redis, key, tags)
+        if entry is not None:
+            await release_lock(redis, key, token)
+            return entry.body
+
+    try:
+        body = await compute()
+        await set_entry(redis, key, body, generations, expire, stale)
+        return body
+    finally:
+        if token is not None:
+            await release_lock(redis, key, token)
+
+
+async def _refresh(
+    redis: Redis, key: str, token: str, refresh: Callable[[], Awaitable[bytes]],
+    generations: list, expire: int, stale: int
+) -> None:
+    try:
+        await set_entry(redis, key, await refresh(), generations, expire, stale)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception('Cache refresh of %s failed', key)
+    finally:
+        await release_lock(redis, key, token)
@@ -0,0 +1,242 @@
+import json
+import time
+import asyncio
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.currency_api.model import Currency, CurrencyRate
+from backend.currency_api.service.db_service import read_session
+from backend.currency_api.service.cache_service import local_cache, get_entry, set_entry, \
+    CACHE_TAG_TTL
+
+BASE_CURRENCY = 'RUB'
+# Dropped earlier by the `currency_rate` / `currency` tag invalidation after every ingest
+RATE_VECTOR_EXPIRE = 24 * 3600
+CROSS_RATES_KEY = 'currency_rate:cross_rates'
+CROSS_RATES_TAGS = ['currency_rate', 'currency']
+
+_rate_vector_lock = asyncio.Lock()
+# Rate vector of the worker process, local cache epoch it was built at and its expiration
+_rate_vector_slot: Optional[Tuple['RateVector', int, float]] = None
+
+
+def char_code_indices(sorted_char_codes: np.ndarray, char_codes: Sequence[str]) -> np.ndarray:
+    '''
+    Function returns positions of the currencies in the sorted character codes array
+
+    :raises ValueError : if any of the currencies is unknown
+    '''
+    char_codes = np.asarray(char_codes, dtype=str)
+    indices = np.searchsorted(sorted_char_codes, char_codes)
+    indices[indices == len(sorted_char_codes)] = 0
+    unknown = sorted_char_codes[indices] != char_codes
+    if unknown.any():
+        raise ValueError(f"Unknown currencies: {', '.join(sorted(set(char_codes[unknown])))}")
+    return indices
+
+
+class RateVector(NamedTuple):
+    '''
+    Latest rates of every currency in rubles per unit
+
+    Attributes
+    ----------
+    char_codes: np.ndarray
+        sorted currency character codes
+    rates: np.ndarray
+        vunit rates aligned with `char_codes` (1.0 for the base currency)
+    '''
+    char_codes: np.ndarray
+    rates: np.ndarray
+
+    def indices(self, char_codes: Sequence[str]) -> np.ndarray:
+        '''
+        Function returns positions of the currencies in the vector
+
+        :raises ValueError : if any of the currencies is unknown
+        '''
+        return char_code_indices(self.char_codes, char_codes)
+
+    def convert(
+        self, from_codes: Sequence[str], to_codes: Sequence[str], amounts: Sequence[float]
+    ) -> np.ndarray:
+        '''
+        Function converts every amount between the currencies of the same position
+
+        :returns : converted amounts
+        :rtype : np.ndarray
+        '''
+        return np.asarray(amounts, dtype=np.float64) \
+            * self.rates[self.indices(from_codes)] / self.rates[self.indices(to_codes)]
+
+
+async def build_rate_vector(session: AsyncSession) -> RateVector:
+    '''
+    Function reads the latest vunit rate of every currency
+
+    :returns : rate vector including the base currency
+    :rtype : RateVector
+    '''
+    char_codes = dict((await session.execute(select(Currency.id, Currency.char_code))).all())
+    rates = {BASE_CURRENCY: 1.0}
+    async for currency_rate in CurrencyRate.read_latest(session):
+        rates[char_codes[currency_rate.currency_id]] = currency_rate.vunit_rate
+
+    ordered: List[str] = sorted(rates)
+    return RateVector(
+        np.array(ordered),
+        np.array([rates[char_code] for char_code in ordered], dtype=np.float64)
+    )
+
+
+async def get_rate_vector(redis: Redis) -> RateVector:
+    '''
+    Function returns the rate vector of the worker process
+
+    The vector has its own slot next to the local cache, so it's never evicted by the cached
+    responses, and is dropped by the same `currency_rate` / `currency` tag invalidation.
+    It's rebuilt (once per worker) from the published cross rate matrix, the base currency
+    column of which holds the rates.
+
+    :returns : rate vector
+    :rtype : RateVector
+    '''
+    global _rate_vector_slot  # pylint: disable=global-statement
+    rate_vector = _valid_rate_vector()
+    if rate_vector is not None:
+        return rate_vector
+    async with _rate_vector_lock:
+        rate_vector = _valid_rate_vector()
+        if rate_vector is None:
+            epoch = local_cache.epoch
+            char_codes, matrix = decode_cross_rates(await load_cross_rates(redis))
+            rate_vector = RateVector(
+                char_codes, matrix[:, char_code_indices(char_codes, [BASE_CURRENCY])[0]].copy()
+            )
+            _rate_vector_slot = (rate_vector, epoch, time.monotonic() + RATE_VECTOR_EXPIRE)
+    return rate_vector
+
+
+def _valid_rate_vector() -> Optional[RateVector]:
+    if _rate_vector_slot is None:
+        return None
+    rate_vector, epoch, expires_at = _rate_vector_slot
+    if expires_at < time.monotonic() or local_cache.stale(CROSS_RATES_TAGS, epoch):
+        return None
+    return rate_vector
+
+
+def encode_cross_rates(rate_vector: RateVector) -> bytes:
+    '''
+    Function computes the cross rate matrix and packs it as JSON header, float64 bytes
+    and the pre-rendered JSON of every pair
+
+    Row `i` column `j` holds the amount of currency `j` per unit of currency `i`.
+    '''
+    matrix = rate_vector.rates[:, None] / rate_vector.rates[None, :]
+    char_codes = rate_vector.char_codes.tolist()
+    header = json.dumps({'char_codes': char_codes})
+    rendered = json.dumps({
+        f'{from_code}/{to_code}': rate
+        for from_code, row in zip(char_codes, matrix.tolist())
+        for to_code, rate in zip(char_codes, row)
+    }, separators=(',', ':'))
+    return header.encode() + b'\n' + matrix.astype('<f8').tobytes() + rendered.encode()
+
+
+def _split_cross_rates(data: bytes) -> Tuple[List[str], int]:
+    header, _ = data.split(b'\n', 1)
+    return json.loads(header)['char_codes'], len(header) + 1
+
+
+def decode_cross_rates(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Function unpacks the cross rate matrix without copying it
+
+    :returns : sorted character codes and the matrix
+    :rtype : Tuple[np.ndarray, np.ndarray]
+    '''
+    char_codes, offset = _split_cross_rates(data)
+    size = len(char_codes)
+    matrix = np.frombuffer(data, dtype='<f8', count=size * size, offset=offset)
+    return np.array(char_codes), matrix.reshape(size, size)
+
+
+def cross_rates_json(data: bytes) -> bytes:
+    '''
+    Function returns the pre-rendered JSON of every pair (`FROM/TO` keys)
+    '''
+    char_codes, offset = _split_cross_rates(data)
+    return data[offset + len(char_codes) ** 2 * 8:]
+
+
+async def publish_cross_rates(redis: Redis, session: AsyncSession) -> bytes:
+    '''
+    Function stores the cross rate matrix of the latest rates in redis
+
+    The matrix is stored as a cache entry of the `currency_rate` and `currency` tags,
+    so any later rate change (not only the ingestion) makes it stale.
+
+    :returns : stored matrix
+    :rtype : bytes
+    '''
+    # Generations are taken before reading the rates, a concurrent write leaves it stale
+    _, generations = await get_entry(redis, CROSS_RATES_KEY, CROSS_RATES_TAGS)
+    data = encode_cross_rates(await build_rate_vector(session))
+    await set_entry(redis, CROSS_RATES_KEY, data, generations, CACHE_TAG_TTL)
+    return data
+
+
+async def load_cross_rates(redis: Redis) -> bytes:
+    '''
+    Function returns the packed cross rate matrix
+
+    The matrix is published by the ingestion, it's built from the db only if missing or stale.
+
+    :returns : packed matrix (see `encode_cross_rates`)
+    :rtype : bytes
+    '''
+    entry, generations = await get_entry(redis, CROSS_RATES_KEY, CROSS_RATES_TAGS)
+    if entry is not None:
+        return entry.body
+    async with read_session() as session:
+        data = encode_cross_rates(await build_rate_vector(session))
+    await set_entry(redis, CROSS_RATES_KEY, data, generations, CACHE_TAG_TTL)
+    return data
+
+
+async def read_cross_rates_json(redis: Redis) -> bytes:
+    '''
+    Function returns cross rates of every pair as JSON bytes, served as is
+
+    :returns : JSON object keyed by `FROM/TO`
+    :rtype : bytes
+    '''
+    return cross_rates_json(await load_cross_rates(redis))
+
+
+async def read_cross_rates(redis: Redis, pairs: List[Tuple[str, str]]) -> Dict[str, float]:
+    '''
+    Function returns cross rates of the provided pairs
+
+    :param pairs : (from, to) character codes
+    :type pairs : List[Tuple[str, str]]
+    :returns : cross rates keyed by `FROM/TO`
+    :rtype : Dict[str, float]
+    :raises ValueError : if any of the currencies is unknown
+    '''
+    if any(len(pair) != 2 for pair in pairs):
+        raise ValueError('pairs must be formatted as FROM/TO')
+    char_codes, matrix = decode_cross_rates(await load_cross_rates(redis))
+    from_codes, to_codes = zip(*pairs) if pairs else ((), ())
+    rates = matrix[
+        char_code_indices(char_codes, from_codes), char_code_indices(char_codes, to_codes)
+    ]
+    return {
+        f'{from_code}/{to_code}': rate
+        for from_code, to_code, rate in zip(from_codes, to_codes, rates.tolist())
+    }
@@ -1,13 +1,27 @@
 import os
-from typing import AsyncIterator
+import time
+import asyncio
+import logging
+import itertools
+from typing import AsyncIterator, Dict, List, Optional
 
 from dotenv import load_dotenv
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
 from sqlalchemy.pool import NullPool
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, \
+    create_async_engine
+
+from backend.currency_api.service.cache_service import invalidate, pop_cache_tags
+from backend.currency_api.service.pool_service import InstrumentedPool, instrument_engine
+from backend.currency_api.service.deadline_service import statement_timeout_ms
 
 env = os.environ.get
 load_dotenv('./.env')
 
+logger = logging.getLogger(__name__)
+
 TEST = env('TEST').lower() == "true"
 DEBUG = env('DEBUG').lower() == "true"
 POSTGRE_CON = (
@@ -17,25 +31,156 @@ POSTGRE_CON = (
 ENGINE_PARAMS = {
     'url': f'sqlite+aiosqlite:///{"test" if TEST else "currency_api"}.db'
     if (DEBUG or TEST) else POSTGRE_CON,
-    'pool_pre_ping': True,
+    'pool_pre_ping': env('DB_POOL_PRE_PING', 'true').lower() == "true",
     'echo': False
 }
+# Pooled engines settings (SQLAlchemy defaults unless set)
+POOL_PARAMS = {
+    'pool_size': int(env('DB_POOL_SIZE', 5)),
+    'max_overflow': int(env('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': float(env('DB_POOL_TIMEOUT', 30)),
+    'pool_recycle': int(env('DB_POOL_RECYCLE', -1)),
+    'pool_use_lifo': env('DB_POOL_USE_LIFO', 'false').lower() == "true",
+}
+# Optional comma separated read replica urls (postgresql+asyncpg://...)
+REPLICA_URLS = [
+    url.strip() for url in (env('POSTGRES_REPLICA_URLS') or '').split(',') if url.strip()
+]
+# Replicas lagging behind more than that (seconds) are skipped
+REPLICA_MAX_LAG = float(env('REPLICA_MAX_LAG', 10))
+REPLICA_CHECK_INTERVAL = float(env('REPLICA_CHECK_INTERVAL', 5))
+# Replay lag in seconds, an idle replica which replayed everything it received has no lag
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
 SESSION_PARAMS = {
     'autoflush': False,
     'expire_on_commit': False,
     'future': True
 }
 
-# API engine settings (default poolclass to maintain pool of db connections)
-async_engine = create_async_engine(
-    **ENGINE_PARAMS
-)
+
+def create_pooled_engine(name: str, url: Optional[str] = None) -> AsyncEngine:
+    '''
+    Engine with the configured connection pool, instrumented under the provided name
+
+    :param name : pool name in the pool stats
+    :type name : str
+    :param url : database url (the primary by default)
+    :type url : str | None
+    :returns : engine
+    :rtype : AsyncEngine
+    '''
+    return instrument_engine(
+        create_async_engine(
+            **{**ENGINE_PARAMS, 'url': url or ENGINE_PARAMS['url']},
+            **POOL_PARAMS,
+            poolclass=InstrumentedPool
+        ),
+        name
+    )
+
+
+# API engine settings (pool of db connections, see POOL_PARAMS)
+async_engine = create_pooled_engine('primary')
 AsyncSessionFactory = async_sessionmaker(
     bind=async_engine,
     **SESSION_PARAMS
 )
 
-# Task engine settings (NullPool poolclass to avoid connection reusage by different workers)
+
+class ReplicaSet:
+    '''
+    Read replicas with health and replication lag tracking
+
+    Reads are spread round-robin over the replicas which passed the last check within
+    `max_lag`, otherwise (no replicas, all of them down or lagging) they fail over to the
+    primary. After a write reads stay on the primary for `max_lag` seconds: in the writing
+    process from its commit on, in the other processes once the cache invalidation message
+    of the write arrives. Until then another process may still read from a replica behind
+    the write (by no more than `max_lag` of the last check), so read-after-write is
+    guaranteed within the writing process only and is eventual across processes.
+
+    Attributes
+    ----------
+    engines: List[AsyncEngine]
+        replica engines.
+    lag: Dict[AsyncEngine, float | None]
+        replication lag of the last check per replica, None if it failed (or never ran).
+    '''
+
+    def __init__(
+        self, engines: List[AsyncEngine], max_lag: float = REPLICA_MAX_LAG,
+        check_interval: float = REPLICA_CHECK_INTERVAL
+    ):
+        self.engines = engines
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: Dict[AsyncEngine, Optional[float]] = {engine: None for engine in engines}
+        self._counter = itertools.count()
+        self._primary_until = 0.0
+
+    def healthy(self) -> List[AsyncEngine]:
+        return [
+            engine for engine in self.engines
+            if self.lag[engine] is not None and self.lag[engine] <= self.max_lag
+        ]
+
+    def pick(self) -> Optional[AsyncEngine]:
+        '''
+        Replica engine to read from or None to read from the primary
+        '''
+        if time.monotonic() < self._primary_until:
+            return None
+        healthy = self.healthy()
+        return healthy[next(self._counter) % len(healthy)] if healthy else None
+
+    def hold_primary(self, *_) -> None:
+        '''
+        Route reads to the primary until replicas catch up with a write
+        '''
+        self._primary_until = time.monotonic() + self.max_lag
+
+    async def check(self, engine: AsyncEngine) -> Optional[float]:
+        try:
+            async with engine.connect() as conn:
+                if engine.dialect.name == 'postgresql':
+                    lag = float(
+                        await asyncio.wait_for(conn.scalar(REPLICA_LAG_QUERY), self.check_interval)
+                    )
+                else:
+                    await asyncio.wait_for(conn.execute(text('SELECT 1')), self.check_interval)
+                    lag = 0.0
+        except Exception:  # pylint: disable=broad-except
+            logger.warning('Replica %s is unavailable', engine.url, exc_info=True)
+            lag = None
+        self.lag[engine] = lag
+        return lag
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(self.check(engine) for engine in self.engines))
+
+    async def monitor(self) -> None:
+        '''
+        Function checks the replicas every `check_interval` seconds
+        '''
+        while True:
+            await self.check_all()
+            await asyncio.sleep(self.check_interval)
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            await engine.dispose()
+
+
+replicas = ReplicaSet([
+    create_pooled_engine(f'replica-{index}', url) for index, url in enumerate(REPLICA_URLS)
+])
+
+# Task engine settings (NullPool poolclass to avoid connection reusage by different workers),
+# celery worker processes swap it for a pooled engine of their own, see `use_pooled_task_engine`
 task_async_engine = create_async_engine(
     **ENGINE_PARAMS,
     poolclass=NullPool
@@ -46,6 +191,71 @@ TaskAsyncSessionFactory = async_sessionmaker(
 )
 
 
-async def get_session() -> AsyncIterator[async_sessionmaker]:
+def use_pooled_task_engine() -> AsyncEngine:
+    '''
+    Bind task sessions to a new pooled engine owned by the current process
+
+    Must be called in the forked process itself (celery `worker_process_init`), so the pool
+    is never shared with the parent or sibling processes. Connections inherited from the
+    parent are dropped without closing them, they belong to the parent.
+    '''
+    async_engine.sync_engine.dispose(close=False)
+    engine = create_pooled_engine('task')
+    TaskAsyncSessionFactory.configure(bind=engine)
+    return engine
+
+
+@event.listens_for(Session, 'after_begin')
+def _set_statement_timeout(_session: Session, _transaction, connection) -> None:
+    '''
+    Bound every statement of the transaction by the remaining request budget (Postgres only)
+
+    The server cancels the query itself once the deadline passes, so the connection goes back
+    to the pool instead of staying busy with an abandoned query. `SET LOCAL` ends with the
+    transaction and never leaks into other checkouts of the connection.
+    '''
+    timeout = statement_timeout_ms()
+    if timeout is not None and connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {timeout}')
+
+
+@event.listens_for(Session, 'before_commit')
+def _hold_primary_on_write(session: Session) -> None:
+    '''
+    Keep reads of the writing process on the primary before its write becomes visible
+    '''
+    if session.new or session.dirty or session.deleted or \
+            session.info.get('pending_cache_tags'):
+        replicas.hold_primary()
+
+
+async def get_session(request: Request) -> AsyncIterator[async_sessionmaker]:
+    '''
+    Request scoped db session dependency
+
+    The session checks out a pool connection only on its first statement, so requests served
+    from the cache (which never touches the session) don't use db connections at all.
+    '''
     async with AsyncSessionFactory() as session:
+        try:
+            yield session
+        finally:
+            # Drop cached responses depending on the committed changes
+            tags = pop_cache_tags(session)
+            await invalidate(getattr(request.app.state, 'redis', None), tags)
+
+
+def read_session() -> AsyncSession:
+    '''
+    Session of a healthy read replica (the primary if there is none), must not write
+    '''
+    engine = replicas.pick()
+    return AsyncSessionFactory(bind=engine) if engine is not None else AsyncSessionFactory()
+
+
+async def get_read_session() -> AsyncIterator[AsyncSession]:
+    '''
+    Request scoped read-only db session dependency (GET endpoints), see `read_session`
+    '''
+    async with read_session() as session:
         yield session
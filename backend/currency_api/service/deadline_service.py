@@ -0,0 +1,22 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+# Monotonic deadline of the request being served, None outside of requests or without a budget
+request_deadline: ContextVar[Optional[float]] = ContextVar('request_deadline', default=None)
+
+
+def remaining_budget() -> Optional[float]:
+    '''
+    Seconds left until the deadline of the current request (None without a deadline)
+    '''
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def statement_timeout_ms() -> Optional[int]:
+    '''
+    Postgres `statement_timeout` (at least 1ms) matching the remaining request budget
+    '''
+    remaining = remaining_budget()
+    return None if remaining is None else max(int(remaining * 1000), 1)
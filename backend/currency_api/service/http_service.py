@@ -0,0 +1,154 @@
+import asyncio
+import random
+import logging
+from functools import wraps
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+import aiohttp
+
+from backend.currency_api.config import PROXY, HEADERS, HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT, \
+    HTTP_RETRIES, HTTP_RETRY_BACKOFF, HTTP_POOL_SIZE
+
+# Statuses worth another attempt, everything else is returned to the caller as is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+
+class FetchResponse(NamedTuple):
+    status: int
+    content_type: str
+    charset: Optional[str]
+    body: bytes
+    # ETag and Last-Modified of a 200 response, see `HttpFetcher.remember`
+    validators: Tuple[Optional[str], Optional[str]] = (None, None)
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+    def text(self) -> str:
+        return self.body.decode(self.charset or 'utf-8')
+
+
+class HttpFetcher:
+    '''
+    Shared HTTP client with a connection pool, timeouts, retries and conditional requests
+
+    The pooled session is bound to the event loop it was opened in and is reopened when used
+    from another loop (every `async_to_sync` call of a celery task runs its own loop).
+
+    Attributes
+    ----------
+    validators: Dict[str, Tuple[str | None, str | None]]
+        ETag and Last-Modified of the last response per url whose content was stored.
+    '''
+
+    def __init__(
+        self, timeout: float = HTTP_TIMEOUT, connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        retries: int = HTTP_RETRIES, backoff: float = HTTP_RETRY_BACKOFF,
+        pool_size: int = HTTP_POOL_SIZE
+    ):
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.validators: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        '''
+        Pooled session of the running event loop
+        '''
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300),
+                timeout=self.timeout,
+                headers={'user-agent': HEADERS['user_agents'][1]} if HEADERS else {}
+            )
+            self._loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        '''
+        Close the pooled session if it belongs to the running event loop
+        '''
+        if self._session is None or self._loop is not asyncio.get_running_loop():
+            return
+        await self._session.close()
+        self._session = self._loop = None
+
+    def retry_delay(self, attempt: int) -> float:
+        '''
+        Exponential backoff with full jitter
+        '''
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    async def fetch(self, url: str, conditional: bool = False) -> FetchResponse:
+        '''
+        Function performs GET request, retrying connection errors, timeouts and 429/5xx
+
+        :param url : any http/https link
+        :type url : str
+        :param conditional : send If-None-Match/If-Modified-Since of the remembered response,
+            an unchanged resource comes back as 304 with an empty body
+        :type conditional : bool
+        :returns : response of the last attempt
+        :rtype : FetchResponse
+        :raises aiohttp.ClientError | asyncio.TimeoutError : when every attempt failed
+        '''
+        headers = {}
+        if conditional and url in self.validators:
+            etag, last_modified = self.validators[url]
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        attempt = 0
+        while True:
+            try:
+                async with self.get_session().get(url, headers=headers, proxy=PROXY) as response:
+                    if response.status not in RETRY_STATUSES or attempt == self.retries:
+                        body = b'' if response.status == 304 else await response.read()
+                        return FetchResponse(
+                            response.status, response.content_type, response.charset, body,
+                            (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                            if response.status == 200 else (None, None)
+                        )
+                    logger.warning('GET %s: %s, retrying', url, response.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                if attempt == self.retries:
+                    raise
+                logger.warning('GET %s: %r, retrying', url, exc)
+            await asyncio.sleep(self.retry_delay(attempt))
+            attempt += 1
+
+    def remember(self, url: str, response: FetchResponse) -> None:
+        '''
+        Make the next conditional request of the url relative to the response
+
+        Called only once the response content is stored, so a failure in between never turns
+        the unprocessed document into a 304.
+        '''
+        if response.status == 200:
+            self.validators[url] = response.validators
+
+
+fetcher = HttpFetcher()
+
+
+def with_fetcher(func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+    '''
+    Decorator closing the pooled session once the coroutine of a short-lived event loop
+    (cli command, celery task) is done
+    '''
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            await fetcher.close()
+    return wrapper
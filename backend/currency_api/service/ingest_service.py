@@ -0,0 +1,321 @@
+from datetime import date, datetime, time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+from xml.etree.ElementTree import Element, ParseError, XMLPullParser
+
+from sqlalchemy import Table, select, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.currency_api.config import MOSCOW_TZ
+from backend.currency_api.service.cache_service import add_cache_tags
+from backend.currency_api.model import CurrencyGroup, Currency, CurrencyRate, CurrencyRateRollup
+
+
+class RateRecord(NamedTuple):
+    '''
+    Typed CBR rate record
+
+    Attributes
+    ----------
+    num_code: int
+        currency numeric code
+    char_code: str
+        currency character code
+    name: str
+        currency full title
+    nominal: int
+        currency nominal value
+    value: float
+        currency value for the nominal
+    vunit_rate: float
+        currency value for a single unit
+    rate_date: date
+        date the rate was quoted for
+    '''
+    num_code: int
+    char_code: str
+    name: str
+    nominal: int
+    value: float
+    vunit_rate: float
+    rate_date: date
+
+
+def rate_timestamp(rate_date: date) -> datetime:
+    '''
+    Function returns `modified_at` stamp of the rates quoted for the provided date
+
+    :param rate_date : CBR quotation date
+    :type rate_date : date
+    :returns : midnight of the quotation date in Moscow timezone
+    :rtype : datetime
+    '''
+    return MOSCOW_TZ.localize(datetime.combine(rate_date, time.min))
+
+
+def parse_decimal(value: str) -> float:
+    '''
+    CBR decimals use a comma separator
+    '''
+    return float(value.replace(',', '.'))
+
+
+def records_from_val_curs(val_curs: dict) -> Tuple[str, List[RateRecord]]:
+    '''
+    Function converts xmltodict-like `ValCurs` document into typed records
+
+    :param val_curs : parsed XML_daily.asp document
+    :type val_curs : dict
+    :returns : currency group name and rate records
+    :rtype : Tuple[str, List[RateRecord]]
+    '''
+    data = val_curs['ValCurs']
+    rate_date = datetime.strptime(data['@Date'], "%d.%m.%Y").date()
+    rows = data.get('Valute') or []
+    # xmltodict collapses a single child into a dict
+    if isinstance(rows, dict):
+        rows = [rows]
+    return data['@name'], [
+        RateRecord(
+            num_code=int(row['NumCode']),
+            char_code=row['CharCode'],
+            name=row['Name'],
+            nominal=int(row['Nominal']),
+            value=parse_decimal(row['Value']),
+            # Documents before 2022 have no VunitRate
+            vunit_rate=parse_decimal(row['VunitRate']) if row.get('VunitRate')
+            else parse_decimal(row['Value']) / int(row['Nominal']),
+            rate_date=rate_date
+        )
+        for row in rows
+    ]
+
+
+class ValCursParser:
+    '''
+    Incremental XML_daily.asp parser yielding typed records as soon as each `Valute` ends
+
+    The document is fed in chunks of raw bytes (the encoding comes from the XML declaration,
+    windows-1251 for CBR), parsed elements are dropped right after conversion, so memory
+    doesn't grow with the document size.
+
+    Attributes
+    ----------
+    name: str
+        currency group name (`ValCurs` name attribute)
+    rate_date: date
+        quotation date of the document
+    '''
+
+    def __init__(self):
+        self._parser = XMLPullParser(events=('start', 'end'))
+        self._root: Optional[Element] = None
+        self.name: Optional[str] = None
+        self.rate_date: Optional[date] = None
+
+    def feed(self, chunk: bytes) -> Iterator[RateRecord]:
+        try:
+            self._parser.feed(chunk)
+        except ParseError as e:
+            raise ValueError(f'Malformed XML_daily.asp document: {e}') from e
+        return self._read_events()
+
+    def close(self) -> Iterator[RateRecord]:
+        try:
+            self._parser.close()
+        except ParseError as e:
+            raise ValueError(f'Malformed XML_daily.asp document: {e}') from e
+        return self._read_events()
+
+    def _read_events(self) -> Iterator[RateRecord]:
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                if self._root is None:
+                    if element.tag != 'ValCurs':
+                        raise ValueError(f'Unexpected root element {element.tag}, not ValCurs')
+                    self._root = element
+                    self.name = element.get('name')
+                    self.rate_date = datetime.strptime(element.get('Date', ''), "%d.%m.%Y").date()
+                continue
+            if element.tag != 'Valute':
+                continue
+            row = {child.tag: child.text for child in element}
+            nominal = int(row['Nominal'])
+            value = parse_decimal(row['Value'])
+            yield RateRecord(
+                num_code=int(row['NumCode']),
+                char_code=row['CharCode'],
+                name=row['Name'],
+                nominal=nominal,
+                value=value,
+                vunit_rate=parse_decimal(row['VunitRate']) if row.get('VunitRate')
+                else value / nominal,
+                rate_date=self.rate_date
+            )
+            # Drop parsed currencies, the document is never kept as a whole
+            self._root.clear()
+
+
+def parse_val_curs(chunks: Union[bytes, Iterable[bytes]]) -> Tuple[str, List[RateRecord]]:
+    '''
+    Function parses raw XML_daily.asp document into typed records
+
+    :param chunks : whole document or its consecutive chunks
+    :type chunks : bytes | Iterable[bytes]
+    :returns : currency group name and rate records
+    :rtype : Tuple[str, List[RateRecord]]
+    :raises ValueError : if the document is malformed or isn't a ValCurs one
+    '''
+    parser = ValCursParser()
+    records: List[RateRecord] = []
+    for chunk in [chunks] if isinstance(chunks, bytes) else chunks:
+        records.extend(parser.feed(chunk))
+    records.extend(parser.close())
+    return parser.name, records
+
+
+def _insert(session: AsyncSession, table: Table):
+    '''
+    Dialect specific INSERT supporting ON CONFLICT clause
+    '''
+    if session.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+async def resolve_currency_group(session: AsyncSession, name: str) -> int:
+    '''
+    Function returns id of the currency group, creating it within the current transaction
+
+    :returns : currency group id
+    :rtype : int
+    '''
+    currency_group_id = await session.scalar(
+        select(CurrencyGroup.id).where(CurrencyGroup.name == name).limit(1)
+    )
+    if currency_group_id is None:
+        currency_group = CurrencyGroup(name=name)
+        session.add(currency_group)
+        # Flushed only, committed together with the rates
+        await session.flush()
+        currency_group_id = currency_group.id
+    return currency_group_id
+
+
+async def upsert_currencies(
+    session: AsyncSession, currency_group_id: int, records: List[RateRecord]
+) -> Dict[str, int]:
+    '''
+    Function resolves ids of the record currencies, creating or updating changed ones
+
+    Issues a single SELECT and, only if anything differs, a single multi-row upsert.
+
+    :returns : currency ids by char code
+    :rtype : Dict[str, int]
+    '''
+    currency_table: Table = Currency.__table__
+    latest = {record.char_code: record for record in records}
+    existing = (
+        await session.execute(
+            select(
+                currency_table.c.id, currency_table.c.char_code, currency_table.c.num_code,
+                currency_table.c.name, currency_table.c.currency_group_id
+            ).where(currency_table.c.char_code.in_(latest))
+        )
+    ).all()
+
+    currency_ids = {row.char_code: row.id for row in existing}
+    unchanged = {
+        row.char_code for row in existing
+        if (int(row.num_code), row.name, row.currency_group_id) == (
+            latest[row.char_code].num_code, latest[row.char_code].name, currency_group_id
+        )
+    }
+    changed = [
+        {
+            'currency_group_id': currency_group_id,
+            'num_code': record.num_code,
+            'char_code': record.char_code,
+            'name': record.name,
+        }
+        for char_code, record in latest.items() if char_code not in unchanged
+    ]
+    if changed:
+        stmt = _insert(session, currency_table).values(changed)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[currency_table.c.char_code],
+            set_={
+                'currency_group_id': stmt.excluded.currency_group_id,
+                'num_code': stmt.excluded.num_code,
+                'name': stmt.excluded.name,
+            }
+        ).returning(currency_table.c.id, currency_table.c.char_code)
+        upserted = (await session.execute(stmt)).all()
+        currency_ids.update({row.char_code: row.id for row in upserted})
+        add_cache_tags(session, 'currency', *(f'currency:{row.id}' for row in upserted))
+    return currency_ids
+
+
+async def upsert_rates(session: AsyncSession, group_name: str, records: List[RateRecord]) -> int:
+    '''
+    Function stores the provided rate records within a single transaction
+
+    The currency group, currencies, rates and rollups are written by the same transaction,
+    committed once at the end, so a failure leaves nothing behind.
+
+    Rates are keyed by (currency_id, modified_at), where `modified_at` is the quotation date,
+    so repeated feeds of the same day update the stored rate instead of appending a new one.
+    Day, week and month rollups of the changed currencies are recomputed in the same
+    transaction. The number of round trips does not depend on the amount of records.
+
+    :param group_name : currency group of the records
+    :type group_name : str
+    :param records : rate records to store
+    :type records : List[RateRecord]
+    :returns : amount of inserted or updated rates
+    :rtype : int
+    '''
+    if not records:
+        return 0
+
+    currency_group_id = await resolve_currency_group(session, group_name)
+    currency_ids = await upsert_currencies(session, currency_group_id, records)
+
+    rate_table: Table = CurrencyRate.__table__
+    # ON CONFLICT can't touch the same row twice within a statement, the last record wins
+    rates = {
+        (record.char_code, record.rate_date): {
+            'currency_id': currency_ids[record.char_code],
+            'nominal': record.nominal,
+            'value': record.value,
+            'vunit_rate': record.vunit_rate,
+            'modified_at': rate_timestamp(record.rate_date),
+        }
+        for record in records
+    }
+    stmt = _insert(session, rate_table).values(list(rates.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[rate_table.c.currency_id, rate_table.c.modified_at],
+        set_={
+            'nominal': stmt.excluded.nominal,
+            'value': stmt.excluded.value,
+            'vunit_rate': stmt.excluded.vunit_rate,
+        },
+        where=or_(
+            rate_table.c.nominal != stmt.excluded.nominal,
+            rate_table.c.value != stmt.excluded.value,
+            rate_table.c.vunit_rate != stmt.excluded.vunit_rate,
+        )
+    ).returning(rate_table.c.id, rate_table.c.currency_id)
+    # Rows skipped by the WHERE clause of the upsert are not returned
+    upserted = (await session.execute(stmt)).all()
+    if upserted:
+        await CurrencyRateRollup.refresh(
+            session, {record.rate_date for record in records},
+            sorted({row.currency_id for row in upserted})
+        )
+        add_cache_tags(
+            session, 'currency_rate', *(f'currency_rate:{row.id}' for row in upserted)
+        )
+    await session.commit()
+    return len(upserted)
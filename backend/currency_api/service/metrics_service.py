@@ -0,0 +1,165 @@
+import os
+import glob
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, \
+    Histogram, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import Scope
+
+# Metric files of the container processes (uvicorn or celery workers), one per container:
+# pids of different containers collide and processes of the same pid share a file
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+# Comma separated directories merged by `/metrics` (the own one and the other containers ones)
+METRICS_COLLECT_DIRS = [
+    path for path in os.environ.get('METRICS_COLLECT_DIRS', '').split(',') if path
+] or ([MULTIPROC_DIR] if MULTIPROC_DIR else [])
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 5.0)
+TASK_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by route template and status',
+    ['method', 'route', 'status']
+)
+HTTP_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route template',
+    ['method', 'route'], buckets=LATENCY_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cached endpoint lookups (local, hit, miss)',
+    ['endpoint', 'result']
+)
+CACHE_LATENCY = Histogram(
+    'cache_lookup_duration_seconds', 'Cached endpoint response time by lookup result',
+    ['result'], buckets=FAST_BUCKETS
+)
+DB_STATEMENT_LATENCY = Histogram(
+    'db_statement_duration_seconds', 'Database statement execution time by operation',
+    ['operation'], buckets=FAST_BUCKETS
+)
+TASK_LATENCY = Histogram(
+    'celery_task_duration_seconds', 'Celery task duration by final state',
+    ['task', 'state'], buckets=TASK_BUCKETS
+)
+RATES_UPSERTED = Counter(
+    'currency_rates_upserted_total', 'Currency rates inserted or updated by ingestion tasks',
+    ['task']
+)
+
+# ASGI scope of the http request being served, set by `MetricsMiddleware`
+request_scope: ContextVar[Optional[Scope]] = ContextVar('request_scope', default=None)
+
+
+def statement_operation(statement: str) -> str:
+    '''
+    Function returns the leading SQL keyword (SELECT, INSERT, ...) of the statement
+    '''
+    operation = statement.lstrip()[:16].split(None, 1)
+    return operation[0].upper() if operation else 'UNKNOWN'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(_conn, _cursor, _statement, _parameters, context, _executemany):
+    context.metrics_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(_conn, _cursor, statement, _parameters, context, _executemany):
+    start = getattr(context, 'metrics_start', None)
+    if start is not None:
+        DB_STATEMENT_LATENCY.labels(statement_operation(statement)).observe(
+            time.perf_counter() - start
+        )
+
+
+def request_route(scope: Optional[Scope] = None) -> Optional[str]:
+    '''
+    Function returns the matched route template of the request (None outside of requests)
+    '''
+    scope = request_scope.get() if scope is None else scope
+    if scope is None:
+        return None
+    # The router stores the matched route into the shared scope
+    return getattr(scope.get('route'), 'path', 'unmatched')
+
+
+def observe_request(method: str, route: str, status: int, duration: float) -> None:
+    HTTP_REQUESTS.labels(method, route, status).inc()
+    HTTP_LATENCY.labels(method, route).observe(duration)
+
+
+def observe_cache(endpoint: str, result: str, duration: float) -> None:
+    CACHE_REQUESTS.labels(endpoint, result).inc()
+    CACHE_LATENCY.labels(result).observe(duration)
+
+
+def observe_task(task: str, state: str, duration: float) -> None:
+    TASK_LATENCY.labels(task, state).observe(duration)
+
+
+class DirectoriesCollector:
+    '''
+    Collector merging the metric files of several multiprocess directories
+
+    Every container writes into its own directory, so the files of equal pids never clash,
+    while samples of the same metric and labels are summed across all of them.
+    '''
+
+    def __init__(self, paths: List[str]):
+        self.paths = paths
+
+    def collect(self):
+        while True:
+            files = [
+                file for path in self.paths for file in glob.glob(os.path.join(path, '*.db'))
+            ]
+            try:
+                return MultiProcessCollector.merge(files, accumulate=True)
+            except FileNotFoundError:
+                # Removed by the cleanup of a starting container, listed again
+                continue
+
+
+def latest_metrics(paths: Optional[List[str]] = None) -> Tuple[bytes, str]:
+    '''
+    Function renders every metric in the Prometheus text format
+
+    In multiprocess mode (`PROMETHEUS_MULTIPROC_DIR` set) the values of every process writing
+    into the `METRICS_COLLECT_DIRS` directories are merged, so any uvicorn worker answers
+    with the same totals of the api and celery containers.
+
+    :returns : payload and its content type
+    :rtype : Tuple[bytes, str]
+    '''
+    paths = METRICS_COLLECT_DIRS if paths is None else paths
+    registry = REGISTRY
+    if paths:
+        registry = CollectorRegistry()
+        registry.register(DirectoriesCollector(paths))
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def clear_multiproc_dir(path: Optional[str] = MULTIPROC_DIR) -> int:
+    '''
+    Function removes the metric files left in the multiprocess directory by the previous run
+
+    Must be called by every container before its own processes start (the directory is
+    never shared with another container), files of the dead processes would be merged
+    into the totals otherwise.
+
+    :returns : amount of the removed files
+    :rtype : int
+    '''
+    if not path:
+        return 0
+    os.makedirs(path, exist_ok=True)
+    files = glob.glob(os.path.join(path, '*.db'))
+    for file in files:
+        os.remove(file)
+    return len(files)
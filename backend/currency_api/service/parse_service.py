@@ -1,124 +1,144 @@
 import json
-from typing import List
-from datetime import datetime, timedelta
+import hashlib
+import logging
+from datetime import date
+from typing import List, Optional, Tuple
 
-import aiohttp
-import xmltodict
-
-from backend.currency_api.util import get_or_create
-from backend.currency_api.model import CurrencyGroup, Currency, CurrencyRate
 from backend.currency_api.service.db_service import TaskAsyncSessionFactory
-from backend.currency_api.config import PROXY, HEADERS
+from backend.currency_api.service.redis_service import get_redis
+from backend.currency_api.service.cache_service import invalidate, pop_cache_tags
+from backend.currency_api.service.ingest_service import RateRecord, records_from_val_curs, \
+    parse_val_curs, upsert_rates
+from backend.currency_api.service.convert_service import publish_cross_rates
+from backend.currency_api.service.http_service import FetchResponse, fetcher
+from backend.currency_api.config import CBR_URL, CBR_SNAPSHOT_PATH
+
+# Digest of the last stored feed, shared by every worker process
+FEED_DIGEST_KEY = 'cbr:feed_digest'
 
+logger = logging.getLogger(__name__)
 
-async def get_response(link: str) -> list | None:
+
+def read_rate_records(
+    link: str, response: FetchResponse
+) -> Optional[Tuple[str, List[RateRecord]]]:
     '''
-    Function returns list object from provided link
+    Function returns typed rate records of the fetched XML_daily.asp document
 
-    :param link : any http/https link
+    :returns : currency group name and rate records or None (unchanged resource, non 200
+        status, other content type, invalid document)
+    :rtype : Tuple[str, List[RateRecord]] | None
+    '''
+    if response.not_modified:
+        logger.info('%s is not modified since the last request', link)
+        return None
+    if response.status != 200:
+        return None
+    try:
+        if response.content_type in ('application/xml', 'text/xml'):
+            return parse_val_curs(response.body)
+        if response.content_type == 'application/json':
+            return records_from_val_curs(json.loads(response.body))
+    except ValueError as e:
+        # Maintenance pages are served with 200 as well
+        logger.warning('%s returned an invalid document: %s', link, e)
+    return None
+
+
+async def get_rate_records(link: str) -> Optional[Tuple[str, List[RateRecord]]]:
+    '''
+    Function returns typed rate records of the XML_daily.asp document from provided link
+
+    Requests go through the shared pooled fetcher (timeouts and retries included), the body
+    is buffered by the fetcher (a retry needs the whole response) and the XML is parsed
+    from it incrementally, without building the whole tree.
+
+    :param link : XML_daily.asp link
     :type link : str
-    :returns : raw html object
-    :rtype : html.HtmlElement | None
+    :returns : currency group name and rate records or None (non 200 status, other content type,
+        invalid document)
+    :rtype : Tuple[str, List[RateRecord]] | None
+    '''
+    return read_rate_records(link, await fetcher.fetch(link))
+
+
+def dump_snapshot(path: str, group_name: str, records: List[RateRecord]) -> None:
+    '''
+    Function stores typed rate records of the feed into json file
     '''
-    async with aiohttp.ClientSession() as session:
-        async with session.get(
-            url=link,
-            proxy=PROXY,
-            headers={'user-agent': HEADERS['user_agents'][1]} if HEADERS else {}
-        ) as response:
-            if response.status != 200:
-                return None
-            content = None
-            if response.content_type == 'application/xml':
-                decoded_response = await response.text()
-                content = json.loads(json.dumps(xmltodict.parse(decoded_response)))
-            if response.content_type == 'application/json':
-                content = await response.json()
-            return content
-
-
-async def populate_db_from_cbr():
+    with open(path, 'w', encoding='utf-8') as record_file:
+        json.dump(
+            {
+                'name': group_name,
+                'records': [
+                    {**record._asdict(), 'rate_date': record.rate_date.isoformat()}
+                    for record in records
+                ]
+            },
+            record_file, indent=4, ensure_ascii=False
+        )
+
+
+def load_snapshot(path: str) -> Tuple[str, List[RateRecord]]:
     '''
-    Function stores data from cbr into database
+    Function reads typed rate records stored by `dump_snapshot`
     '''
-    with open('backend/currency_api/config/data.json', 'r', encoding='utf-8') as record_file:
+    with open(path, 'r', encoding='utf-8') as record_file:
         data = json.load(record_file)
+    return data['name'], [
+        RateRecord(**{**record, 'rate_date': date.fromisoformat(record['rate_date'])})
+        for record in data['records']
+    ]
 
-    async with TaskAsyncSessionFactory() as session:
-        rate_dt = datetime.strptime(data['ValCurs']['@Date'], "%d.%m.%Y").date()
-        currency_group = await get_or_create(
-            session, CurrencyGroup, name=data['ValCurs']['@name']
-        )
-        currency_rates: List[CurrencyRate] = []
-        existing_currency_rates: List[CurrencyRate] = []
-        for row in data['ValCurs']['Valute']:
-            currency_instance = await get_or_create(
-                session, Currency,
-                defaults={
-                    "currency_group_id": currency_group.id,
-                    "name": row['Name']
-                },
-                num_code=int(row['NumCode']),
-                char_code=row['CharCode']
-            )
-            related_currency_rates: List[CurrencyRate] = [
-                rate async for rate in CurrencyRate.read_all(
-                    session, '_modified_at', currency_id=currency_instance.id, limit=1
-                )
-            ]
-            value = float(row['Value'].replace(',', '.'))
-            vunit_rate = float(row['VunitRate'].replace(',', '.'))
-            nominal = int(row['Nominal'])
-
-            # Check if any currency_rate exist and was modified less than in 1 day
-            if len(related_currency_rates) > 0 and \
-                    (
-                        rate_dt -
-                        (related_currency_rates[0].modified_at + timedelta(hours=3)).date()
-                    ).days == 0:
-                current_currency_rate = related_currency_rates[0]
-                if current_currency_rate.vunit_rate != vunit_rate:
-                    current_currency_rate.vunit_rate = vunit_rate
-                    current_currency_rate.value = value
-                    current_currency_rate.nominal = nominal
-                    existing_currency_rates.append(current_currency_rate.__dict__)
-            else:
-                currency_rates.append(
-                    CurrencyRate(
-                        currency_id=currency_instance.id,
-                        nominal=nominal,
-                        value=value,
-                        vunit_rate=vunit_rate
-                    ).__dict__
-                )
-
-        if currency_rates:
-            await session.execute(
-                CurrencyRate.__table__.insert(),
-                currency_rates
-            )
-            await session.commit()
-        if existing_currency_rates:
-            for rate in existing_currency_rates:
-                await session.execute(
-                    CurrencyRate.__table__.update()
-                    .where(CurrencyRate.id == rate['id'])
-                    .values(
-                        vunit_rate=rate['vunit_rate'],
-                        value=rate['value'],
-                        nominal=rate['nominal']
-                    )
-                )
-                await session.commit()
-
-
-async def get_data_from_cbr():
+
+def records_digest(group_name: str, records: List[RateRecord]) -> str:
     '''
-    Function collects data from cbr and save in data.json file
+    Function returns fingerprint of the parsed feed
     '''
-    rbc_link = 'https://cbr.ru/scripts/XML_daily.asp'
-    val_curs = await get_response(rbc_link)
+    return hashlib.sha256(repr((group_name, records)).encode()).hexdigest()
+
+
+async def ingest_from_cbr(
+    link: str = CBR_URL, snapshot_path: Optional[str] = CBR_SNAPSHOT_PATH
+) -> int:
+    '''
+    Function runs the whole ingestion pipeline: fetch, parse, diff, upsert and cache refresh
+
+    Records stay in memory between the steps. The feed is skipped without touching the
+    database when cbr answers 304 or the parsed feed equals the last stored one, so the
+    pipeline is cheap enough to poll cbr every minute. The document validators are remembered
+    only once the feed is stored, a failed run is retried by the next poll.
+
+    :param link : XML_daily.asp link
+    :type link : str
+    :param snapshot_path : optional json file to store the parsed feed into
+    :type snapshot_path : str | None
+    :returns : amount of inserted or updated rates
+    :rtype : int
+    '''
+    response = await fetcher.fetch(link, conditional=True)
+    rate_records = read_rate_records(link, response)
+    if not rate_records:
+        return 0
+
+    digest = records_digest(*rate_records)
+    redis = await get_redis()
+    try:
+        if await redis.get(FEED_DIGEST_KEY) == digest.encode():
+            logger.info('cbr feed is unchanged since the last ingestion')
+            fetcher.remember(link, response)
+            return 0
+        async with TaskAsyncSessionFactory() as session:
+            rows = await upsert_rates(session, *rate_records)
+            await invalidate(redis, pop_cache_tags(session))
+            if rows:
+                await publish_cross_rates(redis, session)
+        await redis.set(FEED_DIGEST_KEY, digest)
+        fetcher.remember(link, response)
+    finally:
+        await redis.aclose()
 
-    if val_curs:
-        with open('backend/currency_api/config/data.json', 'w', encoding='utf-8') as record_file:
-            json.dump(val_curs, record_file, indent=4)
+    if snapshot_path:
+        dump_snapshot(snapshot_path, *rate_records)
+    logger.info('cbr feed ingested, %s rates stored', rows)
+    return rows
@@ -0,0 +1,135 @@
+import logging
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.currency_api.config import MOSCOW_TZ
+from backend.currency_api.service.db_service import TaskAsyncSessionFactory
+
+PARTITIONED_TABLE = 'currency_rate'
+DEFAULT_PARTITION = 'currency_rate_default'
+PARTITION_MONTHS_AHEAD = 3
+
+logger = logging.getLogger(__name__)
+
+
+def add_months(month: date, months: int) -> date:
+    '''
+    Function returns the first date of the month shifted by the provided amount of months
+    '''
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    '''
+    Monthly partition name of the currency_rate table
+    '''
+    return f'{PARTITIONED_TABLE}_y{month:%Y}m{month:%m}'
+
+
+def partition_months(start: date, end: date) -> List[date]:
+    '''
+    Function returns first dates of every month overlapping the date range (inclusive)
+    '''
+    months = []
+    month = start.replace(day=1)
+    while month <= end:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def partition_statements(month: date) -> List[str]:
+    '''
+    Function returns statements creating the monthly partition (Moscow time bounds)
+
+    Rows of the month stored in the default partition are moved into the new partition
+    before it is attached, otherwise the attachment fails.
+
+    :param month : first date of the month
+    :type month : date
+    :returns : SQL statements
+    :rtype : List[str]
+    '''
+    name = partition_name(month)
+    start = f"'{month:%Y-%m-%d} 00:00:00 Europe/Moscow'"
+    end = f"'{add_months(month, 1):%Y-%m-%d} 00:00:00 Europe/Moscow'"
+    return [
+        f'CREATE TABLE {name} (LIKE {PARTITIONED_TABLE} INCLUDING DEFAULTS)',
+        f'WITH moved AS ('
+        f'DELETE FROM {DEFAULT_PARTITION} '
+        f'WHERE modified_at >= {start} AND modified_at < {end} RETURNING *'
+        f') INSERT INTO {name} SELECT * FROM moved',
+        f'ALTER TABLE {PARTITIONED_TABLE} ATTACH PARTITION {name} '
+        f'FOR VALUES FROM ({start}) TO ({end})',
+    ]
+
+
+async def ensure_partitions(
+    session: AsyncSession, start: Optional[date] = None, end: Optional[date] = None,
+    months_ahead: int = PARTITION_MONTHS_AHEAD, today: Optional[date] = None
+) -> List[str]:
+    '''
+    Function creates missing monthly partitions of the date range
+
+    By default the range spans from the current month to `months_ahead` months later.
+    Past ranges (backfill) must be partitioned before their rows are written, otherwise
+    they end up in the default partition without partition pruning.
+    Also refreshes planner statistics of the partitioned table, which autovacuum never
+    analyzes by itself (only the partitions). Does nothing unless the table is partitioned
+    (Postgres after the partitioning migration).
+
+    :param start : first date of the range (the current month by default)
+    :type start : date | None
+    :param end : last date of the range (`months_ahead` months after the current one by default)
+    :type end : date | None
+    :param months_ahead : amount of months to create partitions in advance for
+    :type months_ahead : int
+    :returns : names of the created partitions
+    :rtype : List[str]
+    '''
+    if session.get_bind().dialect.name != 'postgresql':
+        return []
+    existing = set(
+        await session.scalars(
+            text(
+                'SELECT child.relname FROM pg_inherits '
+                'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+                'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+                'WHERE parent.relname = :table'
+            ),
+            {'table': PARTITIONED_TABLE}
+        )
+    )
+    if not existing:
+        return []
+
+    current_month = (today or datetime.now(MOSCOW_TZ).date()).replace(day=1)
+    created = []
+    for month in partition_months(
+        start or current_month, end or add_months(current_month, months_ahead)
+    ):
+        if partition_name(month) not in existing:
+            for statement in partition_statements(month):
+                await session.execute(text(statement))
+            created.append(partition_name(month))
+    await session.execute(text(f'ANALYZE {PARTITIONED_TABLE}'))
+    await session.commit()
+    return created
+
+
+async def maintain_partitions() -> List[str]:
+    '''
+    Function runs the currency_rate partitions maintenance
+
+    :returns : names of the created partitions
+    :rtype : List[str]
+    '''
+    async with TaskAsyncSessionFactory() as session:
+        created = await ensure_partitions(session)
+    if created:
+        logger.info('Created currency_rate partitions: %s', ', '.join(created))
+    return created
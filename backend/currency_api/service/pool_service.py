@@ -0,0 +1,155 @@
+import time
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    '''
+    Cumulative histogram of observed durations
+
+    Attributes
+    ----------
+    buckets: Tuple[float, ...]
+        upper bounds of the buckets (seconds), the last implicit one is +Inf
+    '''
+
+    def __init__(self, buckets: Tuple[float, ...] = WAIT_BUCKETS):
+        self.buckets = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def stats(self) -> Dict:
+        cumulative, total = {}, 0
+        for bound, count in zip((*map(str, self.buckets), '+Inf'), self.counts):
+            total += count
+            cumulative[bound] = total
+        return {'buckets': cumulative, 'sum': self.sum, 'count': self.count}
+
+
+class PoolMetrics:
+    '''
+    Counters of a connection pool collected from the pool events
+
+    Attributes
+    ----------
+    checkouts: int
+        connections handed out by the pool
+    connects: int
+        new db connections opened by the pool
+    invalidations: int
+        connections discarded as broken
+    pre_ping_failures: int
+        connections found dead by the pre-ping on checkout
+    timeouts: int
+        checkouts failed after waiting `pool_timeout` for a free connection
+    wait: Histogram
+        time spent waiting for a connection on checkout (seconds)
+    '''
+
+    def __init__(self):
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.pre_ping_failures = 0
+        self.timeouts = 0
+        self.wait = Histogram()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    '''
+    Queue pool timing how long checkouts wait for a connection (no pool event covers it)
+    '''
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.timeouts += 1
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.wait.observe(time.perf_counter() - start)
+
+    def recreate(self) -> 'InstrumentedPool':
+        # Engine.dispose() replaces the pool, the metrics carry over
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+# Instrumented engines of the current process by name
+engines: Dict[str, AsyncEngine] = {}
+metrics: Dict[str, PoolMetrics] = {}
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> AsyncEngine:
+    '''
+    Function collects pool metrics of the engine under the provided name
+
+    :param engine : engine created with `InstrumentedPool` poolclass
+    :type engine : AsyncEngine
+    :param name : pool name in the stats, e.g. 'primary'
+    :type name : str
+    :returns : the same engine
+    :rtype : AsyncEngine
+    '''
+    pool_metrics = metrics[name] = PoolMetrics()
+    engines[name] = engine
+    engine.pool.metrics = pool_metrics
+
+    @event.listens_for(engine.sync_engine, 'connect')
+    def _connect(*_):
+        pool_metrics.connects += 1
+
+    @event.listens_for(engine.sync_engine, 'checkout')
+    def _checkout(*_):
+        pool_metrics.checkouts += 1
+
+    @event.listens_for(engine.sync_engine, 'invalidate')
+    def _invalidate(_dbapi_connection, _connection_record, exception):
+        pool_metrics.invalidations += 1
+        # Failed pre-ping raises a disconnection error on checkout
+        if isinstance(exception, exc.DisconnectionError):
+            pool_metrics.pre_ping_failures += 1
+
+    return engine
+
+
+def pool_stats() -> Dict[str, Dict]:
+    '''
+    Function returns live state and counters of every instrumented pool of the process
+    '''
+    stats = {}
+    for name, engine in engines.items():
+        pool, pool_metrics = engine.pool, metrics[name]
+        stats[name] = {
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,  # pylint: disable=protected-access
+            'timeout': pool.timeout(),
+            'checkouts': pool_metrics.checkouts,
+            'connects': pool_metrics.connects,
+            'invalidations': pool_metrics.invalidations,
+            'pre_ping_failures': pool_metrics.pre_ping_failures,
+            'timeouts': pool_metrics.timeouts,
+            'checkout_wait': pool_metrics.wait.stats(),
+        }
+    return stats
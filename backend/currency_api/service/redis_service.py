@@ -8,6 +8,6 @@ REDIS_URL = os.environ['REDIS_URL']
 async def get_redis():
     return await redis.from_url(
         url=REDIS_URL,
-        encoding="utf-8",
-        decode_responses=True,
+        # Cached bodies are stored and served as raw bytes
+        decode_responses=False,
     )
@@ -0,0 +1,41 @@
+from datetime import date
+
+from backend.currency_api.model import CurrencyRateRollup
+from backend.currency_api.service.db_service import TaskAsyncSessionFactory
+from backend.currency_api.service.redis_service import get_redis
+from backend.currency_api.service.cache_service import invalidate, add_cache_tags, \
+    pop_cache_tags
+from backend.currency_api.service.backfill_service import date_range
+
+
+async def rebuild_rollups(start: date, end: date) -> int:
+    '''
+    Function recomputes rollups of every currency for the provided date range
+
+    Ingestion keeps the rollups up to date, rebuilding is needed after rates are
+    changed by other means (API, manual edits) or for the history stored before rollups.
+    Every month is stored in its own transaction.
+
+    :param start : first date of the range
+    :type start : date
+    :param end : last date of the range (inclusive)
+    :type end : date
+    :returns : amount of stored aggregates
+    :rtype : int
+    '''
+    rows = 0
+    days = list(date_range(start, end))
+    months = sorted({(day.year, day.month) for day in days})
+    redis = await get_redis()
+    try:
+        async with TaskAsyncSessionFactory() as session:
+            for year, month in months:
+                rows += await CurrencyRateRollup.refresh(
+                    session, [day for day in days if (day.year, day.month) == (year, month)]
+                )
+                add_cache_tags(session, 'currency_rate')
+                await session.commit()
+                await invalidate(redis, pop_cache_tags(session))
+    finally:
+        await redis.aclose()
+    return rows
@@ -0,0 +1,187 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from backend.currency_api.service.metrics_service import request_route, statement_operation
+
+# Opt-in, statements running longer (seconds) are recorded, disabled unless set
+SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD') or -1)
+SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE') or 100)
+# Statements EXPLAIN accepts, ANALYZE executes the statement again so it's only run on reads
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+# Parameters are truncated, bulk upserts bind thousands of them
+MAX_PARAMETERS_LENGTH = 1000
+# EXPLAIN load limits: plans captured at once, seconds before the same statement is explained
+# again and statement timeout of the EXPLAIN itself (Postgres)
+SLOW_QUERY_EXPLAIN_CONCURRENCY = int(os.environ.get('SLOW_QUERY_EXPLAIN_CONCURRENCY') or 2)
+SLOW_QUERY_EXPLAIN_COOLDOWN = float(os.environ.get('SLOW_QUERY_EXPLAIN_COOLDOWN') or 60)
+SLOW_QUERY_EXPLAIN_TIMEOUT = float(os.environ.get('SLOW_QUERY_EXPLAIN_TIMEOUT') or 5)
+
+logger = logging.getLogger(__name__)
+
+# Statements of the EXPLAIN task itself are never recorded
+_explaining: ContextVar[bool] = ContextVar('slow_query_explaining', default=False)
+
+
+def explain_statement(dialect: str, statement: str) -> Optional[str]:
+    '''
+    Function returns EXPLAIN of the statement for the dialect (None if it can't be explained)
+
+    Postgres plans of reads come with the actual timings and buffer usage,
+    SQLite only describes the query plan.
+    '''
+    operation = statement_operation(statement)
+    if operation not in EXPLAINABLE:
+        return None
+    if dialect == 'postgresql':
+        return f"EXPLAIN {'(ANALYZE, BUFFERS) ' if operation == 'SELECT' else ''}{statement}"
+    if dialect == 'sqlite':
+        return f'EXPLAIN QUERY PLAN {statement}'
+    return None
+
+
+class SlowQueryLog:
+    '''
+    Bounded in-process log of the statements slower than the threshold
+
+    Every recorded statement carries its parameters, duration and the route of the request
+    which ran it. The plan is captured afterwards by a background task on another pool
+    connection, so the request itself isn't slowed down any further. A slow statement
+    mustn't pile up EXPLAINs on the db either: the same statement text is explained at most
+    once per `cooldown` seconds, no more than `concurrency` plans are captured at once
+    (the others are recorded without a plan) and the EXPLAIN is bounded by `timeout`.
+
+    Attributes
+    ----------
+    threshold: float
+        minimal duration of the recorded statements (seconds)
+    entries: Deque[Dict]
+        last `size` slow statements, the oldest ones are dropped
+    '''
+
+    def __init__(
+        self, threshold: float, size: int = SLOW_QUERY_LOG_SIZE,
+        concurrency: int = SLOW_QUERY_EXPLAIN_CONCURRENCY,
+        cooldown: float = SLOW_QUERY_EXPLAIN_COOLDOWN,
+        timeout: float = SLOW_QUERY_EXPLAIN_TIMEOUT
+    ):
+        self.threshold = threshold
+        self.entries: Deque[Dict[str, Any]] = deque(maxlen=size)
+        self.concurrency = concurrency
+        self.cooldown = cooldown
+        self.timeout = timeout
+        self._explains: Set[asyncio.Task] = set()
+        # Statement text -> monotonic time its last EXPLAIN started
+        self._explained_at: Dict[str, float] = {}
+        self._target: Optional[Any] = None
+
+    def enable(self, target: Any = Engine) -> None:
+        '''
+        Start recording statements of the target (every engine by default)
+        '''
+        self._target = target
+        event.listen(target, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(target, 'after_cursor_execute', self._after_cursor_execute)
+
+    def disable(self) -> None:
+        if self._target is not None:
+            event.remove(self._target, 'before_cursor_execute', self._before_cursor_execute)
+            event.remove(self._target, 'after_cursor_execute', self._after_cursor_execute)
+            self._target = None
+
+    def _before_cursor_execute(self, _conn, _cursor, _statement, _parameters, context, _many):
+        context.slow_query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, _cursor, statement, parameters, context, executemany):
+        start = getattr(context, 'slow_query_start', None)
+        if start is None or _explaining.get():
+            return
+        duration = time.perf_counter() - start
+        if duration < self.threshold:
+            return
+
+        entry = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'duration': duration,
+            'route': request_route(),
+            'statement': statement,
+            'parameters': repr(parameters)[:MAX_PARAMETERS_LENGTH],
+            'plan': None,
+        }
+        self.entries.append(entry)
+        logger.warning(
+            'Slow query (%.3fs, route %s): %s', duration, entry['route'], statement
+        )
+
+        explain = explain_statement(conn.dialect.name, statement)
+        if explain is None or executemany or not self._acquire(statement):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        # Statement of the sync engine of an async one runs within the event loop
+        task = loop.create_task(self._explain(entry, conn.engine, explain, parameters))
+        self._explains.add(task)
+        task.add_done_callback(self._explains.discard)
+
+    def _acquire(self, statement: str) -> bool:
+        '''
+        Whether the statement may be explained now, reserves its cooldown if so
+        '''
+        now = time.monotonic()
+        if len(self._explains) >= self.concurrency:
+            return False
+        if now - self._explained_at.get(statement, -self.cooldown) < self.cooldown:
+            return False
+        if len(self._explained_at) >= self.entries.maxlen:
+            self._explained_at = {
+                key: at for key, at in self._explained_at.items() if now - at < self.cooldown
+            }
+        self._explained_at[statement] = now
+        return True
+
+    async def _explain(
+        self, entry: Dict[str, Any], engine: Engine, explain: str, parameters: Any
+    ) -> None:
+        _explaining.set(True)
+        try:
+            async with AsyncEngine(engine).connect() as conn:
+                if conn.dialect.name == 'postgresql':
+                    # Scoped to the EXPLAIN transaction, rolled back once the connection closes
+                    await conn.exec_driver_sql(
+                        f'SET LOCAL statement_timeout = {int(self.timeout * 1000)}'
+                    )
+                result = await asyncio.wait_for(
+                    conn.exec_driver_sql(explain, parameters), self.timeout
+                )
+                entry['plan'] = [str(row[-1]) for row in result]
+        except Exception as e:  # pylint: disable=broad-except
+            entry['plan'] = [f'EXPLAIN failed: {e!r}']
+
+    async def flush(self) -> None:
+        '''
+        Wait for the plans being captured
+        '''
+        await asyncio.gather(*self._explains, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'threshold': self.threshold if self._target is not None else None,
+            'size': self.entries.maxlen,
+            'entries': list(reversed(self.entries)),
+        }
+
+
+slow_queries = SlowQueryLog(SLOW_QUERY_THRESHOLD)
+if SLOW_QUERY_THRESHOLD >= 0:
+    slow_queries.enable()
@@ -3,6 +3,9 @@ from typing import Optional
 import pytest
 from fastapi import status
 from httpx import AsyncClient
+from sqlalchemy import event
+
+from backend.currency_api.service.db_service import async_engine
 
 pytestmark = pytest.mark.anyio
 
@@ -115,3 +118,49 @@ async def test_delete_currency_group(
 ):
     response = await client.delete(f"/currency_group/{currency_group_id}")
     assert response.status_code == status_code
+
+
+async def test_currency_group_cache_invalidation(client: AsyncClient):
+    cached = (await client.get("/currency_group/")).json()
+
+    response = await client.post("/currency_group/", json={"name": "Precious Metals Market"})
+    currency_group_id = response.json()["id"]
+    assert len((await client.get("/currency_group/")).json()) == len(cached) + 1
+    assert (await client.get(f"/currency_group/{currency_group_id}")).json()["name"] == \
+        "Precious Metals Market"
+
+    await client.patch(f"/currency_group/{currency_group_id}", json={"name": "Metals Market"})
+    assert (await client.get(f"/currency_group/{currency_group_id}")).json()["name"] == \
+        "Metals Market"
+
+    await client.delete(f"/currency_group/{currency_group_id}")
+    assert len((await client.get("/currency_group/")).json()) == len(cached)
+    assert (await client.get(f"/currency_group/{currency_group_id}")).status_code == \
+        status.HTTP_404_NOT_FOUND
+
+
+async def test_currency_group_local_cache(client: AsyncClient):
+    stats_url = f"{client.base_url.scheme}://{client.base_url.netloc.decode()}/api/internal/cache"
+    stats = (await client.get(stats_url)).json()["local"]
+    await client.get("/currency_group/")
+    await client.get("/currency_group/")
+    assert (await client.get(stats_url)).json()["local"]["hits"] == stats["hits"] + 1
+
+
+async def test_currency_group_cache_hit_uses_no_connection(client: AsyncClient):
+    checkouts = []
+
+    def checkout(*args):
+        checkouts.append(args)
+
+    event.listen(async_engine.sync_engine.pool, "checkout", checkout)
+    try:
+        response = await client.get("/currency_group/")
+        assert response.status_code == status.HTTP_200_OK
+        assert len(checkouts) == 1
+
+        for _ in range(5):
+            assert (await client.get("/currency_group/")).content == response.content
+        assert len(checkouts) == 1
+    finally:
+        event.remove(async_engine.sync_engine.pool, "checkout", checkout)
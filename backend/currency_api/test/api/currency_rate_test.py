@@ -1,9 +1,12 @@
+import json
 from typing import Optional
 
 import pytest
 from fastapi import status
 from httpx import AsyncClient
 
+from backend.currency_api.model import CurrencyRate
+
 pytestmark = pytest.mark.anyio
 
 
@@ -99,8 +102,12 @@ async def test_upd_currency_rate(
     client: AsyncClient,
     currency_rate_id: Optional[int], payload: dict, status_code: int
 ):
+    before = await client.get(f"/currency_rate/{currency_rate_id}")
     response = await client.patch(f"/currency_rate/{currency_rate_id}", json=payload)
     assert response.status_code == status_code
+    if status_code == status.HTTP_200_OK:
+        # Quotation date is part of the (currency_id, modified_at) key, updates keep it
+        assert response.json()["modified_at"] == before.json()["modified_at"]
 
 
 @pytest.mark.parametrize(
@@ -122,3 +129,174 @@ async def test_delete_currency_rate(
 ):
     response = await client.delete(f"/currency_rate/{currency_rate_id}")
     assert response.status_code == status_code
+
+
+@pytest.mark.parametrize(
+    "payloads, params, status_code",
+    (
+        (
+            (
+                {
+                    "currency_id": 1,
+                    "nominal": 1,
+                    "value": 56.7995,
+                    "vunit_rate": 56.7995
+                },
+                {
+                    "currency_id": 1,
+                    "nominal": 1,
+                    "value": 58.7995,
+                    "vunit_rate": 58.7995
+                },
+            ),
+            {},
+            status.HTTP_200_OK,
+        ),
+        (
+            (),
+            {
+                "char_code": "usd,eur",
+            },
+            status.HTTP_200_OK,
+        ),
+    ),
+)
+async def test_get_latest_currency_rates(
+    client: AsyncClient,
+    payloads: tuple, params: dict, status_code: int
+):
+    for payload in payloads:
+        await client.post("/currency_rate/", json=payload)
+
+    response = await client.get("/currency_rate/latest", params=params)
+    assert response.status_code == status_code
+    currency_ids = [rate["currency_id"] for rate in response.json()]
+    assert len(currency_ids) == len(set(currency_ids))
+    if payloads:
+        assert {
+            rate["currency_id"]: rate["vunit_rate"] for rate in response.json()
+        }[payloads[-1]["currency_id"]] == payloads[-1]["vunit_rate"]
+
+
+@pytest.mark.parametrize(
+    "params",
+    (
+        {},
+        {
+            "_vunit_rate": "",
+        },
+        {
+            "modified_at": "",
+        },
+        {
+            "nominal": "",
+            "_value": "",
+        },
+        {
+            "_currency_id": "",
+            "nominal": "",
+            "_modified_at": "",
+        },
+    ),
+)
+async def test_get_currency_rates_by_cursor(
+    client: AsyncClient,
+    params: dict
+):
+    expected = [rate["id"] for rate in (await client.get("/currency_rate/", params=params)).json()]
+
+    received, cursor = [], ""
+    while cursor is not None:
+        response = await client.get(
+            "/currency_rate/", params={**params, "cursor": cursor, "limit": 1}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        page = response.json()
+        received += [rate["id"] for rate in page["items"]]
+        cursor = page["next_cursor"]
+    assert received == expected
+
+
+@pytest.mark.parametrize(
+    "params",
+    (
+        {
+            "cursor": "invalid",
+        },
+        {
+            # Cursor of a single order key used with two of them
+            "cursor": "WzEuMCwgMV0=",
+            "nominal": "",
+            "_value": "",
+        },
+        {
+            "cursor": "",
+            "currency": "",
+        },
+        {
+            # NULL order key
+            "cursor": "W251bGwsIDFd",
+            "nominal": "",
+        },
+    ),
+)
+async def test_get_currency_rates_by_invalid_cursor(client: AsyncClient, params: dict):
+    response = await client.get("/currency_rate/", params=params)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_get_currency_rates_by_nullable_cursor_key(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(CurrencyRate.__table__.c.nominal, "nullable", True)
+    response = await client.get("/currency_rate/", params={"cursor": "", "nominal": ""})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.parametrize(
+    "stream_token, headers, status_code",
+    (
+        (
+            None,
+            {"Authorization": "Bearer secret"},
+            status.HTTP_403_FORBIDDEN,
+        ),
+        (
+            "secret",
+            {},
+            status.HTTP_401_UNAUTHORIZED,
+        ),
+        (
+            "secret",
+            {"Authorization": "Bearer wrong"},
+            status.HTTP_401_UNAUTHORIZED,
+        ),
+    ),
+)
+async def test_stream_currency_rates_unauthorized(
+    client: AsyncClient, monkeypatch,
+    stream_token: Optional[str], headers: dict, status_code: int
+):
+    monkeypatch.setattr(
+        "backend.currency_api.util.endpoint_util.STREAM_TOKEN", stream_token
+    )
+    response = await client.get("/currency_rate/stream", headers=headers)
+    assert response.status_code == status_code
+
+
+async def test_stream_currency_rates(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr("backend.currency_api.util.endpoint_util.STREAM_TOKEN", "secret")
+    headers = {"Authorization": "Bearer secret"}
+    expected = (await client.get("/currency_rate/", params={"_vunit_rate": ""})).json()
+
+    response = await client.get(
+        "/currency_rate/stream", params={"_vunit_rate": ""}, headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert expected
+    assert [json.loads(line) for line in response.text.splitlines()] == expected
+
+    response = await client.get(
+        "/currency_rate/stream", params={"_vunit_rate": "", "format": "json"}, headers=headers
+    )
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == expected
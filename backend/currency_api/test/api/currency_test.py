@@ -64,6 +64,34 @@ async def test_add_currency(
             },
             status.HTTP_200_OK,
         ),
+        (
+            1,
+            {
+                "include_currency_rates": "latest",
+            },
+            status.HTTP_200_OK,
+        ),
+        (
+            None,
+            {
+                "rates_limit": 2,
+            },
+            status.HTTP_200_OK,
+        ),
+        (
+            None,
+            {
+                "rates_limit": 0,
+            },
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+        ),
+        (
+            None,
+            {
+                "include_currency_rates": "all",
+            },
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+        ),
         (
             2,
             {},
@@ -79,6 +107,30 @@ async def test_get_currency(
     assert response.status_code == status_code
 
 
+async def test_get_currency_cached_body(client: AsyncClient):
+    response = await client.get("/currency/1")
+    cached_response = await client.get("/currency/1")
+    assert cached_response.headers["content-type"] == "application/json"
+    assert cached_response.content == response.content
+    # Relationships not requested are left unset and skipped
+    assert "currency_rates" not in response.json()
+
+    response = await client.get("/currency/1", params={"include_currency_rates": 1})
+    assert "currency_rates" in response.json()
+
+
+async def test_get_currencies_latest_rates(client: AsyncClient):
+    history = (await client.get("/currency/", params={"include_currency_rates": 1})).json()
+    latest = (await client.get("/currency/", params={"rates_limit": 2})).json()
+    assert any(currency["currency_rates"] for currency in history)
+    assert {
+        currency["id"]: sorted(
+            currency["currency_rates"], key=lambda rate: rate["modified_at"], reverse=True
+        )[:2]
+        for currency in history
+    } == {currency["id"]: currency["currency_rates"] for currency in latest}
+
+
 @pytest.mark.parametrize(
     "currency_id, payload, status_code",
     (
@@ -1,13 +1,17 @@
 # pylint: disable=C0413,C0114
 import os
+from typing import Awaitable, Callable, Dict, List
 
 os.environ['TEST'] = 'True'
 
 import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 from httpx import AsyncClient, ASGITransport
 
 from backend.currency_api.service.db_service import async_engine
 from backend.currency_api.service.redis_service import get_redis
+from backend.currency_api.service.cache_service import local_cache
 from backend.currency_api.main import app
 from backend.currency_api.model import Base
 
@@ -61,3 +65,26 @@ async def client(start_db, redis_client) -> AsyncClient:
 @pytest.fixture(scope="function", autouse=True)
 async def clear_redis(redis_client):
     await redis_client.flushdb()
+    local_cache.clear()
+
+
+@pytest.fixture(scope="function")
+async def http_server():
+    """
+    Factory of stub HTTP servers (GET handlers by path), returns the base url of the server.
+    Servers are closed after the test
+    """
+    servers: List[TestServer] = []
+
+    async def start(routes: Dict[str, Callable[[web.Request], Awaitable[web.Response]]]) -> str:
+        app = web.Application()
+        for path, handler in routes.items():
+            app.router.add_get(path, handler)
+        server = TestServer(app, host="127.0.0.1")
+        await server.start_server()
+        servers.append(server)
+        return f"http://{server.host}:{server.port}"
+
+    yield start
+    for server in servers:
+        await server.close()
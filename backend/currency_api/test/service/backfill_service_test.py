@@ -0,0 +1,75 @@
+import json
+from datetime import date
+from typing import List
+
+import pytest
+from aiohttp import web
+from sqlalchemy import select, func
+
+from backend.currency_api.model import Currency, CurrencyRate
+from backend.currency_api.service.db_service import AsyncSessionFactory
+from backend.currency_api.service.backfill_service import backfill_from_cbr, read_checkpoint
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def cbr_server(http_server):
+    requests: List[str] = []
+
+    async def xml_daily(request: web.Request) -> web.Response:
+        requests.append(request.query['date_req'])
+        day, month, year = request.query['date_req'].split('/')
+        return web.json_response({
+            "ValCurs": {
+                "@Date": f"{day}.{month}.{year}",
+                "@name": "Foreign Currency Market",
+                "Valute": [
+                    {
+                        "@ID": "R01920",
+                        "NumCode": "960",
+                        "CharCode": "XDR",
+                        "Nominal": "1",
+                        "Name": "СДР (специальные права заимствования)",
+                        "Value": f"{100 + int(day)},1234",
+                        "VunitRate": f"{100 + int(day)},1234"
+                    }
+                ]
+            }
+        })
+
+    url = await http_server({'/scripts/XML_daily.asp': xml_daily})
+    return f'{url}/scripts/XML_daily.asp', requests
+
+
+async def test_backfill_from_cbr(cbr_server, tmp_path):
+    link, requests = cbr_server
+    checkpoint_path = str(tmp_path / 'checkpoint.json')
+    start, end = date(2024, 3, 1), date(2024, 3, 10)
+
+    rows = await backfill_from_cbr(
+        start, end, concurrency=3, checkpoint_path=checkpoint_path, link=link
+    )
+    assert rows == 10
+    assert len(requests) == 10
+    assert read_checkpoint(checkpoint_path, start, end) == end
+
+    async with AsyncSessionFactory() as session:
+        assert await session.scalar(
+            select(func.count(CurrencyRate.id))
+            .join(CurrencyRate.currency)
+            .where(Currency.char_code == 'XDR')
+        ) == 10
+
+    # Completed range is resumed from the checkpoint, nothing left to fetch
+    assert await backfill_from_cbr(
+        start, end, concurrency=3, checkpoint_path=checkpoint_path, link=link
+    ) == 0
+    assert len(requests) == 10
+
+    with open(checkpoint_path, 'w', encoding='utf-8') as checkpoint_file:
+        json.dump({f'{start.isoformat()}:{end.isoformat()}': '2024-03-07'}, checkpoint_file)
+    assert await backfill_from_cbr(
+        start, end, concurrency=3, checkpoint_path=checkpoint_path, link=link
+    ) == 0
+    assert sorted(requests[10:]) == ['08/03/2024', '09/03/2024', '10/03/2024']
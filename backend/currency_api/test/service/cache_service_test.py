@@ -0,0 +1,97 @@
+import json
+import asyncio
+
+import pytest
+
+from backend.currency_api.service.cache_service import LocalCache, local_cache, \
+    listen_invalidations, get_or_compute, INVALIDATION_CHANNEL
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_local_cache_lru_and_expiration():
+    cache = LocalCache(max_size=2)
+    cache.set('a', [1], ('currency',), expire=60, epoch=cache.epoch)
+    cache.set('b', [2], ('currency',), expire=60, epoch=cache.epoch)
+    cache.set('expired', [3], (), expire=-1, epoch=cache.epoch)
+
+    assert cache.get('a') is None
+    assert cache.get('b') == [2]
+    assert cache.get('expired') is None
+    assert cache.stats() == {'size': 1, 'max_size': 2, 'hits': 1, 'misses': 2, 'evictions': 1}
+
+
+async def test_local_cache_invalidation():
+    cache = LocalCache()
+    epoch = cache.epoch
+    cache.set('currency', [1], ('currency',), expire=60, epoch=epoch)
+    cache.set('currency_rate', [2], ('currency_rate',), expire=60, epoch=epoch)
+
+    cache.invalidate(('currency',))
+    assert cache.get('currency') is None
+    assert cache.get('currency_rate') == [2]
+
+    # Result computed before the invalidation is not stored
+    cache.set('currency', [1], ('currency',), expire=60, epoch=epoch)
+    assert cache.get('currency') is None
+
+
+async def test_listen_invalidations(redis_client):
+    listener = asyncio.create_task(listen_invalidations(redis_client))
+    try:
+        await asyncio.sleep(0.1)
+        local_cache.set('currency', [1], ('currency:1',), expire=60, epoch=local_cache.epoch)
+        await redis_client.publish(INVALIDATION_CHANNEL, json.dumps(['currency:1']))
+        for _ in range(50):
+            if local_cache.get('currency') is None:
+                break
+            await asyncio.sleep(0.02)
+        assert local_cache.get('currency') is None
+    finally:
+        listener.cancel()
+
+
+async def test_get_or_compute_single_flight(redis_client):
+    calls = []
+
+    async def compute():
+        calls.append('compute')
+        await asyncio.sleep(0.2)
+        return str(len(calls)).encode()
+
+    results = await asyncio.gather(*(
+        get_or_compute(redis_client, 'single', ['currency'], compute, compute, expire=60)
+        for _ in range(10)
+    ))
+    assert results == [b'1'] * 10
+    assert calls == ['compute']
+
+
+async def test_get_or_compute_stale_while_revalidate(redis_client):
+    calls = []
+
+    async def compute():
+        calls.append('compute')
+        return b'fresh'
+
+    async def refresh():
+        calls.append('refresh')
+        return b'refreshed'
+
+    async def read():
+        return await get_or_compute(
+            redis_client, 'stale', ['currency'], compute, refresh, expire=0, stale=60
+        )
+
+    assert await read() == b'fresh'
+    # Expired entry is served right away, a single refresh runs in the background
+    assert await asyncio.gather(read(), read()) == [b'fresh', b'fresh']
+    for _ in range(50):
+        if await read() == b'refreshed':
+            break
+        await asyncio.sleep(0.02)
+    assert calls[:2] == ['compute', 'refresh']
+
+    # Invalidated entry is never served stale
+    await redis_client.incr('cache:tag:currency')
+    assert await read() == b'fresh'
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from backend.currency_api.service.db_service import AsyncSessionFactory
+from backend.currency_api.service.cache_service import invalidate, pop_cache_tags, local_cache
+from backend.currency_api.service.ingest_service import records_from_val_curs, upsert_rates
+from backend.currency_api.service.convert_service import get_rate_vector, publish_cross_rates, \
+    read_cross_rates, read_cross_rates_json, CROSS_RATES_KEY
+
+pytestmark = pytest.mark.anyio
+
+
+async def ingest(redis_client, date: str, rates: dict) -> None:
+    document = {
+        "ValCurs": {
+            "@Date": date,
+            "@name": "Foreign Currency Market",
+            "Valute": [
+                {
+                    "@ID": f"R{num_code:05d}",
+                    "NumCode": f"{num_code:03d}",
+                    "CharCode": char_code,
+                    "Nominal": "1",
+                    "Name": char_code,
+                    "Value": value,
+                    "VunitRate": value
+                }
+                for num_code, (char_code, value) in enumerate(rates.items(), start=990)
+            ]
+        }
+    }
+    async with AsyncSessionFactory() as session:
+        await upsert_rates(session, *records_from_val_curs(document))
+        await invalidate(redis_client, pop_cache_tags(session))
+
+
+async def test_rate_vector_refresh(redis_client):
+    await ingest(redis_client, "01.08.2024", {"XCA": "80", "XCB": "40"})
+    rate_vector = await get_rate_vector(redis_client)
+    assert rate_vector is await get_rate_vector(redis_client)
+    assert rate_vector.convert(["XCA", "RUB", "XCB"], ["XCB", "XCA", "RUB"], [1, 160, 2]).tolist() \
+        == [2.0, 2.0, 80.0]
+    with pytest.raises(ValueError):
+        rate_vector.convert(["XCA", "XCAA"], ["RUB", "RUB"], [1, 1])
+
+    # Kept apart from the cached responses, the local cache LRU never evicts it
+    for key in range(local_cache.max_size + 1):
+        local_cache.set(f"key:{key}", key, ("currency",), expire=60, epoch=local_cache.epoch)
+    assert rate_vector is await get_rate_vector(redis_client)
+
+    # Newer rates committed by the ingest replace the vector, rebuilt from the published matrix
+    await ingest(redis_client, "02.08.2024", {"XCA": "90", "XCB": "45"})
+    async with AsyncSessionFactory() as session:
+        await publish_cross_rates(redis_client, session)
+    assert (await get_rate_vector(redis_client)).convert(["XCA"], ["RUB"], [1]).tolist() == [90.0]
+
+
+async def test_convert(client: AsyncClient, redis_client):
+    await ingest(redis_client, "03.08.2024", {"XCA": "100", "XCB": "50"})
+
+    response = await client.get("/convert/", params={"from": "xca", "to": "XCB", "amount": 3})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"from": "XCA", "to": "XCB", "amount": 3.0, "result": 6.0}
+
+    response = await client.get("/convert/", params={"from": "XCA", "to": "XZZ"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    items = [{"from": "XCB", "to": "XCA", "amount": amount} for amount in range(2000)]
+    response = await client.post("/convert/", json={"items": items})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["results"] == [amount / 2 for amount in range(2000)]
+
+
+async def test_cross_rate_matrix(client: AsyncClient, redis_client):
+    await ingest(redis_client, "04.08.2024", {"XCA": "100", "XCB": "50"})
+
+    response = await client.get("/currency_rate/matrix")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/json"
+    matrix = response.json()
+    assert matrix["XCA/XCB"] == 2.0
+    assert matrix["RUB/RUB"] == 1.0
+    assert len(matrix) == len({pair.split("/")[0] for pair in matrix}) ** 2
+
+    response = await client.get("/currency_rate/matrix", params={"pairs": "xcb/xca,XCA/RUB"})
+    assert response.json() == {"XCB/XCA": 0.5, "XCA/RUB": 100.0}
+
+    # Matrix published by the ingestion follows the new rates
+    await ingest(redis_client, "05.08.2024", {"XCA": "120", "XCB": "60"})
+    response = await client.get("/currency_rate/matrix", params={"pairs": "XCA/RUB"})
+    assert response.json() == {"XCA/RUB": 120.0}
+
+    # Published matrix is served without the db
+    async with AsyncSessionFactory() as session:
+        await publish_cross_rates(redis_client, session)
+    assert await read_cross_rates(redis_client, [("XCB", "RUB")]) == {"XCB/RUB": 60.0}
+    assert json.loads(await read_cross_rates_json(redis_client))["XCB/XCA"] == 0.5
+
+    # Missing matrix is rebuilt from the db
+    await redis_client.delete(CROSS_RATES_KEY)
+    response = await client.get("/currency_rate/matrix")
+    assert response.json()["XCB/XCA"] == 0.5
+
+    for pairs in ("XCA/XZZ", "XCA", "XCA/XCB/RUB"):
+        response = await client.get("/currency_rate/matrix", params={"pairs": pairs})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.currency_api.service import db_service
+from backend.currency_api.model import CurrencyGroup
+from backend.currency_api.service.db_service import ReplicaSet, AsyncSessionFactory, async_engine, \
+    read_session
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def replica_set(monkeypatch):
+    healthy = create_async_engine("sqlite+aiosqlite:///test.db")
+    broken = create_async_engine("sqlite+aiosqlite:////nonexistent/replica.db")
+    replica_set = ReplicaSet([healthy, broken], max_lag=5)
+    monkeypatch.setattr(db_service, "replicas", replica_set)
+    yield replica_set, healthy, broken
+    await replica_set.dispose()
+
+
+async def test_reads_fail_over_to_primary(replica_set):
+    replica_set, healthy, broken = replica_set
+
+    # Replicas are unknown until the first check
+    assert replica_set.pick() is None
+    async with read_session() as session:
+        assert session.get_bind() is async_engine.sync_engine
+
+    await replica_set.check_all()
+    assert replica_set.lag == {healthy: 0.0, broken: None}
+    assert {replica_set.pick() for _ in range(4)} == {healthy}
+    async with read_session() as session:
+        assert session.get_bind() is healthy.sync_engine
+        assert await session.scalar(text("SELECT 1")) == 1
+
+    # Reads stay on the primary right after a write
+    replica_set.hold_primary()
+    async with read_session() as session:
+        assert session.get_bind() is async_engine.sync_engine
+
+
+async def test_lagging_replica_is_skipped(replica_set):
+    replica_set, healthy, broken = replica_set
+    replica_set.lag.update({healthy: 30.0, broken: 1.0})
+    assert replica_set.pick() is broken
+    replica_set.lag[broken] = None
+    assert replica_set.pick() is None
+
+
+async def test_write_holds_primary_before_commit(replica_set):
+    replica_set, healthy, _ = replica_set
+    await replica_set.check_all()
+
+    async with AsyncSessionFactory() as session:
+        await session.scalar(text("SELECT 1"))
+        await session.commit()
+    assert replica_set.pick() is healthy
+
+    async with AsyncSessionFactory() as session:
+        session.add(CurrencyGroup(name="Replica Group"))
+        await session.commit()
+    assert replica_set.pick() is None
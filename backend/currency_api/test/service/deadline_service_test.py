@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from httpx import AsyncClient, ASGITransport
+
+from backend.currency_api.service.deadline_service import remaining_budget, \
+    statement_timeout_ms
+from backend.currency_api.util import DeadlineMiddleware
+
+pytestmark = pytest.mark.anyio
+
+
+def deadline_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware, timeout=0.2, budgets={"/slow": 1, "/stream": None})
+
+    @app.get("/budget")
+    async def budget():
+        return {"remaining": remaining_budget(), "statement_timeout": statement_timeout_ms()}
+
+    @app.get("/sleep/{seconds}")
+    @app.get("/slow/{seconds}")
+    async def sleep(seconds: float):
+        await asyncio.sleep(seconds)
+        return {"slept": seconds}
+
+    @app.get("/stream")
+    async def stream():
+        async def body():
+            for _ in range(3):
+                await asyncio.sleep(0.1)
+                yield b"."
+        return StreamingResponse(body())
+
+    return app
+
+
+async def test_deadline_middleware():
+    async with AsyncClient(
+        transport=ASGITransport(app=deadline_app()), base_url="http://test"
+    ) as client:
+        budget = (await client.get("/budget")).json()
+        assert 0 < budget["remaining"] <= 0.2
+        assert 0 < budget["statement_timeout"] <= 200
+
+        response = await client.get("/sleep/1")
+        assert response.status_code == 504
+        assert response.json()["processing_time"] < 0.5
+
+        # Longer budget of the path prefix, the streaming path has none
+        assert (await client.get("/slow/0.3")).json() == {"slept": 0.3}
+        assert (await client.get("/stream")).content == b"..."
+
+    # No deadline outside of requests
+    assert remaining_budget() is None and statement_timeout_ms() is None
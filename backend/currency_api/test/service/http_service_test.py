@@ -0,0 +1,83 @@
+from typing import List
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from backend.currency_api.service.http_service import HttpFetcher
+
+pytestmark = pytest.mark.anyio
+
+ETAG = '"daily-1"'
+
+
+@pytest.fixture
+async def stub_server(http_server):
+    requests: List[web.Request] = []
+    failures = {'left': 2}
+
+    async def flaky(request: web.Request) -> web.Response:
+        requests.append(request)
+        if failures['left']:
+            failures['left'] -= 1
+            return web.Response(status=503)
+        return web.json_response({'ok': True})
+
+    async def daily(request: web.Request) -> web.Response:
+        requests.append(request)
+        if request.headers.get('If-None-Match') == ETAG:
+            return web.Response(status=304)
+        return web.Response(
+            body='<ValCurs Date="01.03.2024"/>'.encode('cp1251'),
+            content_type='application/xml', charset='windows-1251',
+            headers={'ETag': ETAG, 'Last-Modified': 'Fri, 01 Mar 2024 12:00:00 GMT'}
+        )
+
+    return await http_server({'/flaky': flaky, '/daily': daily}), requests
+
+
+@pytest.fixture
+async def fetcher():
+    http_fetcher = HttpFetcher(retries=2, backoff=0.01)
+    yield http_fetcher
+    await http_fetcher.close()
+
+
+async def test_fetch_retries_unavailable(stub_server, fetcher):
+    url, requests = stub_server
+    response = await fetcher.fetch(f'{url}/flaky')
+    assert response.status == 200
+    assert response.body == b'{"ok": true}'
+    assert len(requests) == 3
+
+    # Every request goes through the same pooled session
+    assert fetcher.get_session() is fetcher.get_session()
+
+
+async def test_fetch_raises_after_retries():
+    fetcher = HttpFetcher(retries=1, backoff=0.01)
+    try:
+        with pytest.raises(aiohttp.ClientConnectionError):
+            await fetcher.fetch('http://127.0.0.1:1/unreachable')
+    finally:
+        await fetcher.close()
+
+
+async def test_fetch_conditional(stub_server, fetcher):
+    url, requests = stub_server
+    response = await fetcher.fetch(f'{url}/daily', conditional=True)
+    assert (response.status, response.text()) == (200, '<ValCurs Date="01.03.2024"/>')
+    assert 'If-None-Match' not in requests[0].headers
+
+    # Validators are sent only after the response is remembered
+    await fetcher.fetch(f'{url}/daily', conditional=True)
+    assert 'If-None-Match' not in requests[1].headers
+    fetcher.remember(f'{url}/daily', response)
+
+    response = await fetcher.fetch(f'{url}/daily', conditional=True)
+    assert response.not_modified and response.body == b''
+    assert requests[2].headers['If-None-Match'] == ETAG
+    assert requests[2].headers['If-Modified-Since'] == 'Fri, 01 Mar 2024 12:00:00 GMT'
+
+    # Unconditional requests always download the resource
+    assert (await fetcher.fetch(f'{url}/daily')).status == 200
@@ -0,0 +1,144 @@
+from datetime import date
+from typing import List
+
+import pytest
+from sqlalchemy import event, select, func
+
+from backend.currency_api.model import Currency, CurrencyGroup, CurrencyRate
+from backend.currency_api.service import ingest_service
+from backend.currency_api.service.db_service import async_engine, AsyncSessionFactory
+from backend.currency_api.service.ingest_service import RateRecord, records_from_val_curs, \
+    parse_val_curs, upsert_rates
+
+pytestmark = pytest.mark.anyio
+
+
+def val_curs(date: str, rates: List[tuple]) -> dict:
+    return {
+        "ValCurs": {
+            "@Date": date,
+            "@name": "Foreign Currency Market",
+            "Valute": [
+                {
+                    "@ID": f"R{num_code:05d}",
+                    "NumCode": f"{num_code:03d}",
+                    "CharCode": char_code,
+                    "Nominal": "1",
+                    "Name": char_code,
+                    "Value": value,
+                    "VunitRate": value
+                }
+                for num_code, char_code, value in rates
+            ]
+        }
+    }
+
+
+async def count_statements(document: dict) -> int:
+    statements = []
+
+    def before_cursor_execute(*args):
+        statements.append(args[2])
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        async with AsyncSessionFactory() as session:
+            await upsert_rates(session, *records_from_val_curs(document))
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    return len(statements)
+
+
+async def test_upsert_rates_is_idempotent():
+    document = val_curs("01.07.2024", [(901, "XAA", "10,5"), (902, "XAB", "20,25")])
+    await count_statements(document)
+    await count_statements(
+        val_curs("01.07.2024", [(901, "XAA", "11,5"), (902, "XAB", "20,25")])
+    )
+
+    async with AsyncSessionFactory() as session:
+        rates = (
+            await session.execute(
+                select(Currency.char_code, CurrencyRate.value)
+                .join(CurrencyRate.currency)
+                .where(Currency.char_code.in_(("XAA", "XAB")))
+                .order_by(Currency.char_code)
+            )
+        ).all()
+    assert [tuple(rate) for rate in rates] == [("XAA", 11.5), ("XAB", 20.25)]
+
+
+async def test_upsert_rates_round_trips_are_constant():
+    few = [(910 + i, f"XF{i}", "1,5") for i in range(2)]
+    many = [(920 + i, f"XM{i}", "1,5") for i in range(40)]
+    assert await count_statements(val_curs("02.07.2024", few)) == \
+        await count_statements(val_curs("02.07.2024", many))
+
+    async with AsyncSessionFactory() as session:
+        assert await session.scalar(
+            select(func.count(CurrencyRate.id))
+            .join(CurrencyRate.currency)
+            .where(Currency.char_code.like("XM%"))
+        ) == 40
+
+
+async def test_read_latest_after_upsert():
+    await count_statements(val_curs("03.07.2024", [(901, "XAA", "12,5")]))
+
+    async with AsyncSessionFactory() as session:
+        latest = [rate async for rate in CurrencyRate.read_latest(session, char_codes=["XAA"])]
+        history = [
+            rate async for rate in CurrencyRate.read_latest(session, limit=2, char_codes=["XAA"])
+        ]
+    assert [rate.value for rate in latest] == [12.5]
+    assert [rate.value for rate in history] == [12.5, 11.5]
+
+
+async def test_parse_val_curs_in_chunks():
+    document = (
+        '<?xml version="1.0" encoding="windows-1251"?>'
+        '<ValCurs Date="04.07.2024" name="Foreign Currency Market">'
+        '<Valute ID="R01010"><NumCode>036</NumCode><CharCode>AUD</CharCode>'
+        '<Nominal>1</Nominal><Name>Австралийский доллар</Name><Value>58,6584</Value>'
+        '<VunitRate>58,6584</VunitRate></Valute>'
+        '<Valute ID="R01350"><NumCode>124</NumCode><CharCode>CAD</CharCode>'
+        '<Nominal>10</Nominal><Name>Канадский доллар</Name><Value>643,5</Value></Valute>'
+        '</ValCurs>'
+    ).encode('cp1251')
+
+    chunks = [document[offset:offset + 7] for offset in range(0, len(document), 7)]
+    assert parse_val_curs(chunks) == parse_val_curs(document) == (
+        "Foreign Currency Market",
+        [
+            RateRecord(36, "AUD", "Австралийский доллар", 1, 58.6584, 58.6584, date(2024, 7, 4)),
+            # Documents without VunitRate get it from the nominal
+            RateRecord(124, "CAD", "Канадский доллар", 10, 643.5, 64.35, date(2024, 7, 4)),
+        ]
+    )
+
+
+@pytest.mark.parametrize("document", (
+    b"<html><body>Service unavailable</body></html>",
+    b'<ValCurs name="Foreign Currency Market"></ValCurs>',
+    b'<ValCurs Date="04.07.2024"><Valute>',
+))
+async def test_parse_val_curs_invalid(document: bytes):
+    with pytest.raises(ValueError):
+        parse_val_curs(document)
+
+
+async def test_upsert_rates_single_transaction(monkeypatch):
+    async def failing_upsert_currencies(*args, **kwargs):
+        raise RuntimeError("db is down")
+
+    monkeypatch.setattr(ingest_service, "upsert_currencies", failing_upsert_currencies)
+    records = [RateRecord(986, "XAT", "XAT", 1, 10.0, 10.0, date(2024, 7, 6))]
+    async with AsyncSessionFactory() as session:
+        with pytest.raises(RuntimeError):
+            await upsert_rates(session, "Orphan Group", records)
+
+    # New group is not committed on its own
+    async with AsyncSessionFactory() as session:
+        assert await session.scalar(
+            select(func.count()).where(CurrencyGroup.name == "Orphan Group")
+        ) == 0
@@ -0,0 +1,75 @@
+import pytest
+from httpx import AsyncClient
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+from prometheus_client.parser import text_string_to_metric_families
+
+from backend.currency_api.service.metrics_service import statement_operation, \
+    clear_multiproc_dir, latest_metrics
+
+pytestmark = pytest.mark.anyio
+
+
+async def read_samples(client: AsyncClient) -> dict:
+    url = f"{client.base_url.scheme}://{client.base_url.netloc.decode()}/metrics"
+    response = await client.get(url)
+    assert response.headers["content-type"].startswith("text/plain")
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+
+
+async def test_statement_operation():
+    assert statement_operation("\n  select 1") == "SELECT"
+    assert statement_operation("SAVEPOINT sa_savepoint_1") == "SAVEPOINT"
+    assert statement_operation("") == "UNKNOWN"
+
+
+async def test_clear_multiproc_dir(tmp_path):
+    (tmp_path / "counter_1.db").write_bytes(b"")
+    (tmp_path / "histogram_2.db").write_bytes(b"")
+    (tmp_path / "other.txt").write_bytes(b"")
+    assert clear_multiproc_dir(str(tmp_path)) == 2
+    assert [path.name for path in tmp_path.iterdir()] == ["other.txt"]
+
+    assert clear_multiproc_dir(str(tmp_path / "missing")) == 0
+    assert (tmp_path / "missing").is_dir()
+    assert clear_multiproc_dir(None) == 0
+
+
+async def test_latest_metrics_directories(tmp_path):
+    # Same pid in two containers writes the same file name into its own directory
+    for container, value in (("currency_api", 2.0), ("celery_worker", 3.0)):
+        (tmp_path / container).mkdir()
+        values = MmapedDict(str(tmp_path / container / "counter_7.db"))
+        key = mmap_key("rates_total", "rates_total", ["task"], ["ingest"], "Rates")
+        values.write_value(key, value, 0)
+        values.close()
+
+    payload, _ = latest_metrics([str(tmp_path / "currency_api"), str(tmp_path / "celery_worker")])
+    samples = {
+        (sample.name, tuple(sample.labels.items())): sample.value
+        for family in text_string_to_metric_families(payload.decode())
+        for sample in family.samples
+    }
+    assert samples[("rates_total", (("task", "ingest"),))] == 5.0
+
+
+async def test_metrics_endpoint(client: AsyncClient):
+    route = (("method", "GET"), ("route", "/api/v1/currency_group/{currency_group_id}"))
+    requests = ("http_requests_total", (*route, ("status", "404")))
+    before = await read_samples(client)
+
+    await client.get("/currency_group/999999")
+    await client.get("/currency_group/")
+    await client.get("/currency_group/")
+    samples = await read_samples(client)
+
+    # Labeled with the route template, not the raw path
+    assert samples[requests] == before.get(requests, 0) + 1
+    assert samples[("http_request_duration_seconds_count", route)] >= 1
+    assert samples[
+        ("cache_requests_total", (("endpoint", "read_all_currency_groups"), ("result", "local")))
+    ] >= 1
+    assert samples[("db_statement_duration_seconds_count", (("operation", "SELECT"),))] > 0
@@ -0,0 +1,107 @@
+from typing import List
+
+import pytest
+from aiohttp import web
+from sqlalchemy import select
+
+from backend.currency_api.model import Currency, CurrencyRate
+from backend.currency_api.service.db_service import AsyncSessionFactory
+from backend.currency_api.service import parse_service
+from backend.currency_api.service.parse_service import ingest_from_cbr, load_snapshot
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def cbr_server(http_server):
+    requests: List[web.Request] = []
+    feed = {'value': '70,5', 'etag': '"1"', 'body': None}
+
+    async def xml_daily(request: web.Request) -> web.Response:
+        requests.append(request)
+        if feed['body'] is not None:
+            return web.Response(body=feed['body'], content_type='text/xml')
+        if feed['etag'] and request.headers.get('If-None-Match') == feed['etag']:
+            return web.Response(status=304)
+        return web.Response(
+            body=(
+                '<?xml version="1.0" encoding="windows-1251"?>'
+                '<ValCurs Date="05.07.2024" name="Foreign Currency Market">'
+                '<Valute ID="R00975"><NumCode>975</NumCode><CharCode>XPA</CharCode>'
+                '<Nominal>1</Nominal><Name>Тестовая валюта</Name>'
+                f'<Value>{feed["value"]}</Value><VunitRate>{feed["value"]}</VunitRate>'
+                '</Valute></ValCurs>'
+            ).encode('cp1251'),
+            content_type='application/xml', charset='windows-1251',
+            headers={'ETag': feed['etag']} if feed['etag'] else {}
+        )
+
+    url = await http_server({'/scripts/XML_daily.asp': xml_daily})
+    return f'{url}/scripts/XML_daily.asp', requests, feed
+
+
+async def read_values() -> List[float]:
+    async with AsyncSessionFactory() as session:
+        return list(
+            await session.scalars(
+                select(CurrencyRate.value).join(CurrencyRate.currency)
+                .where(Currency.char_code == "XPA")
+            )
+        )
+
+
+async def test_ingest_from_cbr(cbr_server, tmp_path):
+    link, requests, feed = cbr_server
+    snapshot_path = str(tmp_path / 'data.json')
+
+    assert await ingest_from_cbr(link, snapshot_path) == 1
+    assert await read_values() == [70.5]
+    group_name, records = load_snapshot(snapshot_path)
+    assert group_name == "Foreign Currency Market"
+    assert [(record.char_code, record.value) for record in records] == [("XPA", 70.5)]
+
+    # Unchanged feed: 304 of the conditional request
+    assert await ingest_from_cbr(link, None) == 0
+    assert requests[-1].headers['If-None-Match'] == '"1"'
+
+    # Unchanged feed without validators: skipped by the digest
+    feed['etag'] = None
+    assert await ingest_from_cbr(link, None) == 0
+
+    feed['value'] = '71,25'
+    assert await ingest_from_cbr(link, None) == 1
+    assert await read_values() == [71.25]
+
+
+async def test_ingest_from_cbr_retries_failed_feed(cbr_server, monkeypatch):
+    link, requests, feed = cbr_server
+    feed['value'] = '72,5'
+    upsert_rates = parse_service.upsert_rates
+    failures = [RuntimeError('db is down')]
+
+    async def flaky_upsert_rates(*args, **kwargs):
+        if failures:
+            raise failures.pop()
+        return await upsert_rates(*args, **kwargs)
+
+    monkeypatch.setattr(parse_service, 'upsert_rates', flaky_upsert_rates)
+    with pytest.raises(RuntimeError):
+        await ingest_from_cbr(link, None)
+
+    # Validators of the failed run are not sent, the feed is downloaded and stored again
+    assert await ingest_from_cbr(link, None) == 1
+    assert 'If-None-Match' not in requests[-1].headers
+    assert await read_values() == [72.5]
+    assert await ingest_from_cbr(link, None) == 0
+    assert requests[-1].headers['If-None-Match'] == '"1"'
+
+
+async def test_ingest_from_cbr_invalid_document(cbr_server):
+    link, _, feed = cbr_server
+    feed['value'] = '73,5'
+    feed['body'] = b'<html><body>Service unavailable</body></html>'
+    assert await ingest_from_cbr(link, None) == 0
+
+    feed['body'] = None
+    assert await ingest_from_cbr(link, None) == 1
+    assert await read_values() == [73.5]
@@ -0,0 +1,52 @@
+from datetime import date
+
+import pytest
+
+from backend.currency_api.service.db_service import AsyncSessionFactory
+from backend.currency_api.service.partition_service import add_months, partition_name, \
+    partition_months, partition_statements, ensure_partitions
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_partition_statements():
+    assert add_months(date(2024, 11, 1), 2) == date(2025, 1, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert partition_name(date(2024, 3, 1)) == "currency_rate_y2024m03"
+
+    create, move, attach = partition_statements(date(2024, 12, 1))
+    assert create.startswith("CREATE TABLE currency_rate_y2024m12 (LIKE currency_rate")
+    assert "DELETE FROM currency_rate_default" in move
+    assert attach.endswith(
+        "FOR VALUES FROM ('2024-12-01 00:00:00 Europe/Moscow') "
+        "TO ('2025-01-01 00:00:00 Europe/Moscow')"
+    )
+
+
+async def test_partition_statements_past_range():
+    # Backfill range: every overlapped month, bounds in Moscow time
+    months = partition_months(date(2013, 12, 31), date(2014, 2, 1))
+    assert months == [date(2013, 12, 1), date(2014, 1, 1), date(2014, 2, 1)]
+    assert [partition_name(month) for month in months] == [
+        "currency_rate_y2013m12", "currency_rate_y2014m01", "currency_rate_y2014m02"
+    ]
+    create, move, attach = partition_statements(months[0])
+    assert create.startswith("CREATE TABLE currency_rate_y2013m12 ")
+    # Rows already written into the default partition move into the new one
+    assert move == (
+        "WITH moved AS (DELETE FROM currency_rate_default "
+        "WHERE modified_at >= '2013-12-01 00:00:00 Europe/Moscow' "
+        "AND modified_at < '2014-01-01 00:00:00 Europe/Moscow' RETURNING *) "
+        "INSERT INTO currency_rate_y2013m12 SELECT * FROM moved"
+    )
+    assert attach == (
+        "ALTER TABLE currency_rate ATTACH PARTITION currency_rate_y2013m12 "
+        "FOR VALUES FROM ('2013-12-01 00:00:00 Europe/Moscow') "
+        "TO ('2014-01-01 00:00:00 Europe/Moscow')"
+    )
+    assert partition_months(date(2014, 3, 1), date(2014, 2, 1)) == []
+
+
+async def test_ensure_partitions_skips_plain_table():
+    async with AsyncSessionFactory() as session:
+        assert await ensure_partitions(session) == []
@@ -0,0 +1,56 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.currency_api.service.pool_service import Histogram, InstrumentedPool, \
+    instrument_engine, pool_stats, engines, metrics
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_histogram_is_cumulative():
+    histogram = Histogram((0.01, 0.1))
+    for value in (0.001, 0.01, 0.05, 3):
+        histogram.observe(value)
+    assert histogram.stats() == {
+        "buckets": {"0.01": 2, "0.1": 3, "+Inf": 4}, "sum": 3.061, "count": 4
+    }
+
+
+async def test_pool_stats():
+    engine = instrument_engine(
+        create_async_engine(
+            "sqlite+aiosqlite:///test.db", poolclass=InstrumentedPool,
+            pool_size=1, max_overflow=0, pool_timeout=0.1
+        ),
+        "test"
+    )
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert pool_stats()["test"]["checked_out"] == 1
+            # The only connection is busy, the checkout waits for pool_timeout and fails
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+        stats = pool_stats()["test"]
+        assert (stats["size"], stats["checked_out"], stats["checked_in"]) == (1, 0, 1)
+        assert (stats["checkouts"], stats["connects"], stats["timeouts"]) == (2, 1, 1)
+        assert stats["checkout_wait"]["count"] == 3
+        assert stats["checkout_wait"]["sum"] >= 0.1
+    finally:
+        await engine.dispose()
+        engines.pop("test")
+        metrics.pop("test")
+
+
+async def test_pool_endpoint(client: AsyncClient):
+    url = f"{client.base_url.scheme}://{client.base_url.netloc.decode()}/api/internal/pool"
+    await client.get("/currency/")
+    stats = (await client.get(url)).json()
+    assert stats["primary"]["checkouts"] > 0
+    assert set(stats["primary"]["checkout_wait"]["buckets"]) >= {"0.001", "+Inf"}
@@ -0,0 +1,123 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import delete, select
+
+from backend.currency_api.config import MOSCOW_TZ
+from backend.currency_api.model import Currency, CurrencyRate, CurrencyRateRollup
+from backend.currency_api.service.db_service import AsyncSessionFactory
+from backend.currency_api.service.ingest_service import records_from_val_curs, upsert_rates
+from backend.currency_api.service.rollup_service import rebuild_rollups
+
+pytestmark = pytest.mark.anyio
+
+
+async def ingest(day: date, value: str) -> None:
+    async with AsyncSessionFactory() as session:
+        await upsert_rates(session, *records_from_val_curs({
+            "ValCurs": {
+                "@Date": f"{day:%d.%m.%Y}",
+                "@name": "Foreign Currency Market",
+                "Valute": {
+                    "@ID": "R00985",
+                    "NumCode": "985",
+                    "CharCode": "XOH",
+                    "Nominal": "1",
+                    "Name": "XOH",
+                    "Value": value,
+                    "VunitRate": value
+                }
+            }
+        }))
+
+
+async def read_ohlc(**kwargs) -> list:
+    async with AsyncSessionFactory() as session:
+        return await CurrencyRateRollup.read_ohlc(session, char_codes=["XOH"], **kwargs)
+
+
+async def test_rollups_follow_ingest():
+    # Wed 2024-07-03 .. Tue 2024-07-09, two ISO weeks of the same month
+    for day, value in ((3, "10"), (4, "14"), (5, "8"), (8, "11"), (9, "12")):
+        await ingest(date(2024, 7, day), value)
+
+    weeks = await read_ohlc(period="week", start=date(2024, 7, 1), end=date(2024, 7, 31))
+    assert [
+        (row["bucket"], row["open_value"], row["high_value"], row["low_value"],
+         row["close_value"], row["mean_value"], row["count"])
+        for row in weeks
+    ] == [
+        (date(2024, 7, 1), 10.0, 14.0, 8.0, 8.0, 32 / 3, 3),
+        (date(2024, 7, 8), 11.0, 12.0, 11.0, 12.0, 11.5, 2),
+    ]
+
+    # Updated rate of the same day replaces it in every bucket
+    await ingest(date(2024, 7, 5), "20")
+    (month,) = await read_ohlc(period="month", start=date(2024, 7, 1), end=date(2024, 7, 1))
+    assert (month["high_value"], month["close_value"], month["count"]) == (20.0, 12.0, 5)
+
+    async with AsyncSessionFactory() as session:
+        await session.execute(delete(CurrencyRateRollup))
+        await session.commit()
+    assert await read_ohlc(period="month", end=date(2024, 7, 31)) == []
+    await rebuild_rollups(date(2024, 7, 1), date(2024, 7, 31))
+    assert [
+        (row["high_value"], row["close_value"], row["count"])
+        for row in await read_ohlc(period="month", end=date(2024, 7, 31))
+    ] == [(20.0, 12.0, 5)]
+
+
+async def test_ohlc_current_bucket(client: AsyncClient):
+    today = datetime.now(MOSCOW_TZ).date()
+    await ingest(today, "30")
+    async with AsyncSessionFactory() as session:
+        await session.execute(delete(CurrencyRateRollup))
+        await session.commit()
+
+    # Current bucket is aggregated from the raw rates
+    response = await client.get(
+        "/currency_rate/ohlc", params={"period": "day", "char_code": "xoh", "start": today}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [(row["bucket"], row["close_value"]) for row in response.json()] == \
+        [(today.isoformat(), 30.0)]
+
+    response = await client.get("/currency_rate/ohlc", params={"period": "year"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_ohlc_future_bucket():
+    # Quotation of the next business day is published in advance
+    today = datetime.now(MOSCOW_TZ).date()
+    monday = today + timedelta(days=3)
+    await ingest(today, "30")
+    await ingest(monday, "33")
+
+    assert [(row["bucket"], row["close_value"]) for row in await read_ohlc(start=today)] == \
+        [(today, 30.0), (monday, 33.0)]
+
+
+async def test_rollups_follow_api_writes(client: AsyncClient):
+    day = date(2024, 6, 3)
+    await ingest(day, "40")
+    await ingest(day + timedelta(days=1), "42")
+    async with AsyncSessionFactory() as session:
+        currency_rate_id = await session.scalar(
+            select(CurrencyRate.id).join(CurrencyRate.currency)
+            .where(Currency.char_code == "XOH").order_by(CurrencyRate.modified_at).limit(1)
+        )
+
+    response = await client.patch(
+        f"/currency_rate/{currency_rate_id}", json={"value": 45.0, "vunit_rate": 45.0}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    (week,) = await read_ohlc(period="week", start=day, end=day)
+    assert (week["open_value"], week["high_value"], week["count"]) == (45.0, 45.0, 2)
+
+    response = await client.delete(f"/currency_rate/{currency_rate_id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert [row["bucket"] for row in await read_ohlc(period="day", start=day, end=day)] == []
+    (week,) = await read_ohlc(period="week", start=day, end=day)
+    assert (week["open_value"], week["count"]) == (42.0, 1)
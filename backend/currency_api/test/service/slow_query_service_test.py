@@ -0,0 +1,85 @@
+import pytest
+from httpx import AsyncClient
+
+from backend.currency_api.service.db_service import async_engine
+from backend.currency_api.service.slow_query_service import SlowQueryLog, explain_statement
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_explain_statement():
+    assert explain_statement("postgresql", "SELECT 1") == "EXPLAIN (ANALYZE, BUFFERS) SELECT 1"
+    # Writes are never executed twice
+    assert explain_statement("postgresql", "DELETE FROM currency") == \
+        "EXPLAIN DELETE FROM currency"
+    assert explain_statement("sqlite", "SELECT 1") == "EXPLAIN QUERY PLAN SELECT 1"
+    assert explain_statement("sqlite", "SAVEPOINT sa_savepoint_1") is None
+
+
+async def test_slow_query_log(client: AsyncClient):
+    slow_queries = SlowQueryLog(threshold=0, size=2)
+    slow_queries.enable(async_engine.sync_engine)
+    try:
+        await client.get("/currency/999999")
+        await slow_queries.flush()
+    finally:
+        slow_queries.disable()
+
+    entries = slow_queries.stats()["entries"]
+    assert len(entries) <= 2
+    entry = next(entry for entry in entries if "FROM currency" in entry["statement"])
+    assert entry["route"] == "/api/v1/currency/{currency_id}"
+    assert "999999" in entry["parameters"]
+    assert entry["duration"] >= 0
+    assert entry["plan"] and "currency" in " ".join(entry["plan"])
+
+    # Nothing recorded once disabled
+    await client.get("/currency/999998")
+    assert slow_queries.stats() == {"threshold": None, "size": 2, "entries": entries}
+
+
+async def test_slow_query_log_explain_limits(client: AsyncClient):
+    slow_queries = SlowQueryLog(threshold=0, cooldown=60)
+    slow_queries.enable(async_engine.sync_engine)
+    try:
+        for currency_id in (999997, 999996):
+            await client.get(f"/currency/{currency_id}")
+            await slow_queries.flush()
+    finally:
+        slow_queries.disable()
+
+    # Same statement text is explained once per cooldown
+    entries = [entry for entry in slow_queries.stats()["entries"]
+               if "FROM currency" in entry["statement"]]
+    assert [bool(entry["plan"]) for entry in entries] == [False, True]
+
+    # Nothing explained beyond the concurrency
+    slow_queries = SlowQueryLog(threshold=0, concurrency=0)
+    slow_queries.enable(async_engine.sync_engine)
+    try:
+        await client.get("/currency/999995")
+        await slow_queries.flush()
+    finally:
+        slow_queries.disable()
+    assert slow_queries.stats()["entries"]
+    assert all(entry["plan"] is None for entry in slow_queries.stats()["entries"])
+
+
+@pytest.mark.parametrize("internal_token, authorization, status_code", [
+    (None, "Bearer secret", 403),
+    ("secret", None, 401),
+    ("secret", "Bearer wrong", 401),
+    ("secret", "Bearer secret", 200),
+])
+async def test_slow_queries_endpoint(
+    client: AsyncClient, monkeypatch, internal_token, authorization, status_code
+):
+    monkeypatch.setattr(
+        "backend.currency_api.util.endpoint_util.INTERNAL_TOKEN", internal_token
+    )
+    url = f"{client.base_url.scheme}://{client.base_url.netloc.decode()}/api/internal/slow_queries"
+    headers = {"Authorization": authorization} if authorization else {}
+    response = await client.get(url, headers=headers)
+    assert response.status_code == status_code
+    if status_code == 200:
+        assert response.json()["entries"] == []
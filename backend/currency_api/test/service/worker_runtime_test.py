@@ -0,0 +1,42 @@
+import asyncio
+
+import anyio
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.pool import NullPool
+
+from backend.currency_api.celery import runtime
+from backend.currency_api.service.db_service import TaskAsyncSessionFactory, task_async_engine
+
+pytestmark = pytest.mark.anyio
+
+
+async def select_one() -> tuple:
+    async with TaskAsyncSessionFactory() as session:
+        await session.execute(text("SELECT 1"))
+        return asyncio.get_running_loop(), session.get_bind()
+
+
+def run_worker_process() -> tuple:
+    runtime.init_worker_process()
+    connects = []
+    engine = runtime._engine  # pylint: disable=protected-access
+    event.listen(engine.sync_engine, "connect", lambda *args: connects.append(args))
+    try:
+        results = [runtime.run_async(select_one) for _ in range(3)]
+    finally:
+        runtime.shutdown_worker_process()
+        TaskAsyncSessionFactory.configure(bind=task_async_engine)
+    return results, connects
+
+
+async def test_worker_process_reuses_loop_and_connections():
+    # Worker processes run tasks synchronously, outside of the test event loop
+    results, connects = await anyio.to_thread.run_sync(run_worker_process)
+
+    loops = {loop for loop, _ in results}
+    engines = {bind for _, bind in results}
+    assert len(loops) == 1 and len(engines) == 1
+    assert not isinstance(engines.pop().pool, NullPool)
+    assert len(connects) == 1
+    assert loops.pop().is_closed()
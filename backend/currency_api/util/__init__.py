@@ -1,4 +1,6 @@
 from .meta_util import _AllOptionalMeta
 from .endpoint_util import get_object_or_raise_404, create_object_or_raise_400, \
-    update_object_or_raise_400, process_query_params, cache
+    update_object_or_raise_400, read_all_or_raise_400, process_query_params, cache, \
+    verify_stream_token, verify_internal_token, stream_all
 from .db_util import get_or_create
+from .middleware_util import MetricsMiddleware, DeadlineMiddleware
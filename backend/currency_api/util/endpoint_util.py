@@ -1,12 +1,24 @@
-import json
-from typing import Dict, Callable
-from functools import wraps
+import time
+import secrets
+from typing import Any, AsyncIterator, Dict, Callable, List, Optional, Sequence, Type
+from functools import wraps, lru_cache
 
-from fastapi import Request, status, HTTPException
+from fastapi import Depends, Request, Response, status, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
 from redis.asyncio import Redis
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.currency_api.config import STREAM_TOKEN, INTERNAL_TOKEN
+from backend.currency_api.service.cache_service import get_or_compute, local_cache
+from backend.currency_api.service.db_service import read_session
+from backend.currency_api.service.metrics_service import observe_cache
+from backend.currency_api.service.deadline_service import request_deadline
+from backend.currency_api.schema.page_schema import CursorPage
+
 
 async def get_object_or_raise_404(db_session: AsyncSession, item, item_id: int, *args, **kwargs):
     """
@@ -60,6 +72,126 @@ async def update_object_or_raise_400(db_session: AsyncSession, item, item_instan
         ) from e
 
 
+async def read_all_or_raise_400(
+    db_session: AsyncSession, item, schema: Type[BaseModel], **query_params
+) -> List[BaseModel] | CursorPage:
+    """
+    Response pattern for api list endpoint if query params are malformed.\n
+    Returns a keyset page (`items`, `next_cursor`) if `cursor` param provided
+    """
+    try:
+        instances = [instance async for instance in item.read_all(db_session, **query_params)]
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"[{item.__name__}] Invalid query params: " + str(e)
+        ) from e
+
+    result = [schema(**instance.__dict__) for instance in instances]
+    if 'cursor' not in query_params:
+        return result
+    return CursorPage[schema](
+        items=result,
+        next_cursor=item.encode_cursor(instances[-1], **query_params)
+        if instances and len(instances) == query_params['limit'] else None
+    )
+
+
+@lru_cache(maxsize=None)
+def _type_adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def encode_json(result: Any) -> bytes:
+    """
+    Serialize the endpoint result into JSON bytes in a single pass.\n
+    Models (and lists of models) are dumped with `exclude_unset`, the same way as
+    `response_model_exclude_unset` routes do
+    """
+    if isinstance(result, BaseModel):
+        return _type_adapter(type(result)).dump_json(result, exclude_unset=True)
+    if isinstance(result, list) and result and isinstance(result[0], BaseModel):
+        return _type_adapter(List[type(result[0])]).dump_json(result, exclude_unset=True)
+    return to_json(result)
+
+
+def _verify_bearer(
+    token: Optional[str], credentials: Optional[HTTPAuthorizationCredentials], name: str,
+    disabled: str
+) -> None:
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=disabled
+        )
+    if credentials is None or \
+            not secrets.compare_digest(credentials.credentials.encode(), token.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Invalid {name} token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+def verify_stream_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))
+) -> None:
+    """
+    Dependency allowing streaming endpoints only for clients with the `STREAM_TOKEN` bearer
+    """
+    _verify_bearer(STREAM_TOKEN, credentials, "stream", "Streaming is disabled")
+
+
+def verify_internal_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))
+) -> None:
+    """
+    Dependency allowing internal endpoints only for clients with the `INTERNAL_TOKEN` bearer
+    """
+    _verify_bearer(INTERNAL_TOKEN, credentials, "internal", "Internal endpoint is disabled")
+
+
+def stream_all(
+    item, schema: Type[BaseModel], media_type: str = 'ndjson',
+    batch_size: int = 1000, **query_params
+) -> StreamingResponse:
+    """
+    Response pattern for api list endpoint streaming every row without the limit.\n
+    Rows are serialized as the db cursor produces them and sent in chunks of `batch_size`,
+    either as NDJSON (`media_type='ndjson'`) or a JSON array (`media_type='json'`).\n
+    The stream owns its db session, since the request one is closed before the body is sent
+    """
+    adapter = _type_adapter(schema)
+    array = media_type == 'json'
+
+    async def body() -> AsyncIterator[bytes]:
+        async with read_session() as db_session:
+            chunk: List[bytes] = []
+            first = True
+            if array:
+                yield b'['
+            async for instance in item.stream_all(
+                db_session, batch_size=batch_size, **query_params
+            ):
+                row = adapter.dump_json(schema(**instance.__dict__), exclude_unset=True)
+                if array:
+                    chunk.append(row if first else b',' + row)
+                    first = False
+                else:
+                    chunk.append(row + b'\n')
+                if len(chunk) >= batch_size:
+                    yield b''.join(chunk)
+                    chunk.clear()
+            if chunk:
+                yield b''.join(chunk)
+            if array:
+                yield b']'
+
+    return StreamingResponse(
+        body(), media_type='application/json' if array else 'application/x-ndjson'
+    )
+
+
 def process_query_params(request: Request) -> Dict[str, str]:
     """
     Process query parameters from a FastAPI Request object
@@ -73,20 +205,37 @@ def process_query_params(request: Request) -> Dict[str, str]:
     return query_params
 
 
-def cache(expire: int = 60) -> Callable:
+def cache(
+    expire: int = 60, tags: Sequence[str] = (), local_expire: int = 0, stale: int = 0
+) -> Callable:
     """
-    Decorator for caching the result of an async function with an optional expiration time.
+    Decorator for caching the result of an async function with an optional expiration time.\n
+    The result is serialized once and stored as JSON bytes, hits are returned as is
+    in a `Response` bypassing the `response_model` validation.\n
+    Cached result is dropped as soon as any of its tags is invalidated (model writes
+    bump `table` and `table:id` tags), so expiration only bounds the memory usage.\n
+    With `local_expire` the result is also kept in memory of the worker process,
+    such hits don't reach redis at all.\n
+    A missing result is computed by a single request at a time, concurrent ones wait for it.
+    With `stale` the expired result is still served for that long while a background task
+    recomputes it within its own db session.
 
     :param expire : expiration time for the cache in seconds (default=60)
     :type expire : int
+    :param tags : tags the result depends on, formatted with the endpoint kwargs
+    :type tags : Sequence[str]
+    :param local_expire : expiration time for the in-process cache in seconds (default=0, off)
+    :type local_expire : int
+    :param stale : time to serve the expired result while refreshing in seconds (default=0, off)
+    :type stale : int
     :returns : function decorator
     :rtype : Callable
 
     Example:
 
     ```
-        @cache(expire=300)
-        async def fetch_data(request: Request, *args, **kwargs) -> dict:
+        @cache(expire=3600, tags=('currency:{currency_id}', 'currency_rate'))
+        async def fetch_data(request: Request, currency_id: int, *args, **kwargs) -> dict:
             ...
             return data_dict
     ```
@@ -98,14 +247,41 @@ def cache(expire: int = 60) -> Callable:
             query_params: dict = process_query_params(request)
             cache_key = f"{request.url.path}?" \
                 f"{'&'.join([f'{key}={value}' for key, value in query_params.items()])}"
-            cached_result = await redis.get(cache_key)
+            entry_tags = [tag.format(**kwargs) for tag in tags]
+
+            start = time.perf_counter()
+            if local_expire:
+                local_body = local_cache.get(cache_key)
+                if local_body is not None:
+                    observe_cache(func.__name__, 'local', time.perf_counter() - start)
+                    return Response(content=local_body, media_type='application/json')
+                epoch = local_cache.epoch
+            computed = False
+
+            async def compute() -> bytes:
+                nonlocal computed
+                computed = True
+                return encode_json(await func(*args, request, **kwargs))
+
+            async def refresh() -> bytes:
+                # Background refresh outlives the request, its deadline doesn't apply
+                request_deadline.set(None)
+                # Request session is closed by the time the background refresh runs
+                async with read_session() as db_session:
+                    return encode_json(
+                        await func(*args, request, **{**kwargs, 'db_session': db_session})
+                    )
 
-            if cached_result is None:
-                result = await func(*args, request, **kwargs)
-                await redis.set(cache_key, json.dumps(result, default=str), ex=expire)
-                return result
+            body = await get_or_compute(
+                redis, cache_key, entry_tags, compute, refresh, expire, stale
+            )
+            observe_cache(
+                func.__name__, 'miss' if computed else 'hit', time.perf_counter() - start
+            )
 
-            return json.loads(cached_result)
+            if local_expire:
+                local_cache.set(cache_key, body, entry_tags, local_expire, epoch)
+            return Response(content=body, media_type='application/json')
 
         return wrapper
 
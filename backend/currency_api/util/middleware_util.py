@@ -0,0 +1,117 @@
+import time
+import asyncio
+from typing import Dict, Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import DBAPIError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.currency_api.service.metrics_service import observe_request, request_route, \
+    request_scope
+from backend.currency_api.service.deadline_service import request_deadline
+
+# SQLSTATE of a query cancelled by statement_timeout
+QUERY_CANCELED = '57014'
+
+
+class MetricsMiddleware:
+    '''
+    Pure ASGI middleware recording latency and status of every http request
+
+    Requests are labeled with the matched route template (e.g. `/api/v1/currency/{currency_id}`)
+    rather than the raw path, so the amount of series stays bounded.
+    '''
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        token = request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_scope.reset(token)
+            observe_request(
+                scope['method'], request_route(scope), status_code, time.perf_counter() - start
+            )
+
+
+class DeadlineMiddleware:
+    '''
+    Pure ASGI middleware bounding the processing time of every http request
+
+    The budget is picked by the longest matching path prefix of `budgets` (None disables the
+    deadline, e.g. for streaming endpoints), `timeout` otherwise. The request runs within
+    `asyncio.timeout` (no extra task per request, the awaited db query is cancelled with it),
+    the deadline is published to `request_deadline`, so db sessions bound their statements
+    by the remaining budget (see `statement_timeout_ms`).
+    Requests exceeding the budget get 504 unless the response is already being sent.
+    '''
+
+    def __init__(
+        self, app: ASGIApp, timeout: float = 5, budgets: Optional[Dict[str, Optional[float]]] = None
+    ):
+        self.app = app
+        self.timeout = timeout
+        self.budgets = sorted((budgets or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def budget(self, path: str) -> Optional[float]:
+        for prefix, budget in self.budgets:
+            if path.startswith(prefix):
+                return budget
+        return self.timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        budget = self.budget(scope['path']) if scope['type'] == 'http' else None
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.monotonic()
+        response_started = False
+
+        async def send_tracking_start(message: Message) -> None:
+            nonlocal response_started
+            if message['type'] == 'http.response.start':
+                response_started = True
+            await send(message)
+
+        token = request_deadline.set(start + budget)
+        try:
+            async with asyncio.timeout(budget):
+                await self.app(scope, receive, send_tracking_start)
+        except TimeoutError:
+            if response_started:
+                raise
+            await self.timeout_response(start)(scope, receive, send)
+        except DBAPIError as e:
+            # Postgres cancelled the query at the deadline (statement_timeout)
+            if response_started or getattr(e.orig, 'pgcode', None) != QUERY_CANCELED:
+                raise
+            await self.timeout_response(start)(scope, receive, send)
+        finally:
+            request_deadline.reset(token)
+
+    @staticmethod
+    def timeout_response(start: float) -> JSONResponse:
+        return JSONResponse(
+            {
+                'detail': 'Request processing time excedeed limit',
+                'processing_time': time.monotonic() - start
+            },
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT
+        )
@@ -8,7 +8,7 @@ const CurrencyList: React.FC = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const response = await client_currency.get('/api/v1/currency/?include_currency_rates=1');
+        const response = await client_currency.get('/api/v1/currency/?include_currency_rates=latest');
         setCurrencies(response.data);
       } catch (error) {
         console.error('Error fetching data:', error);